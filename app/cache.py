@@ -0,0 +1,276 @@
+# app/cache.py
+"""
+Cache de résultats à deux niveaux : un LRU en mémoire propre au processus,
+puis Redis partagé entre l'API et les workers Celery. Redis est optionnel :
+s'il est injoignable, le cache se limite au LRU local.
+
+CacheReponses est la variante asynchrone pour les routes de l'API : TTL
+dans Redis et regroupement des requêtes identiques simultanées.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.logger import logger
+
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://redis_mb2:6379/1")
+CACHE_REDIS_TIMEOUT = float(os.getenv("CACHE_REDIS_TIMEOUT", "0.2"))
+# Après une erreur Redis, on n'essaie plus pendant ce délai (secondes)
+CACHE_REDIS_PAUSE = float(os.getenv("CACHE_REDIS_PAUSE", "30"))
+
+_redis = None
+_redis_async = None
+_redis_lock = threading.Lock()
+_redis_indisponible_jusqua = 0.0
+_redis_absent = False
+
+
+def _signaler_redis_absent():
+    global _redis_absent
+    _redis_absent = True
+    logger.warning("⚠️ Paquet redis absent : cache partagé désactivé")
+
+
+def get_redis():
+    """Client Redis partagé du processus, ou None si Redis est désactivé/indisponible."""
+    global _redis
+    if not CACHE_REDIS_URL or _redis_absent or time.monotonic() < _redis_indisponible_jusqua:
+        return None
+    with _redis_lock:
+        if _redis is None:
+            try:
+                import redis
+            except ImportError:
+                _signaler_redis_absent()
+                return None
+            _redis = redis.Redis.from_url(
+                CACHE_REDIS_URL,
+                socket_timeout=CACHE_REDIS_TIMEOUT,
+                socket_connect_timeout=CACHE_REDIS_TIMEOUT,
+            )
+    return _redis
+
+
+def get_redis_async():
+    """Client redis.asyncio du processus (boucle de l'API), ou None."""
+    global _redis_async
+    if not CACHE_REDIS_URL or _redis_absent or time.monotonic() < _redis_indisponible_jusqua:
+        return None
+    if _redis_async is None:
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError:
+            _signaler_redis_absent()
+            return None
+        _redis_async = redis_asyncio.Redis.from_url(
+            CACHE_REDIS_URL,
+            socket_timeout=CACHE_REDIS_TIMEOUT,
+            socket_connect_timeout=CACHE_REDIS_TIMEOUT,
+        )
+    return _redis_async
+
+
+def signaler_erreur_redis(e: Exception):
+    """Suspend l'usage de Redis pendant CACHE_REDIS_PAUSE secondes."""
+    global _redis_indisponible_jusqua
+    _redis_indisponible_jusqua = time.monotonic() + CACHE_REDIS_PAUSE
+    logger.warning(f"⚠️ Redis indisponible ({e}), cache partagé suspendu {CACHE_REDIS_PAUSE:.0f}s")
+
+
+class CacheResultats:
+    """
+    Cache clé → valeur JSON. `get` consulte le LRU local puis Redis (et
+    réchauffe le LRU) ; `set` écrit dans les deux. Les compteurs de succès
+    et d'échecs sont exposés par `stats()`.
+    """
+
+    def __init__(self, prefixe: str, taille_locale: int = 10000, ttl: int = 0):
+        self.prefixe = prefixe
+        self.taille_locale = taille_locale
+        self.ttl = ttl
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._compteurs = {"hits_local": 0, "hits_redis": 0, "misses": 0, "erreurs_redis": 0}
+
+    def _compter(self, nom: str):
+        with self._lock:
+            self._compteurs[nom] += 1
+
+    def _garder_local(self, cle: str, valeur: Any):
+        with self._lock:
+            self._local[cle] = valeur
+            self._local.move_to_end(cle)
+            while len(self._local) > self.taille_locale:
+                self._local.popitem(last=False)
+
+    def get(self, cle: str) -> Optional[Any]:
+        with self._lock:
+            if cle in self._local:
+                self._local.move_to_end(cle)
+                self._compteurs["hits_local"] += 1
+                return self._local[cle]
+
+        client = get_redis()
+        if client is not None:
+            try:
+                brut = client.get(f"{self.prefixe}:{cle}")
+            except Exception as e:
+                self._compter("erreurs_redis")
+                signaler_erreur_redis(e)
+                brut = None
+            if brut is not None:
+                valeur = json.loads(brut)
+                self._garder_local(cle, valeur)
+                self._compter("hits_redis")
+                return valeur
+
+        self._compter("misses")
+        return None
+
+    def set(self, cle: str, valeur: Any):
+        self._garder_local(cle, valeur)
+        client = get_redis()
+        if client is None:
+            return
+        try:
+            client.set(f"{self.prefixe}:{cle}", json.dumps(valeur), ex=self.ttl or None)
+        except Exception as e:
+            self._compter("erreurs_redis")
+            signaler_erreur_redis(e)
+
+    def stats(self) -> dict:
+        with self._lock:
+            compteurs = dict(self._compteurs)
+            taille = len(self._local)
+        hits = compteurs["hits_local"] + compteurs["hits_redis"]
+        total = hits + compteurs["misses"]
+        return {
+            "pid": os.getpid(),
+            "prefixe": self.prefixe,
+            **compteurs,
+            "taux_hit": round(hits / total, 3) if total else 0.0,
+            "taille_locale": taille,
+            "taille_locale_max": self.taille_locale,
+            "redis_actif": get_redis() is not None,
+        }
+
+
+def _normaliser(valeur: Any) -> Any:
+    # "  Climate   Change " et "climate change" sont la même recherche
+    if isinstance(valeur, str):
+        return " ".join(valeur.split()).lower()
+    return valeur
+
+
+class CacheReponses:
+    """
+    Cache TTL de réponses JSON d'API amont, stockées dans Redis sous une clé
+    dérivée du nom de la route et de ses paramètres normalisés. Les appels
+    identiques simultanés d'un même processus attendent le calcul en cours
+    au lieu de relancer l'appel amont. Sans Redis, seul le regroupement
+    reste actif.
+    """
+
+    def __init__(self, prefixe: str, ttl: int):
+        self.prefixe = prefixe
+        self.ttl = ttl
+        self._en_vol: Dict[str, asyncio.Task] = {}
+        self._compteurs = {"hits": 0, "misses": 0, "regroupees": 0, "erreurs_redis": 0}
+
+    def cle(self, nom: str, params: Dict[str, Any]) -> str:
+        normalises = json.dumps({k: _normaliser(v) for k, v in params.items()}, sort_keys=True, default=str)
+        return f"{self.prefixe}:{nom}:{hashlib.sha1(normalises.encode('utf-8')).hexdigest()}"
+
+    async def _lire(self, cle: str) -> Optional[Any]:
+        client = get_redis_async()
+        if client is None:
+            return None
+        try:
+            brut = await client.get(cle)
+        except Exception as e:
+            self._compteurs["erreurs_redis"] += 1
+            signaler_erreur_redis(e)
+            return None
+        return json.loads(brut) if brut is not None else None
+
+    async def _ecrire(self, cle: str, valeur: Any):
+        client = get_redis_async()
+        if client is None:
+            return
+        try:
+            await client.set(cle, json.dumps(valeur, default=str), ex=self.ttl)
+        except Exception as e:
+            self._compteurs["erreurs_redis"] += 1
+            signaler_erreur_redis(e)
+
+    async def obtenir(
+        self,
+        nom: str,
+        params: Dict[str, Any],
+        calculer: Callable[[], Awaitable[Any]],
+        cacher_si: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        Valeur en cache pour (nom, params), sinon résultat de `calculer()`,
+        mis en cache si `cacher_si(valeur)` l'accepte. Une exception de
+        `calculer` est propagée à tous les appels regroupés et rien n'est
+        mis en cache. Le calcul tourne dans une tâche à part : l'annulation
+        d'un appelant, y compris le premier, n'interrompt pas les autres.
+        """
+        cle = self.cle(nom, params)
+        if cle not in self._en_vol:
+            valeur = await self._lire(cle)
+            if valeur is not None:
+                self._compteurs["hits"] += 1
+                return valeur
+        # vérifié après l'await : un appel identique a pu démarrer entre-temps
+        if cle in self._en_vol:
+            self._compteurs["regroupees"] += 1
+        else:
+            self._compteurs["misses"] += 1
+            tache = asyncio.get_running_loop().create_task(self._calculer(cle, calculer, cacher_si))
+            tache.add_done_callback(self._fin_calcul)
+            self._en_vol[cle] = tache
+        return await asyncio.shield(self._en_vol[cle])
+
+    async def _calculer(
+        self,
+        cle: str,
+        calculer: Callable[[], Awaitable[Any]],
+        cacher_si: Optional[Callable[[Any], bool]],
+    ) -> Any:
+        try:
+            valeur = await calculer()
+        finally:
+            self._en_vol.pop(cle, None)
+        if cacher_si is None or cacher_si(valeur):
+            await self._ecrire(cle, valeur)
+        return valeur
+
+    @staticmethod
+    def _fin_calcul(tache: asyncio.Task):
+        # exception marquée comme lue même si tous les appelants ont abandonné
+        if not tache.cancelled():
+            tache.exception()
+
+    def stats(self) -> dict:
+        compteurs = dict(self._compteurs)
+        total = compteurs["hits"] + compteurs["misses"] + compteurs["regroupees"]
+        return {
+            "pid": os.getpid(),
+            "prefixe": self.prefixe,
+            **compteurs,
+            "taux_hit": round((compteurs["hits"] + compteurs["regroupees"]) / total, 3) if total else 0.0,
+            "en_vol": len(self._en_vol),
+            "ttl": self.ttl,
+            "redis_actif": get_redis_async() is not None,
+        }
+
+
+# Réponses des recherches en ligne (OpenAlex, arXiv, recherche globale)
+cache_recherche = CacheReponses("recherche", ttl=int(os.getenv("RECHERCHE_CACHE_TTL", "600")))
@@ -1,9 +1,11 @@
+import os
 from celery import Celery
+from celery.signals import worker_process_init
 from app.database import DatabaseManager
 from app.services.harvester import run_full_pipeline
+from app.pdf_store import migrer_pdfs_historiques
 from app.moissonneur import fetch_openalex_articles, fetch_oai_pmh_articles, reanalyser_tous_les_articles
 from app.logger import logger
-from app.nlp_grobid import detecter_controverse_via_tei
 
 # =========================================
 # 🔧 CONFIGURATION GLOBALE
@@ -18,6 +20,19 @@ SUPPORTED_TABLES = ["articles_openalex", "articles_oai"]
 celery_app = Celery("sofa", broker=BROKER_URL, backend=BACKEND_URL)
 celery_app.config_from_object("app.celeryconfig")
 
+# Les workers de la file "nlp" chargent le modèle au démarrage de chaque
+# processus plutôt qu'à la première requête
+NLP_PRECHARGER = os.getenv("NLP_PRECHARGER", "0") == "1"
+
+
+@worker_process_init.connect
+def precharger_modele_nlp(**kwargs):
+    if not NLP_PRECHARGER:
+        return
+    from app.nlp import get_detecteur_sentiment
+    logger.info("🧠 [Celery] Préchargement du modèle NLP dans le worker")
+    get_detecteur_sentiment()
+
 # =========================================
 # 🟢 TÂCHES CELERY
 # =========================================
@@ -43,6 +58,7 @@ def moissonner():
     try:
         db = DatabaseManager()
         db.create_tables()
+        migrer_pdfs_historiques(db)
         fetch_openalex_articles(db)
         fetch_oai_pmh_articles(db)
         logger.info("✅ [Celery] Moissonnage terminé")
@@ -53,14 +69,14 @@ def moissonner():
             db.close()
 
 @celery_app.task(name="reanalyser.batch")
-def reanalyser_articles_nlp(table="articles_openalex", limit=100):
-    """Réanalyse NLP sur les articles avec texte complet"""
-    logger.info(f"🧠 [Celery] Réanalyse NLP batch sur {table} (max {limit})")
+def reanalyser_articles_nlp(table="articles_openalex", limit=100, forcer=False):
+    """Réanalyse NLP incrémentale (articles jamais scorés, modifiés ou scorés par un autre modèle)"""
+    logger.info(f"🧠 [Celery] Réanalyse NLP batch sur {table} (max {limit}{', forcée' if forcer else ''})")
     try:
         if table not in SUPPORTED_TABLES:
             raise ValueError(f"Table non supportée : {table}")
         db = DatabaseManager()
-        results = reanalyser_tous_les_articles(table, db, limite=limit)
+        results = reanalyser_tous_les_articles(table, db, limite=limit, forcer=forcer)
         logger.info(f"✅ [Celery] Réanalyse NLP terminée ({len(results)} articles)")
         return results
     except Exception as e:
@@ -72,69 +88,29 @@ def reanalyser_articles_nlp(table="articles_openalex", limit=100):
 
 @celery_app.task(name="grobid.batch")
 def analyser_batch_grobid(limit: int = 20):
-    """Analyse GROBID des PDFs non encore traités"""
-    from app.grobid import analyser_avec_grobid
+    """Analyse GROBID des PDFs non encore traités (envoi concurrent, écriture par lots)"""
+    from app.grobid import analyser_grobid_en_attente
     logger.info("📦 [Celery] Lancement batch GROBID sur les PDFs manquants")
-    db = DatabaseManager()
-    cur = db.cur
-    cur.execute("""
-        SELECT id, 'articles_oai' as source FROM articles_oai
-        WHERE texte_complet IS NOT NULL AND id NOT IN (
-            SELECT article_id FROM grobid_metadata WHERE source = 'articles_oai'
-        )
-        LIMIT %s
-        UNION
-        SELECT id, 'articles_openalex' as source FROM articles_openalex
-        WHERE texte_complet IS NOT NULL AND id NOT IN (
-            SELECT article_id FROM grobid_metadata WHERE source = 'articles_openalex'
-        )
-        LIMIT %s;
-    """, (limit, limit))
-    total = 0
-    for article_id, source in cur.fetchall():
-        try:
-            analyser_avec_grobid(source, article_id, save=True)
-            total += 1
-        except Exception as e:
-            logger.warning(f"⚠️ GROBID échoué pour {source} #{article_id} : {e}")
-    db.close()
-    logger.info(f"✅ [Celery] GROBID batch terminé ({total} articles analysés)")
-    return {"total_analysés": total}
+    with DatabaseManager() as db:
+        rapport = analyser_grobid_en_attente(db, limit)
+    logger.info(f"✅ [Celery] GROBID batch terminé ({rapport['ecrits']} articles analysés)")
+    return rapport
 
 @celery_app.task(name="reanalyser.controverses.tei")
 def reanalyser_controverses_tei():
-    """Réanalyse des controverses depuis les TEI XML (GROBID)"""
-    db = DatabaseManager()
-    cur = db.cur
-    cur.execute("SELECT article_id, source, tei_xml FROM grobid_metadata WHERE tei_xml IS NOT NULL;")
-    total = 0
-    for article_id, source, tei_xml in cur.fetchall():
-        try:
-            analyse = detecter_controverse_via_tei(tei_xml)
-            cur.execute(
-                """
-                UPDATE grobid_metadata
-                SET est_controverse_tei = %s,
-                    score_controverse_tei = %s,
-                    extrait_controverse_tei = %s
-                WHERE article_id = %s AND source = %s;
-                """,
-                (
-                    analyse["est_controverse"],
-                    analyse["score"],
-                    analyse["extrait"],
-                    article_id,
-                    source
-                )
-            )
-            total += 1
-        except Exception as e:
-            logger.warning(f"⚠️ Erreur TEI NLP pour {source} #{article_id} : {e}")
-    db.conn.commit()
-    db.close()
+    """Réanalyse des controverses depuis les TEI (structure stockée, sans reparser le XML)"""
+    from app.grobid import reanalyser_tei
+    with DatabaseManager() as db:
+        total = reanalyser_tei(db)
     logger.info(f"✅ [Celery] Réanalyse TEI terminée ({total} articles)")
     return {"articles_analysés": total}
 
+@celery_app.task(name="nlp.detecter_controverses")
+def detecter_controverses_lot(textes):
+    """Inférence NLP sur un micro-lot de textes (file "nlp", voir app.inference)"""
+    from app.nlp import detecter_controverses
+    return detecter_controverses(textes)
+
 @celery_app.task(name="verifier.logs")
 def verifier_logs():
     """Tâche Celery : vérifie les erreurs dans les logs et déclenche une alerte si besoin."""
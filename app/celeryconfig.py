@@ -5,6 +5,11 @@ from celery.schedules import crontab
 broker_url = "redis://redis_mb2:6379/0"
 result_backend = "redis://redis_mb2:6379/0"
 
+# 🧠 L'inférence NLP a sa propre file, servie par le worker celery_nlp_worker
+task_routes = {
+    "nlp.*": {"queue": "nlp"},
+}
+
 # 🕒 Tâches périodiques
 beat_schedule = {
     # Pipeline complet (harvest, extraction, GROBID, NLP)
@@ -29,12 +34,17 @@ beat_schedule = {
         "schedule": crontab(hour=2, minute=0),
         "args": (20,)
     },
-    # 4️⃣ Réanalyse NLP OpenAlex
+    # 4️⃣ Réanalyse NLP incrémentale (OpenAlex puis OAI)
     "reanalyser-articles-openalex-nlp": {
         "task": "reanalyser.batch",
         "schedule": crontab(hour=3, minute=0),
         "args": ("articles_openalex", 50)
     },
+    "reanalyser-articles-oai-nlp": {
+        "task": "reanalyser.batch",
+        "schedule": crontab(hour=3, minute=15),
+        "args": ("articles_oai", 50)
+    },
     # 5️⃣ Réanalyse controverses TEI
     "reanalyser-controverses-tei-quotidien": {
         "task": "reanalyser.controverses.tei",
@@ -1,9 +1,15 @@
+import json
 import os
 import time
+import threading
 import psycopg2
-from psycopg2 import errors
+from psycopg2 import errors, extensions
+from psycopg2.extras import Json, execute_values
+from psycopg2.pool import ThreadedConnectionPool, PoolError
 from app.logger import logger
-from app.nlp_grobid import detecter_controverse_via_tei
+from app.nlp import RESULTAT_ERREUR_NLP, est_erreur_nlp
+from app.nlp_grobid import detecter_controverses_documents, localiser_extrait
+from app.tei import DocumentTEI, lire_tei
 
 
 # === Configuration via .env ===
@@ -23,20 +29,162 @@ POSTGRES_DB = get_env_or_exit("POSTGRES_DB")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST", "localhost")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT", "5432")
 
+ARTICLE_TABLES = ("articles_openalex", "articles_oai")
 
-class DatabaseManager:
-    def __init__(self):
-        try:
-            self.conn = psycopg2.connect(
+# Recherche plein texte : configuration tsvector et taille des lots de migration
+CONFIG_FTS = "english"
+VERSION_MIGRATION_FTS = "1"
+VERSION_STATS_ARTICLES = "1"
+VERSION_NETTOYAGE_CONTENUS = "1"
+# Tranches de score des statistiques : [0, 0.1[, [0.1, 0.2[, ... [0.9, 1]
+NB_TRANCHES_SCORE = 10
+TAILLE_LOT_MIGRATION = int(os.getenv("DB_MIGRATION_BATCH", "1000"))
+
+# Nombre de lignes par requête INSERT multi-valeurs (ingestion en masse)
+TAILLE_LOT_INSERTION = int(os.getenv("DB_INSERT_BATCH", "1000"))
+# Lignes rapatriées par aller-retour du curseur serveur des exports
+TAILLE_LOT_EXPORT = int(os.getenv("DB_EXPORT_ITERSIZE", "2000"))
+
+# Listes d'articles : colonnes exposées et clés de tri de la pagination par clé
+COLONNES_ARTICLE = (
+    "id", "titre", "auteurs", "date_publication", "resume", "lien_pdf", "texte_complet",
+    "est_controverse", "score_controverse", "extrait_controverse",
+)
+TRIS_PAGINATION = {"score": "score_controverse", "date": "date_publication"}
+
+
+# === Pool de connexions (un par processus) ===
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+_pool = None
+_pool_pid = None
+_pool_places = None
+_pool_lock = threading.Lock()
+_pool_stats = {
+    "emprunts": 0,
+    "en_cours": 0,
+    "attente_totale_s": 0.0,
+    "attente_max_s": 0.0,
+    "timeouts": 0,
+    "connexions_invalides": 0,
+}
+
+
+def _get_pool():
+    """
+    Retourne le pool du processus courant, en le (re)créant si besoin.
+    Après un fork (workers Celery, uvicorn), les sockets du parent ne sont
+    jamais réutilisées : le pool est recréé dans l'enfant.
+    """
+    global _pool, _pool_pid, _pool_places
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadedConnectionPool(
+                DB_POOL_MIN,
+                DB_POOL_MAX,
                 dbname=POSTGRES_DB,
                 user=POSTGRES_USER,
                 password=POSTGRES_PASSWORD,
                 host=POSTGRES_HOST,
                 port=POSTGRES_PORT
             )
-            self.conn.autocommit = True
+            _pool_pid = os.getpid()
+            # ThreadedConnectionPool lève une erreur quand il est vide : le
+            # sémaphore permet d'attendre qu'une connexion soit rendue.
+            _pool_places = threading.BoundedSemaphore(DB_POOL_MAX)
+            for key in _pool_stats:
+                _pool_stats[key] = 0 if isinstance(_pool_stats[key], int) else 0.0
+            logger.info(f"📦 Pool PostgreSQL créé (min={DB_POOL_MIN}, max={DB_POOL_MAX})")
+        return _pool, _pool_places
+
+
+def _connexion_valide(conn) -> bool:
+    """Vérifie qu'une connexion du pool est encore utilisable (SELECT 1)."""
+    if conn.closed:
+        return False
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1;")
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _emprunter_connexion():
+    pool, places = _get_pool()
+    debut = time.perf_counter()
+    if not places.acquire(timeout=DB_POOL_TIMEOUT):
+        with _pool_lock:
+            _pool_stats["timeouts"] += 1
+        raise PoolError(f"Pool PostgreSQL saturé après {DB_POOL_TIMEOUT}s d'attente")
+    attente = time.perf_counter() - debut
+
+    try:
+        conn = pool.getconn()
+        conn.autocommit = True
+        while not _connexion_valide(conn):
+            with _pool_lock:
+                _pool_stats["connexions_invalides"] += 1
+            logger.warning("♻️ Connexion PostgreSQL invalide retirée du pool")
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+            conn.autocommit = True
+    except Exception:
+        places.release()
+        raise
+
+    with _pool_lock:
+        _pool_stats["emprunts"] += 1
+        _pool_stats["en_cours"] += 1
+        _pool_stats["attente_totale_s"] += attente
+        _pool_stats["attente_max_s"] = max(_pool_stats["attente_max_s"], attente)
+    return conn
+
+
+def _rendre_connexion(conn):
+    pool, places = _get_pool()
+    try:
+        if not conn.closed and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        if not conn.closed:
+            conn.autocommit = True
+        pool.putconn(conn, close=bool(conn.closed))
+    except Exception as e:
+        logger.warning(f"⚠️ Connexion PostgreSQL non rendue proprement au pool : {e}")
+        pool.putconn(conn, close=True)
+    finally:
+        with _pool_lock:
+            _pool_stats["en_cours"] -= 1
+        places.release()
+
+
+def get_pool_stats() -> dict:
+    """Métriques du pool du processus courant (attente, utilisation)."""
+    with _pool_lock:
+        stats = dict(_pool_stats)
+    emprunts = stats["emprunts"]
+    return {
+        "pid": os.getpid(),
+        "taille_min": DB_POOL_MIN,
+        "taille_max": DB_POOL_MAX,
+        "en_cours": stats["en_cours"],
+        "utilisation": round(stats["en_cours"] / DB_POOL_MAX, 3),
+        "emprunts": emprunts,
+        "attente_moyenne_ms": round(stats["attente_totale_s"] / emprunts * 1000, 3) if emprunts else 0.0,
+        "attente_max_ms": round(stats["attente_max_s"] * 1000, 3),
+        "timeouts": stats["timeouts"],
+        "connexions_invalides": stats["connexions_invalides"],
+    }
+
+
+class DatabaseManager:
+    def __init__(self):
+        try:
+            self.conn = _emprunter_connexion()
             self.cur = self.conn.cursor()
-            logger.info("📦 Connexion à PostgreSQL réussie")
+            logger.debug("📦 Connexion PostgreSQL empruntée au pool")
         except Exception as e:
             self.conn = None
             self.cur = None
@@ -51,8 +199,15 @@ class DatabaseManager:
         self._create_table_articles_oai()
         self._create_table_articles_openalex()
         self._create_table_grobid_metadata()
+        self._create_tables_structure_tei()
         self._create_table_meta()
+        self._create_tables_contenus_pdf()
+        self._nettoyer_articles_contenus()
+        self._ajouter_colonnes_suivi_nlp()
         self.conn.commit()
+        self._migrer_recherche_plein_texte()
+        self._creer_index_pagination()
+        self._creer_stats_articles()
 
     def _create_table_articles_oai(self):
         self.cur.execute("""
@@ -107,8 +262,72 @@ class DatabaseManager:
                 UNIQUE(article_id, source)
             );
         """)
+        # échec GROBID propre au document : définitif (PDF illisible, 400…) il n'est
+        # plus renvoyé ; passager (timeout, 500) il l'est, tentatives_grobid comptant les échecs
+        self.cur.execute("ALTER TABLE grobid_metadata ADD COLUMN IF NOT EXISTS erreur_grobid TEXT;")
+        self.cur.execute("""
+            ALTER TABLE grobid_metadata
+                ADD COLUMN IF NOT EXISTS erreur_grobid_definitive BOOLEAN NOT NULL DEFAULT FALSE,
+                ADD COLUMN IF NOT EXISTS tentatives_grobid INT NOT NULL DEFAULT 0;
+        """)
+        # DocumentTEI (app.tei) du TEI : relu tel quel par les étapes suivantes
+        self.cur.execute("ALTER TABLE grobid_metadata ADD COLUMN IF NOT EXISTS tei_structure JSONB;")
         logger.info("✅ Table 'grobid_metadata' prête.")
 
+    def _create_tables_structure_tei(self):
+        """
+        Forme normalisée de grobid_metadata.tei_structure, tenue à jour par
+        indexer_structures_tei : sections, paragraphes (celui d'où vient
+        l'extrait de controverse est marqué) et références bibliographiques,
+        pour que "qui cite X" ou "paragraphes controversés des sections Y"
+        soient des lectures d'index.
+        """
+        self.cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+        self.cur.execute("""
+            CREATE TABLE IF NOT EXISTS grobid_sections (
+                id BIGSERIAL PRIMARY KEY,
+                grobid_id INT NOT NULL REFERENCES grobid_metadata(id) ON DELETE CASCADE,
+                rang INT NOT NULL,
+                numero TEXT,
+                titre TEXT,
+                UNIQUE (grobid_id, rang)
+            );
+        """)
+        self.cur.execute("CREATE INDEX IF NOT EXISTS idx_grobid_sections_titre ON grobid_sections (lower(titre));")
+        self.cur.execute("""
+            CREATE TABLE IF NOT EXISTS grobid_paragraphes (
+                section_id BIGINT NOT NULL REFERENCES grobid_sections(id) ON DELETE CASCADE,
+                rang INT NOT NULL,
+                texte TEXT NOT NULL,
+                controverse BOOLEAN NOT NULL DEFAULT FALSE,
+                PRIMARY KEY (section_id, rang)
+            );
+        """)
+        # quelques paragraphes marqués parmi des millions : index partiel
+        self.cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_grobid_paragraphes_controverse
+            ON grobid_paragraphes (section_id) WHERE controverse;
+        """)
+        self.cur.execute("""
+            CREATE TABLE IF NOT EXISTS grobid_citations (
+                grobid_id INT NOT NULL REFERENCES grobid_metadata(id) ON DELETE CASCADE,
+                rang INT NOT NULL,
+                ref_id TEXT,
+                titre TEXT,
+                auteurs TEXT[],
+                annee TEXT,
+                revue TEXT,
+                doi TEXT,
+                PRIMARY KEY (grobid_id, rang)
+            );
+        """)
+        self.cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_grobid_citations_doi
+            ON grobid_citations (lower(doi)) WHERE doi IS NOT NULL;
+        """)
+        self.cur.execute("CREATE INDEX IF NOT EXISTS idx_grobid_citations_titre_trgm ON grobid_citations USING GIN (titre gin_trgm_ops);")
+        logger.info("✅ Tables 'grobid_sections', 'grobid_paragraphes' et 'grobid_citations' prêtes.")
+
     def _create_table_meta(self):
         self.cur.execute("""
             CREATE TABLE IF NOT EXISTS meta (
@@ -138,27 +357,546 @@ class DatabaseManager:
             logger.warning(f"⚠️ Doublon détecté dans '{table_name}' pour lien : {lien_pdf}")
             return False
 
-    def get_last_moisson_date(self):
-        self.cur.execute("SELECT value FROM meta WHERE key = 'last_moisson_date';")
+    def _create_tables_contenus_pdf(self):
+        self.cur.execute("""
+            CREATE TABLE IF NOT EXISTS contenus_pdf (
+                sha256 TEXT PRIMARY KEY,
+                chemin TEXT NOT NULL,
+                taille BIGINT,
+                date_ajout TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        self.cur.execute("""
+            CREATE TABLE IF NOT EXISTS articles_contenus (
+                source TEXT NOT NULL,
+                article_id INT NOT NULL,
+                sha256 TEXT NOT NULL REFERENCES contenus_pdf(sha256),
+                PRIMARY KEY (source, article_id)
+            );
+        """)
+        self.cur.execute("CREATE INDEX IF NOT EXISTS idx_articles_contenus_sha256 ON articles_contenus (sha256);")
+        logger.info("✅ Tables 'contenus_pdf' et 'articles_contenus' prêtes.")
+
+    def _nettoyer_articles_contenus(self):
+        """
+        articles_contenus n'a pas de clé étrangère (un article vit dans l'une
+        ou l'autre table) : des triggers par instruction retirent les
+        associations des articles supprimés, sinon le batch GROBID enverrait
+        les PDF d'articles disparus. Installé une fois (clé
+        'articles_contenus_nettoyage'), avec purge des orphelins existants.
+        """
+        if self.get_meta("articles_contenus_nettoyage") == VERSION_NETTOYAGE_CONTENUS:
+            return
+        self.cur.execute("""
+            CREATE OR REPLACE FUNCTION articles_contenus_nettoyage_trigger()
+            RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    DELETE FROM articles_contenus ac
+                    USING anciennes a
+                    WHERE ac.source = TG_ARGV[0] AND ac.article_id = a.id;
+                ELSE
+                    DELETE FROM articles_contenus WHERE source = TG_ARGV[0];
+                END IF;
+                RETURN NULL;
+            END
+            $$;
+        """)
+        for table in ARTICLE_TABLES:
+            self.cur.execute(f"""
+                CREATE OR REPLACE TRIGGER trg_{table}_contenus_delete
+                AFTER DELETE ON {table}
+                REFERENCING OLD TABLE AS anciennes
+                FOR EACH STATEMENT EXECUTE FUNCTION articles_contenus_nettoyage_trigger('{table}');
+            """)
+            self.cur.execute(f"""
+                CREATE OR REPLACE TRIGGER trg_{table}_contenus_truncate
+                AFTER TRUNCATE ON {table}
+                FOR EACH STATEMENT EXECUTE FUNCTION articles_contenus_nettoyage_trigger('{table}');
+            """)
+            self.cur.execute(f"""
+                DELETE FROM articles_contenus ac
+                WHERE ac.source = %s
+                  AND NOT EXISTS (SELECT 1 FROM {table} a WHERE a.id = ac.article_id);
+            """, (table,))
+        self.set_meta("articles_contenus_nettoyage", VERSION_NETTOYAGE_CONTENUS)
+        logger.info("✅ Nettoyage de 'articles_contenus' installé.")
+
+    def _ajouter_colonnes_suivi_nlp(self):
+        # version du modèle et empreinte md5 du texte_complet ayant produit le score
+        # (colonnes sans défaut : ajout instantané, sans réécriture de table)
+        for table in ARTICLE_TABLES:
+            self.cur.execute(f"""
+                ALTER TABLE {table}
+                    ADD COLUMN IF NOT EXISTS nlp_version TEXT,
+                    ADD COLUMN IF NOT EXISTS nlp_texte_hash TEXT;
+            """)
+        # nlp_texte_hash est remis à NULL à l'écriture d'un nouveau texte
+        # (save_text_to_db) : une fois, on aligne les lignes déjà décalées
+        # et celles dont le « verdict » est un échec d'inférence enregistré
+        if self.get_meta("suivi_nlp_hash") != "1":
+            for table in ARTICLE_TABLES:
+                self.cur.execute(f"""
+                    UPDATE {table} SET nlp_texte_hash = NULL
+                    WHERE nlp_texte_hash IS NOT NULL
+                      AND (nlp_texte_hash IS DISTINCT FROM md5(texte_complet)
+                           OR extrait_controverse = %s);
+                """, (RESULTAT_ERREUR_NLP["extrait_controverse"],))
+            self.set_meta("suivi_nlp_hash", "1")
+        logger.info("✅ Colonnes de suivi NLP prêtes.")
+
+    def _migrer_recherche_plein_texte(self):
+        """
+        Ajoute la colonne tsvector 'recherche_tsv' (titre/resume/texte_complet),
+        un trigger qui la maintient, puis la remplit par lots et crée les index
+        GIN (plein texte + trigrammes sur auteurs) avec CONCURRENTLY.
+        Aucune étape ne réécrit la table ni ne la verrouille durablement :
+        la colonne n'a pas de valeur par défaut et le remplissage se fait par
+        petits lots validés un à un. La migration reprend là où elle s'est
+        arrêtée et n'est rejouée qu'une fois (clé 'migration_recherche_fts').
+        """
+        if self.get_meta("migration_recherche_fts") == VERSION_MIGRATION_FTS:
+            return
+
+        logger.info("🔎 Migration recherche plein texte en cours…")
+        self.cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+        self.cur.execute(f"""
+            CREATE OR REPLACE FUNCTION articles_recherche_tsv(titre TEXT, resume TEXT, texte TEXT)
+            RETURNS tsvector LANGUAGE sql IMMUTABLE AS $$
+                SELECT setweight(to_tsvector('{CONFIG_FTS}', coalesce(titre, '')), 'A')
+                    || setweight(to_tsvector('{CONFIG_FTS}', coalesce(resume, '')), 'B')
+                    -- un tsvector est limité à 1 Mo : on borne le texte complet
+                    || setweight(to_tsvector('{CONFIG_FTS}', left(coalesce(texte, ''), 500000)), 'C')
+            $$;
+        """)
+        self.cur.execute("""
+            CREATE OR REPLACE FUNCTION articles_recherche_tsv_trigger()
+            RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                NEW.recherche_tsv := articles_recherche_tsv(NEW.titre, NEW.resume, NEW.texte_complet);
+                RETURN NEW;
+            END
+            $$;
+        """)
+
+        for table in ARTICLE_TABLES:
+            self.cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS recherche_tsv tsvector;")
+            self.cur.execute(f"""
+                CREATE OR REPLACE TRIGGER trg_{table}_recherche_tsv
+                BEFORE INSERT OR UPDATE OF titre, resume, texte_complet ON {table}
+                FOR EACH ROW EXECUTE FUNCTION articles_recherche_tsv_trigger();
+            """)
+            self._remplir_recherche_tsv(table)
+            self.cur.execute(f"""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_{table}_recherche_tsv
+                ON {table} USING GIN (recherche_tsv);
+            """)
+            self.cur.execute(f"""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_{table}_auteurs_trgm
+                ON {table} USING GIN (auteurs gin_trgm_ops);
+            """)
+
+        self.set_meta("migration_recherche_fts", VERSION_MIGRATION_FTS)
+        logger.info("✅ Migration recherche plein texte terminée.")
+
+    def _creer_index_pagination(self):
+        # index des tris de lister_articles (clé de tri, id) pour la pagination par clé
+        for table in ARTICLE_TABLES:
+            for tri, colonne in TRIS_PAGINATION.items():
+                self.cur.execute(f"""
+                    CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_{table}_{tri}_id
+                    ON {table} ({colonne} DESC NULLS LAST, id DESC);
+                """)
+        logger.info("✅ Index de pagination prêts.")
+
+    def _creer_stats_articles(self):
+        """
+        Compteurs d'articles par (source, jour de publication, tranche de
+        score) : /stats et ses ventilations lisent cette petite table au lieu
+        de compter les articles. Des triggers par instruction à tables de
+        transition la tiennent à jour : un INSERT de 1000 articles fait une
+        seule mise à jour agrégée. Installée et remplie une fois (clé
+        'stats_articles'), recalculable avec recalculer_stats_articles.
+        """
+        self.cur.execute("""
+            CREATE TABLE IF NOT EXISTS stats_articles (
+                source TEXT NOT NULL,
+                jour DATE,
+                tranche SMALLINT,
+                total BIGINT NOT NULL DEFAULT 0,
+                controverses BIGINT NOT NULL DEFAULT 0,
+                CONSTRAINT stats_articles_cle UNIQUE NULLS NOT DISTINCT (source, jour, tranche)
+            );
+        """)
+        if self.get_meta("stats_articles") == VERSION_STATS_ARTICLES:
+            return
+
+        logger.info("📊 Installation des compteurs de statistiques…")
+        self.cur.execute(f"""
+            CREATE OR REPLACE FUNCTION stats_tranche_score(score DOUBLE PRECISION)
+            RETURNS SMALLINT LANGUAGE sql IMMUTABLE AS $$
+                SELECT LEAST(GREATEST(floor(score * {NB_TRANCHES_SCORE}), 0), {NB_TRANCHES_SCORE - 1})::SMALLINT
+            $$;
+        """)
+        # TG_ARGV[0] = source. Un trigger n'a que les tables de transition de
+        # son événement : chaque branche ne lit que les siennes (plpgsql ne
+        # prépare une requête qu'à sa première exécution).
+        variations = {
+            "INSERT": "SELECT date_publication AS jour, score_controverse AS score, 1 AS signe, est_controverse FROM nouvelles",
+            "DELETE": "SELECT date_publication AS jour, score_controverse AS score, -1 AS signe, est_controverse FROM anciennes",
+        }
+        variations["UPDATE"] = f"{variations['INSERT']} UNION ALL {variations['DELETE']}"
+        # HAVING : la plupart des UPDATE (texte, extrait, suivi NLP) ne déplacent aucun compteur
+        branches = "\n".join(f"""
+                {"IF" if n == 0 else "ELSIF"} TG_OP = '{evenement}' THEN
+                    INSERT INTO stats_articles AS s (source, jour, tranche, total, controverses)
+                    SELECT TG_ARGV[0], jour, stats_tranche_score(score), sum(signe),
+                           coalesce(sum(signe) FILTER (WHERE est_controverse), 0)
+                    FROM ({requete}) AS v
+                    GROUP BY 2, 3
+                    HAVING sum(signe) <> 0 OR sum(signe) FILTER (WHERE est_controverse) <> 0
+                    ON CONFLICT ON CONSTRAINT stats_articles_cle DO UPDATE
+                    SET total = s.total + EXCLUDED.total,
+                        controverses = s.controverses + EXCLUDED.controverses;"""
+            for n, (evenement, requete) in enumerate(variations.items())
+        )
+        self.cur.execute(f"""
+            CREATE OR REPLACE FUNCTION stats_articles_trigger()
+            RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                {branches}
+                ELSIF TG_OP = 'TRUNCATE' THEN
+                    DELETE FROM stats_articles WHERE source = TG_ARGV[0];
+                END IF;
+                RETURN NULL;
+            END
+            $$;
+        """)
+        for table in ARTICLE_TABLES:
+            self.recalculer_stats_articles(table)
+        self.set_meta("stats_articles", VERSION_STATS_ARTICLES)
+        logger.info("✅ Compteurs de statistiques prêts.")
+
+    def recalculer_stats_articles(self, table: str):
+        """
+        (Ré)installe les triggers de statistiques de `table` et recompte ses
+        articles, sous verrou bloquant les écritures le temps du comptage :
+        aucune ligne n'est comptée deux fois ni oubliée.
+        """
+        if table not in ARTICLE_TABLES:
+            raise ValueError(f"Table non autorisée : {table}")
+        source = table.replace("articles_", "", 1)
+        self.conn.autocommit = False
+        try:
+            self.cur.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE;")
+            for evenement, transitions in (
+                ("INSERT", "NEW TABLE AS nouvelles"),
+                ("DELETE", "OLD TABLE AS anciennes"),
+                ("UPDATE", "OLD TABLE AS anciennes NEW TABLE AS nouvelles"),
+            ):
+                # une table de transition n'est permise que sur un trigger à événement unique
+                self.cur.execute(f"""
+                    CREATE OR REPLACE TRIGGER trg_{table}_stats_{evenement.lower()}
+                    AFTER {evenement} ON {table}
+                    REFERENCING {transitions}
+                    FOR EACH STATEMENT EXECUTE FUNCTION stats_articles_trigger('{source}');
+                """)
+            self.cur.execute(f"""
+                CREATE OR REPLACE TRIGGER trg_{table}_stats_truncate
+                AFTER TRUNCATE ON {table}
+                FOR EACH STATEMENT EXECUTE FUNCTION stats_articles_trigger('{source}');
+            """)
+            self.cur.execute("DELETE FROM stats_articles WHERE source = %s;", (source,))
+            self.cur.execute(f"""
+                INSERT INTO stats_articles (source, jour, tranche, total, controverses)
+                SELECT %s, date_publication, stats_tranche_score(score_controverse),
+                       count(*), count(*) FILTER (WHERE est_controverse)
+                FROM {table}
+                GROUP BY 2, 3;
+            """, (source,))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self.conn.autocommit = True
+        logger.info(f"✅ Statistiques recalculées pour '{table}'")
+
+    def ventiler_stats_articles(self, axe: str = "source", source: str = None,
+                                date_debut=None, date_fin=None):
+        """
+        Totaux d'articles et de controverses lus dans stats_articles, par
+        `axe` ("source", "jour" ou "tranche"), éventuellement restreints à
+        une source et à une période de publication.
+        Retourne [(valeur de l'axe, total, controverses), ...] triée par axe.
+        """
+        if axe not in ("source", "jour", "tranche"):
+            raise ValueError(f"Axe de ventilation inconnu : {axe}")
+        conditions = ["TRUE"]
+        params = []
+        if source:
+            conditions.append("source = %s")
+            params.append(source)
+        if date_debut:
+            conditions.append("jour >= %s")
+            params.append(date_debut)
+        if date_fin:
+            conditions.append("jour <= %s")
+            params.append(date_fin)
+        self.cur.execute(f"""
+            SELECT {axe}, sum(total)::BIGINT, sum(controverses)::BIGINT
+            FROM stats_articles
+            WHERE {" AND ".join(conditions)}
+            GROUP BY {axe}
+            HAVING sum(total) <> 0
+            ORDER BY {axe} NULLS LAST;
+        """, params)
+        return self.cur.fetchall()
+
+    def _remplir_recherche_tsv(self, table: str):
+        """Remplit 'recherche_tsv' des lignes existantes par lots d'identifiants."""
+        dernier_id = 0
+        total = 0
+        while True:
+            self.cur.execute(f"""
+                SELECT max(id) FROM (
+                    SELECT id FROM {table} WHERE id > %s ORDER BY id LIMIT %s
+                ) lot;
+            """, (dernier_id, TAILLE_LOT_MIGRATION))
+            fin_lot = self.cur.fetchone()[0]
+            if fin_lot is None:
+                break
+            self.cur.execute(f"""
+                UPDATE {table}
+                SET recherche_tsv = articles_recherche_tsv(titre, resume, texte_complet)
+                WHERE id > %s AND id <= %s AND recherche_tsv IS NULL;
+            """, (dernier_id, fin_lot))
+            total += self.cur.rowcount
+            self.conn.commit()
+            dernier_id = fin_lot
+        logger.info(f"✅ Index plein texte rempli pour '{table}' ({total} lignes)")
+
+    def lister_articles(self, table: str, tri: str = "score", apres=None, limit: int = 20,
+                        colonnes=None, seuil: float = None, controverses_seulement: bool = False):
+        """
+        Page d'articles en pagination par clé, dans l'ordre
+        <clé de tri> DESC NULLS LAST, id DESC (index idx_<table>_<tri>_id) :
+        le coût d'une page ne dépend pas de sa position.
+        - apres : (valeur de la clé de tri, id) de la dernière ligne de la page précédente
+        - colonnes : colonnes à renvoyer parmi COLONNES_ARTICLE (toutes par défaut)
+        - seuil / controverses_seulement : filtre sur score_controverse / est_controverse
+        Retourne (lignes en dicts, clé (valeur, id) de la page suivante ou None).
+        """
+        if table not in ARTICLE_TABLES:
+            raise ValueError(f"Table non autorisée : {table}")
+        cle_tri = TRIS_PAGINATION[tri]
+        demandees = [c for c in COLONNES_ARTICLE if colonnes is None or c in colonnes]
+        selection = list(dict.fromkeys(["id", cle_tri, *demandees]))
+
+        filtres = []
+        params = []
+        if controverses_seulement:
+            filtres.append("est_controverse = TRUE")
+        if seuil is not None:
+            filtres.append("score_controverse >= %s")
+            params.append(seuil)
+
+        # Deux parcours bornés de l'index, dans son ordre : clés non NULL après
+        # le curseur par comparaison de lignes seule, puis clés NULL par id
+        # (NULLS LAST). Un OR entre les deux empêcherait de borner l'index.
+        ordre = f"{cle_tri} DESC NULLS LAST, id DESC"
+        parties = []
+        if apres is None:
+            parties.append((f"{cle_tri} IS NOT NULL", []))
+            parties.append((f"{cle_tri} IS NULL", []))
+        elif apres[0] is not None:
+            parties.append((f"({cle_tri}, id) < (%s, %s)", list(apres)))
+            parties.append((f"{cle_tri} IS NULL", []))
+        else:
+            parties.append((f"{cle_tri} IS NULL AND id < %s", [apres[1]]))
+
+        # une ligne de plus pour savoir s'il existe une page suivante
+        sous_requetes = []
+        parametres = []
+        for seek, seek_params in parties:
+            sous_requetes.append(f"""
+                (SELECT {", ".join(selection)} FROM {table}
+                 WHERE {" AND ".join([*filtres, seek])}
+                 ORDER BY {ordre}
+                 LIMIT %s)""")
+            parametres.extend([*params, *seek_params, limit + 1])
+        self.cur.execute(f"""
+            SELECT * FROM ({" UNION ALL ".join(sous_requetes)}) page
+            ORDER BY {ordre}
+            LIMIT %s;
+        """, (*parametres, limit + 1))
+        lignes = [dict(zip(selection, row)) for row in self.cur.fetchall()]
+
+        suivante = None
+        if len(lignes) > limit:
+            lignes = lignes[:limit]
+            suivante = (lignes[-1][cle_tri], lignes[-1]["id"])
+        return [{c: ligne[c] for c in demandees} for ligne in lignes], suivante
+
+    def iterer_articles(self, table: str, colonnes=None, itersize: int = TAILLE_LOT_EXPORT):
+        """
+        Parcourt toute la table par ordre d'id via un curseur nommé (curseur
+        côté serveur) : seules `itersize` lignes sont en mémoire à la fois.
+        Produit des dicts limités à `colonnes` (toutes par défaut).
+        La connexion quitte le mode autocommit le temps du parcours (un
+        curseur nommé vit dans une transaction) : fermer le générateur
+        avant de rendre la connexion.
+        """
+        if table not in ARTICLE_TABLES:
+            raise ValueError(f"Table non autorisée : {table}")
+        selection = [c for c in COLONNES_ARTICLE if colonnes is None or c in colonnes]
+        conn = self.conn
+        conn.autocommit = False
+        try:
+            with conn.cursor(name=f"export_{table}") as cur:
+                cur.itersize = itersize
+                cur.execute(f"SELECT {', '.join(selection)} FROM {table} ORDER BY id;")
+                for row in cur:
+                    yield dict(zip(selection, row))
+        finally:
+            if not conn.closed:
+                conn.rollback()
+                conn.autocommit = True
+
+    def rechercher_articles(self, table: str, mot_cle=None, auteur=None, date_debut=None,
+                            date_fin=None, tri: str = "date_desc", limit: int = 10, offset: int = 0):
+        """
+        Recherche plein texte dans une table d'articles.
+        Le mot-clé est interprété par websearch_to_tsquery (guillemets, OR, -exclusion)
+        sur l'index GIN 'recherche_tsv' ; l'auteur passe par l'index trigramme.
+        Retourne (total, lignes) ; le total est calculé dans la même requête.
+        """
+        if table not in ARTICLE_TABLES:
+            raise ValueError(f"Table non autorisée : {table}")
+
+        conditions = []
+        params = []
+        rang = "NULL::real"
+        source = table
+        if mot_cle:
+            source += f", websearch_to_tsquery('{CONFIG_FTS}', %s) AS requete"
+            params.append(mot_cle)
+            conditions.append("recherche_tsv @@ requete")
+            rang = "ts_rank(recherche_tsv, requete)"
+        if auteur:
+            conditions.append("auteurs ILIKE %s")
+            params.append(f"%{auteur}%")
+        if date_debut:
+            conditions.append("date_publication >= %s")
+            params.append(date_debut)
+        if date_fin:
+            conditions.append("date_publication <= %s")
+            params.append(date_fin)
+        where = " AND ".join(conditions) or "TRUE"
+
+        if tri == "pertinence" and mot_cle:
+            order = "rang DESC, date_publication DESC NULLS LAST, id DESC"
+        elif tri == "date_asc":
+            order = "date_publication ASC"
+        else:
+            order = "date_publication DESC"
+
+        self.cur.execute(f"""
+            SELECT id, titre, auteurs, date_publication, resume, lien_pdf, texte_complet,
+                   {rang} AS rang, COUNT(*) OVER () AS total
+            FROM {source}
+            WHERE {where}
+            ORDER BY {order}
+            LIMIT %s OFFSET %s;
+        """, (*params, limit, offset))
+        rows = self.cur.fetchall()
+
+        if rows:
+            total = rows[0][-1]
+        elif offset:
+            # page au-delà des résultats : le total doit quand même être renvoyé
+            self.cur.execute(f"SELECT COUNT(*) FROM {source} WHERE {where};", tuple(params))
+            total = self.cur.fetchone()[0]
+        else:
+            total = 0
+        return total, rows
+
+    def get_meta(self, key: str):
+        self.cur.execute("SELECT value FROM meta WHERE key = %s;", (key,))
         row = self.cur.fetchone()
         return row[0] if row else None
 
-    def set_last_moisson_date(self, date_str):
+    def set_meta(self, key: str, value: str):
         self.cur.execute("""
-            INSERT INTO meta (key, value) VALUES ('last_moisson_date', %s)
+            INSERT INTO meta (key, value) VALUES (%s, %s)
             ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value;
-        """, (date_str,))
+        """, (key, value))
         self.conn.commit()
 
+    def insert_articles_batch(self, table_name: str, articles: list) -> dict:
+        """
+        Insère un lot d'articles moissonnés (dicts avec titre, auteurs,
+        date_publication, resume, lien_pdf) via INSERT multi-valeurs.
+        Les doublons, déjà en base ou répétés dans le lot, sont écartés par
+        ON CONFLICT (lien_pdf) DO NOTHING.
+        Retourne {lien_pdf: id} pour les seuls articles nouvellement insérés.
+        """
+        if table_name not in ARTICLE_TABLES:
+            logger.error(f"❌ Table non autorisée : {table_name}")
+            return {}
+
+        lignes = {}
+        for article in articles:
+            lien_pdf = article.get("lien_pdf")
+            if lien_pdf and lien_pdf not in lignes:
+                lignes[lien_pdf] = (
+                    article.get("titre"),
+                    article.get("auteurs"),
+                    article.get("date_publication"),
+                    article.get("resume") or "",
+                    lien_pdf,
+                )
+        if not lignes:
+            return {}
+
+        try:
+            inseres = execute_values(self.cur, f"""
+                INSERT INTO {table_name} (titre, auteurs, date_publication, resume, lien_pdf)
+                VALUES %s
+                ON CONFLICT (lien_pdf) DO NOTHING
+                RETURNING id, lien_pdf;
+            """, list(lignes.values()), page_size=TAILLE_LOT_INSERTION, fetch=True)
+            self.conn.commit()
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            logger.error(f"❌ Erreur insertion en masse dans '{table_name}' : {e}")
+            return {}
+
+        nouveaux = {lien_pdf: article_id for article_id, lien_pdf in inseres}
+        logger.info(
+            f"✅ {len(nouveaux)} articles insérés dans '{table_name}' "
+            f"({len(articles) - len(nouveaux)} doublons ignorés)"
+        )
+        return nouveaux
+
+    def get_last_moisson_date(self):
+        return self.get_meta("last_moisson_date")
+
+    def set_last_moisson_date(self, date_str):
+        self.set_meta("last_moisson_date", date_str)
+
     def save_text_to_db(self, article_id: int, text: str, table_name: str = "articles_openalex"):
         if table_name not in ("articles_openalex", "articles_oai"):
             logger.error(f"❌ Table non autorisée : {table_name}")
             return
         try:
             self.cur.execute(f"""
-                UPDATE {table_name}
-                SET texte_complet = %s
-                WHERE id = %s;
+                UPDATE {table_name} AS a
+                SET texte_complet = v.texte,
+                    -- texte modifié : le score n'est plus à jour (voir articles_a_reanalyser)
+                    nlp_texte_hash = CASE WHEN a.texte_complet IS DISTINCT FROM v.texte THEN NULL ELSE a.nlp_texte_hash END
+                FROM (SELECT %s::text AS texte) AS v
+                WHERE a.id = %s;
             """, (text, article_id))
             self.conn.commit()
             logger.info(f"✅ Texte complet sauvegardé pour article {article_id} dans {table_name}")
@@ -166,15 +904,50 @@ class DatabaseManager:
             self.conn.rollback()
             logger.error(f"❌ Erreur sauvegarde texte complet : {e}")
 
-    def save_controverse_to_db(self, table: str, article_id: int, est_controverse: bool, score: float, extrait: str = None):
+    def save_texts_to_db(self, table_name: str, textes: list) -> int:
+        """
+        Version par lot de save_text_to_db : `textes` est une liste de
+        (article_id, texte) écrite en un seul UPDATE ... FROM (VALUES ...).
+        Retourne le nombre d'articles mis à jour.
+        """
+        if table_name not in ARTICLE_TABLES:
+            logger.error(f"❌ Table non autorisée : {table_name}")
+            return 0
+        if not textes:
+            return 0
+        try:
+            execute_values(self.cur, f"""
+                UPDATE {table_name} AS a
+                SET texte_complet = v.texte,
+                    nlp_texte_hash = CASE WHEN a.texte_complet IS DISTINCT FROM v.texte THEN NULL ELSE a.nlp_texte_hash END
+                FROM (VALUES %s) AS v(id, texte)
+                WHERE a.id = v.id;
+            """, textes, template="(%s::int, %s::text)", page_size=TAILLE_LOT_INSERTION)
+            self.conn.commit()
+            logger.info(f"✅ {len(textes)} textes complets sauvegardés dans {table_name}")
+            return len(textes)
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            logger.error(f"❌ Erreur sauvegarde des textes complets dans {table_name} : {e}")
+            return 0
+
+    def save_controverse_to_db(self, table: str, article_id: int, est_controverse: bool, score: float, extrait: str = None,
+                               nlp_version: str = None, texte_hash: str = None):
+        """
+        Enregistre le verdict NLP. `nlp_version` et `texte_hash` (md5 du
+        texte_complet analysé) permettent à la réanalyse incrémentale de
+        ne reprendre que les lignes modifiées ou scorées par un autre modèle.
+        """
         try:
             self.cur.execute(f"""
                 UPDATE {table}
                 SET est_controverse = %s,
                     score_controverse = %s,
-                    extrait_controverse = %s
+                    extrait_controverse = %s,
+                    nlp_version = %s,
+                    nlp_texte_hash = %s
                 WHERE id = %s;
-            """, (est_controverse, score, extrait, article_id))
+            """, (est_controverse, score, extrait, nlp_version, texte_hash, article_id))
             self.conn.commit()
             logger.info(f"🧠 Controverse NLP enregistrée pour {table} ID={article_id}")
         except Exception as e:
@@ -183,13 +956,17 @@ class DatabaseManager:
 
     def save_grobid_metadata(self, article_id, source, titre, resume, auteurs, citations, tei_xml, extrait_resume=None):
         try:
-            analyse = detecter_controverse_via_tei(tei_xml)
+            document = lire_tei(tei_xml)
+            analyse = detecter_controverses_documents([document])[0]
+            if est_erreur_nlp(analyse):
+                analyse = dict.fromkeys(analyse)
             self.cur.execute("""
                 INSERT INTO grobid_metadata (
                     article_id, source, titre, resume, auteurs, citations, tei_xml,
-                    extrait_resume, est_controverse_tei, score_controverse_tei, extrait_controverse_tei
+                    extrait_resume, est_controverse_tei, score_controverse_tei, extrait_controverse_tei,
+                    tei_structure
                 )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 ON CONFLICT (article_id, source) DO UPDATE SET
                     titre = EXCLUDED.titre,
                     resume = EXCLUDED.resume,
@@ -200,20 +977,399 @@ class DatabaseManager:
                     est_controverse_tei = EXCLUDED.est_controverse_tei,
                     score_controverse_tei = EXCLUDED.score_controverse_tei,
                     extrait_controverse_tei = EXCLUDED.extrait_controverse_tei,
-                    date_extraction = CURRENT_TIMESTAMP;
+                    tei_structure = EXCLUDED.tei_structure,
+                    date_extraction = CURRENT_TIMESTAMP
+                RETURNING id;
             """, (
-                article_id, source, titre, resume, auteurs, str(citations), tei_xml,
+                article_id, source, titre, resume, auteurs, json.dumps(citations, ensure_ascii=False), tei_xml,
                 extrait_resume,
                 analyse["est_controverse"],
-                analyse["score"],
-                analyse["extrait"]
+                analyse["score_controverse"],
+                analyse["extrait_controverse"],
+                Json(document.en_dict())
             ))
+            grobid_id = self.cur.fetchone()[0]
             self.conn.commit()
+            self.indexer_structures_tei([grobid_id])
             logger.info(f"📥 GROBID/TEI sauvegardé pour {source} ID={article_id}")
         except Exception as e:
             self.conn.rollback()
             logger.error(f"❌ Erreur GROBID metadata : {e}")
 
+    def save_grobid_metadata_lot(self, lignes: list) -> int:
+        """
+        Version par lot de save_grobid_metadata : `lignes` est une liste de
+        tuples (article_id, source, titre, resume, auteurs, citations, tei_xml,
+        extrait_resume, est_controverse_tei, score_controverse_tei,
+        extrait_controverse_tei, erreur_grobid, erreur_grobid_definitive,
+        tei_structure) déjà analysés, écrite en un seul INSERT ... ON CONFLICT,
+        puis indexée (indexer_structures_tei). tei_structure est un dict
+        (DocumentTEI.en_dict) ou None. Chaque échec incrémente
+        tentatives_grobid, un succès le remet à zéro.
+        Retourne le nombre de lignes écrites.
+        """
+        if not lignes:
+            return 0
+        lignes = [
+            (*ligne[:-1], int(ligne[-3] is not None), Json(ligne[-1]) if ligne[-1] is not None else None)
+            for ligne in lignes
+        ]
+        try:
+            ecrites = execute_values(self.cur, """
+                INSERT INTO grobid_metadata (
+                    article_id, source, titre, resume, auteurs, citations, tei_xml,
+                    extrait_resume, est_controverse_tei, score_controverse_tei, extrait_controverse_tei,
+                    erreur_grobid, erreur_grobid_definitive, tentatives_grobid, tei_structure
+                )
+                VALUES %s
+                ON CONFLICT (article_id, source) DO UPDATE SET
+                    titre = EXCLUDED.titre,
+                    resume = EXCLUDED.resume,
+                    auteurs = EXCLUDED.auteurs,
+                    citations = EXCLUDED.citations,
+                    tei_xml = EXCLUDED.tei_xml,
+                    extrait_resume = EXCLUDED.extrait_resume,
+                    est_controverse_tei = EXCLUDED.est_controverse_tei,
+                    score_controverse_tei = EXCLUDED.score_controverse_tei,
+                    extrait_controverse_tei = EXCLUDED.extrait_controverse_tei,
+                    erreur_grobid = EXCLUDED.erreur_grobid,
+                    erreur_grobid_definitive = EXCLUDED.erreur_grobid_definitive,
+                    tentatives_grobid = CASE WHEN EXCLUDED.erreur_grobid IS NULL THEN 0
+                                             ELSE grobid_metadata.tentatives_grobid + 1 END,
+                    tei_structure = EXCLUDED.tei_structure,
+                    date_extraction = CURRENT_TIMESTAMP
+                RETURNING id;
+            """, lignes, page_size=TAILLE_LOT_INSERTION, fetch=True)
+            self.conn.commit()
+            self.indexer_structures_tei([grobid_id for (grobid_id,) in ecrites])
+            return len(lignes)
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            logger.error(f"❌ Erreur sauvegarde GROBID par lot ({len(lignes)} lignes) : {e}")
+            return 0
+
+    def articles_sans_grobid(self, limite: int, reessais_max: int = 0, pause_reessai: float = 0):
+        """
+        Articles dont le PDF est stocké mais qui n'ont pas encore de ligne
+        grobid_metadata (jointure servie par l'index unique (article_id,
+        source)), ou dont le dernier envoi a subi un échec passager : ceux-ci
+        sont repris après pause_reessai * 2^(échecs - 1) secondes, tant
+        qu'ils ont échoué moins de `reessais_max` fois.
+        Retourne [(source, article_id, sha256, chemin), ...].
+        """
+        self.cur.execute("""
+            SELECT ac.source, ac.article_id, c.sha256, c.chemin
+            FROM articles_contenus ac
+            JOIN contenus_pdf c ON c.sha256 = ac.sha256
+            LEFT JOIN grobid_metadata g ON g.article_id = ac.article_id AND g.source = ac.source
+            WHERE g.id IS NULL
+               OR (g.erreur_grobid IS NOT NULL AND NOT g.erreur_grobid_definitive
+                   AND g.tentatives_grobid < %(reessais_max)s
+                   AND g.date_extraction < LOCALTIMESTAMP
+                       - make_interval(secs => %(pause)s * 2 ^ GREATEST(g.tentatives_grobid - 1, 0)))
+            ORDER BY ac.source, ac.article_id
+            LIMIT %(limite)s;
+        """, {"limite": limite, "reessais_max": reessais_max, "pause": pause_reessai})
+        return self.cur.fetchall()
+
+    def copier_grobid_par_hash(self, items: list) -> set:
+        """
+        Pour chaque (source, article_id, sha256) de `items`, recopie la ligne
+        grobid_metadata d'un autre article ayant le même PDF, s'il y en a
+        une (TEI et analyse réutilisés, sans appel GROBID ni NLP). Une ligne
+        en échec de l'article (reprise d'un échec passager) est remplacée.
+        Retourne l'ensemble des (source, article_id) servis ainsi.
+        """
+        if not items:
+            return set()
+        try:
+            copies = execute_values(self.cur, """
+                INSERT INTO grobid_metadata (
+                    article_id, source, titre, resume, auteurs, citations, tei_xml,
+                    extrait_resume, est_controverse_tei, score_controverse_tei, extrait_controverse_tei,
+                    tei_structure
+                )
+                SELECT DISTINCT ON (v.source, v.article_id)
+                    v.article_id, v.source, g.titre, g.resume, g.auteurs, g.citations, g.tei_xml,
+                    g.extrait_resume, g.est_controverse_tei, g.score_controverse_tei, g.extrait_controverse_tei,
+                    g.tei_structure
+                FROM (VALUES %s) AS v(source, article_id, sha256)
+                JOIN articles_contenus ac ON ac.sha256 = v.sha256
+                JOIN grobid_metadata g ON g.source = ac.source AND g.article_id = ac.article_id
+                WHERE g.tei_xml IS NOT NULL
+                ON CONFLICT (article_id, source) DO UPDATE SET
+                    titre = EXCLUDED.titre,
+                    resume = EXCLUDED.resume,
+                    auteurs = EXCLUDED.auteurs,
+                    citations = EXCLUDED.citations,
+                    tei_xml = EXCLUDED.tei_xml,
+                    extrait_resume = EXCLUDED.extrait_resume,
+                    est_controverse_tei = EXCLUDED.est_controverse_tei,
+                    score_controverse_tei = EXCLUDED.score_controverse_tei,
+                    extrait_controverse_tei = EXCLUDED.extrait_controverse_tei,
+                    tei_structure = EXCLUDED.tei_structure,
+                    erreur_grobid = NULL,
+                    erreur_grobid_definitive = FALSE,
+                    tentatives_grobid = 0,
+                    date_extraction = CURRENT_TIMESTAMP
+                WHERE grobid_metadata.tei_xml IS NULL
+                RETURNING id, source, article_id;
+            """, items, template="(%s::text, %s::int, %s::text)", page_size=TAILLE_LOT_INSERTION, fetch=True)
+            self.conn.commit()
+            self.indexer_structures_tei([grobid_id for grobid_id, _, _ in copies])
+            return {(source, article_id) for _, source, article_id in copies}
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            logger.error(f"❌ Erreur réutilisation TEI par hash : {e}")
+            return set()
+
+    def grobid_a_reanalyser(self, apres_id: int, limite: int, version_structure: int):
+        """
+        Lot suivant (pagination par clé sur id) des TEI à réanalyser :
+        [(id, tei_structure, tei_xml), ...]. Le XML n'est rapatrié que si la
+        structure manque ou date d'une autre version de l'extraction.
+        """
+        self.cur.execute("""
+            SELECT id, tei_structure,
+                   CASE WHEN tei_structure IS NULL OR (tei_structure->>'version')::int IS DISTINCT FROM %s
+                        THEN tei_xml END
+            FROM grobid_metadata
+            WHERE tei_xml IS NOT NULL AND id > %s
+            ORDER BY id
+            LIMIT %s;
+        """, (version_structure, apres_id, limite))
+        return self.cur.fetchall()
+
+    def save_analyses_tei_lot(self, lignes: list) -> int:
+        """
+        Écrit par lot les verdicts TEI : `lignes` = [(id, tei_structure ou
+        None, citations (JSON) ou None, est_controverse, score, extrait), ...].
+        Une structure ou des citations None laissent la valeur stockée inchangée. Ne sont réindexées que les
+        lignes dont la structure ou le verdict change, ou pas encore indexées
+        (la réanalyse complète sert ainsi de rattrapage de l'index).
+        """
+        if not lignes:
+            return 0
+        lignes = [(i, Json(structure) if structure is not None else None, *reste)
+                  for i, structure, *reste in lignes]
+        try:
+            # `avant` est la ligne telle qu'avant l'UPDATE
+            modifiees = execute_values(self.cur, """
+                UPDATE grobid_metadata AS g
+                SET tei_structure = COALESCE(v.structure, g.tei_structure),
+                    citations = COALESCE(v.citations, g.citations),
+                    est_controverse_tei = v.est,
+                    score_controverse_tei = v.score,
+                    extrait_controverse_tei = v.extrait
+                FROM (VALUES %s) AS v(id, structure, citations, est, score, extrait)
+                JOIN grobid_metadata AS avant ON avant.id = v.id
+                WHERE g.id = v.id
+                RETURNING g.id,
+                    v.structure IS NOT NULL
+                    OR avant.est_controverse_tei IS DISTINCT FROM v.est
+                    OR avant.extrait_controverse_tei IS DISTINCT FROM v.extrait
+                    OR NOT (EXISTS (SELECT 1 FROM grobid_sections s WHERE s.grobid_id = g.id)
+                            OR EXISTS (SELECT 1 FROM grobid_citations c WHERE c.grobid_id = g.id));
+            """, lignes, template="(%s::int, %s::jsonb, %s::text, %s::boolean, %s::float, %s::text)",
+                page_size=TAILLE_LOT_INSERTION, fetch=True)
+            self.conn.commit()
+            self.indexer_structures_tei([grobid_id for grobid_id, a_indexer in modifiees if a_indexer])
+            return len(lignes)
+        except psycopg2.Error as e:
+            self.conn.rollback()
+            logger.error(f"❌ Erreur sauvegarde des analyses TEI ({len(lignes)} lignes) : {e}")
+            return 0
+
+    def indexer_structures_tei(self, ids) -> int:
+        """
+        (Ré)écrit grobid_sections, grobid_paragraphes et grobid_citations des
+        lignes grobid_metadata `ids` à partir de leur tei_structure, en une
+        transaction. Pour un TEI jugé controversé, le paragraphe contenant
+        extrait_controverse_tei est marqué (controverse = TRUE).
+        Retourne le nombre de documents indexés.
+        """
+        ids = list(ids)
+        if not ids:
+            return 0
+        self.conn.autocommit = False
+        try:
+            # FOR UPDATE : deux indexations concurrentes d'un même TEI s'attendent
+            self.cur.execute("""
+                SELECT id, tei_structure, est_controverse_tei, extrait_controverse_tei
+                FROM grobid_metadata
+                WHERE id = ANY(%s) AND tei_structure IS NOT NULL
+                FOR UPDATE;
+            """, (ids,))
+            documents = self.cur.fetchall()
+
+            sections, paragraphes, citations = [], {}, []
+            for grobid_id, structure, est_controverse, extrait in documents:
+                document = DocumentTEI.depuis_dict(structure)
+                position = localiser_extrait(document, extrait) if est_controverse else None
+                for i, section in enumerate(document.sections):
+                    sections.append((grobid_id, i, section.numero, section.titre or None))
+                    paragraphes[(grobid_id, i)] = [
+                        (j, texte, (i, j) == position) for j, texte in enumerate(section.paragraphes)
+                    ]
+                citations.extend(
+                    (grobid_id, k, ref.id, ref.titre or None, ref.auteurs, ref.annee, ref.revue, ref.doi)
+                    for k, ref in enumerate(document.bibliographie)
+                )
+
+            # les paragraphes suivent leurs sections (ON DELETE CASCADE)
+            self.cur.execute("DELETE FROM grobid_sections WHERE grobid_id = ANY(%s);", (ids,))
+            self.cur.execute("DELETE FROM grobid_citations WHERE grobid_id = ANY(%s);", (ids,))
+            if sections:
+                ids_sections = execute_values(self.cur, """
+                    INSERT INTO grobid_sections (grobid_id, rang, numero, titre)
+                    VALUES %s
+                    RETURNING grobid_id, rang, id;
+                """, sections, page_size=TAILLE_LOT_INSERTION, fetch=True)
+                execute_values(self.cur, """
+                    INSERT INTO grobid_paragraphes (section_id, rang, texte, controverse) VALUES %s;
+                """, [
+                    (section_id, *paragraphe)
+                    for grobid_id, rang, section_id in ids_sections
+                    for paragraphe in paragraphes[(grobid_id, rang)]
+                ], page_size=TAILLE_LOT_INSERTION)
+            if citations:
+                execute_values(self.cur, """
+                    INSERT INTO grobid_citations (grobid_id, rang, ref_id, titre, auteurs, annee, revue, doi)
+                    VALUES %s;
+                """, citations, page_size=TAILLE_LOT_INSERTION)
+            self.conn.commit()
+            return len(documents)
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"❌ Erreur indexation des structures TEI ({len(ids)} documents) : {e}")
+            return 0
+        finally:
+            self.conn.autocommit = True
+
+    def articles_citant(self, titre: str = None, doi: str = None, limit: int = 20):
+        """
+        Articles dont la bibliographie (grobid_citations) contient une
+        référence au DOI donné (index sur lower(doi)) ou dont le titre
+        contient `titre` (index trigramme). Retourne
+        [(source, article_id, titre de l'article, titre cité, annee, doi), ...].
+        """
+        if doi:
+            condition, param = "lower(c.doi) = lower(%s)", doi
+        elif titre:
+            condition, param = "c.titre ILIKE %s", f"%{titre}%"
+        else:
+            raise ValueError("Un titre ou un DOI cité est requis")
+        self.cur.execute(f"""
+            SELECT DISTINCT ON (g.id) g.source, g.article_id, g.titre, c.titre, c.annee, c.doi
+            FROM grobid_citations c
+            JOIN grobid_metadata g ON g.id = c.grobid_id
+            WHERE {condition}
+            ORDER BY g.id, c.rang
+            LIMIT %s;
+        """, (param, limit))
+        return self.cur.fetchall()
+
+    def paragraphes_controverses(self, section: str = None, limit: int = 20):
+        """
+        Paragraphes marqués controversés (index partiel), éventuellement
+        limités aux sections intitulées `section` (casse ignorée, index sur
+        lower(titre)), du score TEI le plus fort au plus faible. Retourne
+        [(source, article_id, titre, numero de section, titre de section,
+        paragraphe, score_controverse_tei), ...].
+        """
+        condition, params = "TRUE", []
+        if section:
+            condition, params = "lower(s.titre) = lower(%s)", [section]
+        self.cur.execute(f"""
+            SELECT g.source, g.article_id, g.titre, s.numero, s.titre, p.texte, g.score_controverse_tei
+            FROM grobid_paragraphes p
+            JOIN grobid_sections s ON s.id = p.section_id
+            JOIN grobid_metadata g ON g.id = s.grobid_id
+            WHERE p.controverse AND {condition}
+            ORDER BY g.score_controverse_tei DESC NULLS LAST, g.id
+            LIMIT %s;
+        """, (*params, limit))
+        return self.cur.fetchall()
+
+    def associer_contenu_pdf(self, source: str, article_id: int, sha256: str, chemin: str):
+        """Enregistre le PDF (adressé par son SHA-256) d'un article."""
+        try:
+            self.cur.execute("""
+                INSERT INTO contenus_pdf (sha256, chemin, taille)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (sha256) DO NOTHING;
+            """, (sha256, chemin, os.path.getsize(chemin) if os.path.exists(chemin) else None))
+            self.cur.execute("""
+                INSERT INTO articles_contenus (source, article_id, sha256)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (source, article_id) DO UPDATE SET sha256 = EXCLUDED.sha256;
+            """, (source, article_id, sha256))
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            logger.error(f"❌ Erreur association PDF {sha256[:12]} à {source} ID={article_id} : {e}")
+
+    def get_contenu_pdf(self, source: str, article_id: int):
+        """Retourne (sha256, chemin) du PDF d'un article, ou None."""
+        self.cur.execute("""
+            SELECT c.sha256, c.chemin
+            FROM articles_contenus ac JOIN contenus_pdf c ON c.sha256 = ac.sha256
+            WHERE ac.source = %s AND ac.article_id = %s;
+        """, (source, article_id))
+        return self.cur.fetchone()
+
+    def trouver_analyse_par_hash(self, sha256: str):
+        """
+        Cherche un article déjà traité (verdict à jour de son texte) ayant le même PDF et retourne
+        (texte_complet, est_controverse, score_controverse, extrait_controverse,
+        nlp_version, nlp_texte_hash), ou None.
+        """
+        requetes = [
+            f"""
+            SELECT a.texte_complet, a.est_controverse, a.score_controverse, a.extrait_controverse,
+                   a.nlp_version, a.nlp_texte_hash
+            FROM articles_contenus ac JOIN {table} a ON a.id = ac.article_id
+            WHERE ac.source = '{table}' AND ac.sha256 = %s
+              AND a.texte_complet IS NOT NULL AND a.score_controverse IS NOT NULL
+              AND a.nlp_texte_hash IS NOT NULL
+            """
+            for table in ARTICLE_TABLES
+        ]
+        self.cur.execute(" UNION ALL ".join(requetes) + " LIMIT 1;", (sha256,) * len(requetes))
+        return self.cur.fetchone()
+
+    def articles_existants(self, table: str, ids: list) -> set:
+        """Sous-ensemble de `ids` présents dans la table d'articles `table`."""
+        if table not in ARTICLE_TABLES:
+            raise ValueError(f"Table non autorisée : {table}")
+        if not ids:
+            return set()
+        self.cur.execute(f"SELECT id FROM {table} WHERE id = ANY(%s);", (ids,))
+        return {article_id for (article_id,) in self.cur.fetchall()}
+
+    def articles_a_reanalyser(self, table: str, apres_id: int, nlp_version: str, limite: int, forcer: bool = False):
+        """
+        Lot suivant (pagination par clé sur id) des articles dont le score
+        NLP est absent, périmé (autre nlp_version) ou calculé sur un autre
+        texte (nlp_texte_hash remis à NULL quand le texte est réécrit : le
+        filtre ne relit pas texte_complet). Avec `forcer`, tous les articles
+        avec texte.
+        Retourne [(id, texte_complet), ...].
+        """
+        if table not in ARTICLE_TABLES:
+            logger.error(f"❌ Table non autorisée : {table}")
+            return []
+        condition = "" if forcer else """
+              AND (nlp_texte_hash IS NULL OR nlp_version IS DISTINCT FROM %(version)s)"""
+        self.cur.execute(f"""
+            SELECT id, texte_complet
+            FROM {table}
+            WHERE id > %(apres_id)s AND texte_complet IS NOT NULL{condition}
+            ORDER BY id
+            LIMIT %(limite)s;
+        """, {"apres_id": apres_id, "version": nlp_version, "limite": limite})
+        return self.cur.fetchall()
+
     def get_article_by_id(self, table_name: str, article_id: int):
         if not self.conn or not self.cur:
             logger.error("❌ Connexion non initialisée.")
@@ -229,9 +1385,11 @@ class DatabaseManager:
     def close(self):
         if self.cur:
             self.cur.close()
+            self.cur = None
         if self.conn:
-            self.conn.close()
-        logger.info("🔒 Connexion PostgreSQL fermée.")
+            _rendre_connexion(self.conn)
+            self.conn = None
+        logger.debug("🔒 Connexion PostgreSQL rendue au pool.")
 
     # Support pour "with"
     def __enter__(self):
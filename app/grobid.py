@@ -0,0 +1,309 @@
+# app/grobid.py
+"""
+Moteur GROBID par lots : sélection des PDF stockés sans ligne
+grobid_metadata, réutilisation du TEI déjà produit pour un même PDF
+(même SHA-256), envoi concurrent des autres à GROBID via ClientGrobid,
+une seule lecture de chaque TEI, inférence NLP par lots et écriture par
+lots de grobid_metadata. Le rapport donne le débit et la latence GROBID
+par document.
+
+Essai de bout en bout sans GROBID :
+    python -m app.grobid_stub --port 8070 &
+    GROBID_URL=http://localhost:8070/api/processFulltextDocument python -m app.grobid 50
+"""
+import asyncio
+import json
+import os
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from lxml import etree
+
+from app.database import DatabaseManager
+from app.grobid_client import ClientGrobid, GrobidErreur, GrobidIndisponible
+from app.logger import logger
+from app.nlp import est_erreur_nlp
+from app.nlp_grobid import detecter_controverses_documents
+from app.tei import VERSION_STRUCTURE_TEI, DocumentTEI, lire_tei
+
+# Documents analysés (NLP) et écrits en base ensemble
+GROBID_TAILLE_LOT = int(os.getenv("GROBID_TAILLE_LOT", "20"))
+# Échec passager (timeout, 500) : renvois max, le n-ième après GROBID_PAUSE_REESSAI * 2^(n-1) s
+GROBID_REESSAIS_MAX = int(os.getenv("GROBID_REESSAIS_MAX", "5"))
+GROBID_PAUSE_REESSAI = float(os.getenv("GROBID_PAUSE_REESSAI", "3600"))
+
+# Colonnes grobid_metadata écrites par lot, après (article_id, source)
+COLONNES_LIGNE = (
+    "titre", "resume", "auteurs", "citations", "tei_xml", "extrait_resume",
+    "est_controverse_tei", "score_controverse_tei", "extrait_controverse_tei", "erreur_grobid",
+    "erreur_grobid_definitive", "tei_structure",
+)
+
+
+def _lire_pdf(chemin: str) -> bytes:
+    with open(chemin, "rb") as f:
+        return f.read()
+
+
+async def _produire_tei(
+    chemins: Dict[str, str], latences: List[float]
+) -> AsyncIterator[Tuple[str, Optional[str], Optional[str], bool]]:
+    """
+    Envoie à GROBID les PDF de `chemins` = {sha256: chemin} et produit
+    (sha256, tei ou None, erreur ou None, erreur définitive) dans l'ordre de
+    fin. Un PDF n'est lu qu'au moment de son envoi. GrobidIndisponible
+    interrompt tout.
+    """
+    if not chemins:
+        # rien à envoyer : GROBID n'est pas sollicité (ni même configuré)
+        return
+    client = ClientGrobid()
+    places = asyncio.Semaphore(client.concurrence)
+
+    async def traiter(sha256: str, chemin: str):
+        async with places:
+            try:
+                contenu = await asyncio.to_thread(_lire_pdf, chemin)
+                debut = time.perf_counter()
+                tei = await client.traiter_pdf(contenu, os.path.basename(chemin))
+                latences.append(time.perf_counter() - debut)
+                return sha256, tei, None, False
+            except GrobidIndisponible:
+                raise
+            except GrobidErreur as e:
+                logger.warning(f"⚠️ GROBID échoué pour {chemin} : {e}")
+                return sha256, None, str(e)[:500], e.definitive
+            except OSError as e:
+                logger.warning(f"⚠️ PDF illisible {chemin} : {e}")
+                return sha256, None, str(e)[:500], True
+
+    taches = [asyncio.create_task(traiter(sha256, chemin)) for sha256, chemin in chemins.items()]
+    try:
+        for prochaine in asyncio.as_completed(taches):
+            yield await prochaine
+    finally:
+        for tache in taches:
+            tache.cancel()
+        await asyncio.gather(*taches, return_exceptions=True)
+        await client.fermer()
+
+
+def _preparer_lignes(resultats: List[Tuple[str, Optional[str], Optional[str], bool]],
+                     articles_par_hash: Dict[str, List[Tuple[str, int]]]) -> List[tuple]:
+    """Lignes grobid_metadata d'un lot de TEI : une lecture par TEI, une inférence NLP pour tout le lot."""
+    documents: Dict[str, DocumentTEI] = {}
+    for sha256, tei, _, _ in resultats:
+        if tei is None:
+            continue
+        try:
+            documents[sha256] = lire_tei(tei)
+        except etree.XMLSyntaxError as e:
+            logger.warning(f"⚠️ TEI illisible pour {sha256[:12]} : {e}")
+    verdicts = dict(zip(documents, detecter_controverses_documents(list(documents.values()))))
+
+    lignes = []
+    for sha256, tei, erreur, definitive in resultats:
+        doc = documents.get(sha256)
+        if doc is None:
+            # TEI illisible : GROBID renverrait le même
+            valeurs = (None, None, None, None, None, None, None, None, None,
+                       erreur or "TEI illisible", definitive or erreur is None, None)
+        else:
+            verdict = verdicts[sha256]
+            if est_erreur_nlp(verdict):
+                # verdict laissé vide : la réanalyse TEI le calculera
+                verdict = dict.fromkeys(verdict)
+            valeurs = (
+                doc.titre, doc.resume, ", ".join(doc.auteurs), json.dumps(doc.citations(), ensure_ascii=False), tei, None,
+                verdict["est_controverse"], verdict["score_controverse"], verdict["extrait_controverse"],
+                None, False, doc.en_dict(),
+            )
+        for source, article_id in articles_par_hash[sha256]:
+            lignes.append((article_id, source, *valeurs))
+    return lignes
+
+
+def _rapport(nb_articles: int, nb_reutilises: int, nb_ecrits: int, nb_echecs: int,
+             latences: List[float], duree: float, interrompu: Optional[str]) -> dict:
+    latences = sorted(latences)
+
+    def centile(p: float) -> float:
+        return round(latences[min(len(latences) - 1, int(p * len(latences)))], 3) if latences else 0.0
+
+    return {
+        "articles": nb_articles,
+        "reutilises": nb_reutilises,
+        "envoyes_grobid": len(latences) + nb_echecs,
+        "ecrits": nb_ecrits,
+        "echecs": nb_echecs,
+        "duree_s": round(duree, 2),
+        "documents_par_s": round(len(latences) / duree, 2) if duree else 0.0,
+        "latence_moyenne_s": round(sum(latences) / len(latences), 3) if latences else 0.0,
+        "latence_p50_s": centile(0.5),
+        "latence_p95_s": centile(0.95),
+        "latence_max_s": round(latences[-1], 3) if latences else 0.0,
+        "interrompu": interrompu,
+    }
+
+
+async def _analyser(db: DatabaseManager, items: List[Tuple[str, int, str, str]],
+                    taille_lot: int, enregistrer: bool = True) -> Tuple[dict, List[tuple]]:
+    debut = time.perf_counter()
+    reutilises = set()
+    if enregistrer:
+        reutilises = await asyncio.to_thread(
+            db.copier_grobid_par_hash, [(source, article_id, sha256) for source, article_id, sha256, _ in items]
+        )
+
+    # un même PDF partagé par plusieurs articles n'est envoyé qu'une fois
+    articles_par_hash: Dict[str, List[Tuple[str, int]]] = {}
+    chemins: Dict[str, str] = {}
+    for source, article_id, sha256, chemin in items:
+        if (source, article_id) in reutilises:
+            continue
+        articles_par_hash.setdefault(sha256, []).append((source, article_id))
+        chemins.setdefault(sha256, chemin)
+
+    latences: List[float] = []
+    lot, toutes_lignes = [], []
+    nb_ecrits, nb_echecs, interrompu = len(reutilises), 0, None
+
+    async def vider():
+        nonlocal lot, nb_ecrits
+        lignes = await asyncio.to_thread(_preparer_lignes, lot, articles_par_hash)
+        lot = []
+        if enregistrer:
+            nb_ecrits += await asyncio.to_thread(db.save_grobid_metadata_lot, lignes)
+        else:
+            toutes_lignes.extend(lignes)
+
+    try:
+        async for resultat in _produire_tei(chemins, latences):
+            lot.append(resultat)
+            nb_echecs += resultat[1] is None
+            if len(lot) >= taille_lot:
+                await vider()
+    except GrobidIndisponible as e:
+        interrompu = str(e)
+        logger.error(f"⛔ Batch GROBID interrompu : {e}")
+    except GrobidErreur as e:
+        # client impossible à créer (GROBID_URL absent) : seules les copies par hash sont faites
+        interrompu = str(e)
+        logger.error(f"⛔ Batch GROBID impossible : {e}")
+    if lot:
+        await vider()
+
+    return _rapport(len(items), len(reutilises), nb_ecrits, nb_echecs,
+                    latences, time.perf_counter() - debut, interrompu), toutes_lignes
+
+
+def analyser_lot_grobid(db: DatabaseManager, items: List[Tuple[str, int, str, str]],
+                        taille_lot: int = GROBID_TAILLE_LOT) -> dict:
+    """
+    Analyse GROBID + NLP de `items` = [(source, article_id, sha256, chemin), ...]
+    et écrit grobid_metadata par lots de `taille_lot`. Un échec propre au
+    document est enregistré (erreur_grobid) : définitif, il n'est plus
+    renvoyé ; passager, il l'est après un délai croissant
+    (articles_sans_grobid). GROBID indisponible arrête le lot sans rien marquer.
+    Retourne le rapport (débit, latences, échecs).
+    """
+    rapport, _ = asyncio.run(_analyser(db, items, taille_lot))
+    logger.info(
+        f"✅ GROBID : {rapport['ecrits']}/{rapport['articles']} articles "
+        f"({rapport['reutilises']} réutilisés, {rapport['echecs']} échecs) en {rapport['duree_s']}s, "
+        f"{rapport['documents_par_s']} doc/s, latence p50={rapport['latence_p50_s']}s p95={rapport['latence_p95_s']}s"
+    )
+    return rapport
+
+
+def analyser_grobid_en_attente(db: DatabaseManager, limite: int = 20) -> dict:
+    """
+    Traite jusqu'à `limite` articles dont le PDF n'est pas encore passé par
+    GROBID, ou dont l'échec passager peut être retenté (back-off exponentiel).
+    """
+    return analyser_lot_grobid(db, db.articles_sans_grobid(limite, GROBID_REESSAIS_MAX, GROBID_PAUSE_REESSAI))
+
+
+def analyser_avec_grobid(source: str, article_id: int, save: bool = True) -> Optional[dict]:
+    """
+    Analyse GROBID d'un article dont le PDF est stocké. Retourne ses
+    métadonnées (titre, résumé, auteurs, TEI, verdict de controverse),
+    ou None si l'article n'a pas de PDF ou si GROBID a échoué.
+    """
+    with DatabaseManager() as db:
+        contenu = db.get_contenu_pdf(source, article_id)
+        if not contenu:
+            logger.warning(f"⚠️ Aucun PDF stocké pour {source} #{article_id}")
+            return None
+        item = (source, article_id, *contenu)
+        if save:
+            analyser_lot_grobid(db, [item])
+            db.cur.execute(f"""
+                SELECT {", ".join(COLONNES_LIGNE)}
+                FROM grobid_metadata WHERE article_id = %s AND source = %s;
+            """, (article_id, source))
+            valeurs = db.cur.fetchone()
+        else:
+            _, lignes = asyncio.run(_analyser(db, [item], 1, enregistrer=False))
+            valeurs = lignes[0][2:] if lignes else None
+
+    if not valeurs:
+        return None
+    ligne = dict(zip(COLONNES_LIGNE, valeurs))
+    ligne.pop("erreur_grobid_definitive")
+    if ligne.pop("erreur_grobid") or not ligne["tei_xml"]:
+        return None
+    return {"source": source, "article_id": article_id, **ligne}
+
+
+def reanalyser_tei(db: DatabaseManager, taille_lot: int = GROBID_TAILLE_LOT) -> int:
+    """
+    Recalcule le verdict de controverse de tous les TEI stockés, par lots
+    (pagination par clé sur id, une inférence NLP par lot). Le texte vient
+    de tei_structure ; le XML n'est relu que pour les lignes sans structure
+    (ou d'une version antérieure), dont la structure est alors enregistrée.
+    La colonne citations est réécrite en JSON depuis la structure (rattrapage
+    des lignes qui portent encore la repr Python de l'ancien format).
+    Retourne le nombre de lignes mises à jour.
+    """
+    apres_id, total = 0, 0
+    while True:
+        lignes = db.grobid_a_reanalyser(apres_id, taille_lot, VERSION_STRUCTURE_TEI)
+        if not lignes:
+            break
+        documents, nouvelles_structures, citations = [], [], []
+        for _, structure, tei_xml in lignes:
+            nouvelle = None
+            lisible = True
+            if tei_xml is None:
+                document = DocumentTEI.depuis_dict(structure)
+            else:
+                try:
+                    document = lire_tei(tei_xml)
+                    nouvelle = document.en_dict()
+                except etree.XMLSyntaxError as e:
+                    logger.warning(f"⚠️ TEI illisible : {e}")
+                    document = DocumentTEI()
+                    lisible = False
+            documents.append(document)
+            nouvelles_structures.append(nouvelle)
+            # TEI illisible : les citations stockées sont laissées telles quelles
+            citations.append(json.dumps(document.citations(), ensure_ascii=False) if lisible else None)
+
+        verdicts = detecter_controverses_documents(documents)
+        # inférence en échec : la ligne garde son verdict précédent jusqu'au prochain passage
+        total += db.save_analyses_tei_lot([
+            (ligne[0], structure, cites, v["est_controverse"], v["score_controverse"], v["extrait_controverse"])
+            for ligne, structure, cites, v in zip(lignes, nouvelles_structures, citations, verdicts)
+            if not est_erreur_nlp(v)
+        ])
+        apres_id = lignes[-1][0]
+    logger.info(f"✅ Réanalyse TEI terminée ({total} lignes)")
+    return total
+
+
+if __name__ == "__main__":
+    import sys
+
+    with DatabaseManager() as db:
+        print(json.dumps(analyser_grobid_en_attente(db, int(sys.argv[1]) if len(sys.argv) > 1 else 20), indent=2))
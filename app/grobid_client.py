@@ -0,0 +1,233 @@
+# app/grobid_client.py
+"""
+Client GROBID asynchrone : connexions keep-alive réutilisées, nombre de
+documents en vol borné (à régler sur le nombre de threads de traitement
+du serveur GROBID), réponses 503 réessayées après le délai Retry-After et
+disjoncteur qui coupe les appels quand le serveur ne répond plus.
+
+Un client est lié à la boucle d'événements qui l'a créé : l'API utilise
+celui de get_client_grobid(), un traitement par lot (asyncio.run) crée
+le sien.
+"""
+import asyncio
+import os
+import random
+import time
+from typing import Optional
+
+import httpx
+
+from app.logger import logger
+from app.utils import secondes_retry_after
+
+GROBID_URL = os.getenv("GROBID_URL")
+# Documents envoyés en même temps (≈ "concurrency" de grobid.yaml)
+GROBID_CONCURRENCE = int(os.getenv("GROBID_CONCURRENCE", "4"))
+GROBID_TIMEOUT_CONNEXION = float(os.getenv("GROBID_TIMEOUT_CONNEXION", "10"))
+GROBID_TIMEOUT = float(os.getenv("GROBID_TIMEOUT", "300"))
+# Tentatives max par document quand GROBID répond 503 (serveur saturé)
+GROBID_TENTATIVES = int(os.getenv("GROBID_TENTATIVES", "5"))
+# Attente max (s) entre deux tentatives, Retry-After compris
+GROBID_ATTENTE_MAX = float(os.getenv("GROBID_ATTENTE_MAX", "60"))
+# Disjoncteur : échecs consécutifs avant ouverture, puis durée d'ouverture (s)
+GROBID_SEUIL_ECHECS = int(os.getenv("GROBID_SEUIL_ECHECS", "5"))
+GROBID_PAUSE_DISJONCTEUR = float(os.getenv("GROBID_PAUSE_DISJONCTEUR", "60"))
+
+# Erreurs de transport qui signifient que le serveur ne répond plus ; les
+# autres (ReadTimeout sur un document lourd...) ne concernent qu'un document
+ERREURS_INDISPONIBLE = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+
+
+class GrobidErreur(Exception):
+    """
+    Échec de traitement d'un document par GROBID. `definitive` : le
+    document lui-même est refusé (204, 400), le renvoyer ne changera rien ;
+    sinon (timeout, 500…) l'échec peut être passager.
+    """
+
+    def __init__(self, message: str, definitive: bool = False):
+        super().__init__(message)
+        self.definitive = definitive
+
+
+class GrobidIndisponible(GrobidErreur):
+    """GROBID injoignable ou disjoncteur ouvert : inutile d'envoyer d'autres documents."""
+
+
+class Disjoncteur:
+    """
+    Fermé : les appels passent. Après `seuil` échecs consécutifs il s'ouvre
+    et refuse tout appel pendant `pause` secondes, puis laisse passer un
+    seul appel d'essai (semi-ouvert) : un succès le referme, un échec le
+    rouvre pour une nouvelle pause.
+    """
+
+    def __init__(self, seuil: int = GROBID_SEUIL_ECHECS, pause: float = GROBID_PAUSE_DISJONCTEUR):
+        self.seuil = seuil
+        self.pause = pause
+        self.echecs = 0
+        self.ouvert_jusqua = 0.0
+        self.essai_en_cours = False
+
+    @property
+    def etat(self) -> str:
+        if self.echecs < self.seuil:
+            return "fermé"
+        return "ouvert" if time.monotonic() < self.ouvert_jusqua else "semi-ouvert"
+
+    def autoriser(self) -> bool:
+        """Lève GrobidIndisponible si l'appel est refusé ; True si c'est l'appel d'essai."""
+        etat = self.etat
+        if etat == "ouvert" or (etat == "semi-ouvert" and self.essai_en_cours):
+            restant = max(0.0, self.ouvert_jusqua - time.monotonic())
+            raise GrobidIndisponible(f"Disjoncteur GROBID ouvert (réessai dans {restant:.0f}s)")
+        if etat == "semi-ouvert":
+            self.essai_en_cours = True
+            return True
+        return False
+
+    def succes(self):
+        if self.echecs >= self.seuil:
+            logger.info("✅ GROBID répond de nouveau, disjoncteur refermé")
+        self.echecs = 0
+        self.essai_en_cours = False
+
+    def echec(self):
+        deja_ouvert = self.etat == "ouvert"
+        self.echecs += 1
+        self.essai_en_cours = False
+        if self.echecs >= self.seuil and not deja_ouvert:
+            self.ouvert_jusqua = time.monotonic() + self.pause
+            logger.error(f"⛔ GROBID en échec ({self.echecs} de suite), disjoncteur ouvert {self.pause:.0f}s")
+
+
+def _delai_retry_after(valeur: Optional[str], tentative: int) -> float:
+    """Délai de l'en-tête Retry-After (secondes ou date HTTP), sinon backoff exponentiel avec gigue."""
+    delai = secondes_retry_after(valeur)
+    if delai is None:
+        delai = min(2 ** tentative, GROBID_ATTENTE_MAX) * random.uniform(0.5, 1.0)
+    return min(max(delai, 0.0), GROBID_ATTENTE_MAX)
+
+
+class ClientGrobid:
+    """
+    traiter_pdf(contenu, nom) -> TEI XML. Au plus `concurrence` documents
+    sont envoyés à la fois ; les suivants attendent leur tour sans bloquer
+    la boucle d'événements.
+    """
+
+    def __init__(self, url: Optional[str] = None, concurrence: int = GROBID_CONCURRENCE,
+                 tentatives: int = GROBID_TENTATIVES, disjoncteur: Optional[Disjoncteur] = None):
+        self.url = url or GROBID_URL
+        if not self.url:
+            raise GrobidErreur("GROBID_URL n'est pas configuré")
+        self.concurrence = max(1, concurrence)
+        self.tentatives = max(1, tentatives)
+        self.disjoncteur = disjoncteur or Disjoncteur()
+        self._places = asyncio.Semaphore(self.concurrence)
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(GROBID_TIMEOUT, connect=GROBID_TIMEOUT_CONNEXION),
+            limits=httpx.Limits(
+                max_connections=self.concurrence,
+                max_keepalive_connections=self.concurrence,
+            ),
+        )
+        self._compteurs = {"documents": 0, "en_vol": 0, "en_attente": 0, "reponses_503": 0, "echecs": 0}
+
+    async def _poster(self, contenu: bytes, nom: str) -> httpx.Response:
+        self._compteurs["en_attente"] += 1
+        try:
+            await self._places.acquire()
+        finally:
+            self._compteurs["en_attente"] -= 1
+        self._compteurs["en_vol"] += 1
+        try:
+            return await self._client.post(self.url, files={"input": (nom, contenu, "application/pdf")})
+        finally:
+            self._compteurs["en_vol"] -= 1
+            self._places.release()
+
+    async def traiter_pdf(self, contenu: bytes, nom: str) -> str:
+        try:
+            tei = await self._traiter(contenu, nom)
+        except GrobidErreur:
+            self._compteurs["echecs"] += 1
+            raise
+        self._compteurs["documents"] += 1
+        return tei
+
+    async def _traiter(self, contenu: bytes, nom: str) -> str:
+        essai = self.disjoncteur.autoriser()
+        try:
+            return await self._envoyer(contenu, nom)
+        finally:
+            # essai annulé ou sans verdict (erreur propre au document) : un autre appel pourra le refaire
+            if essai:
+                self.disjoncteur.essai_en_cours = False
+
+    async def _envoyer(self, contenu: bytes, nom: str) -> str:
+        for tentative in range(1, self.tentatives + 1):
+            # le disjoncteur a pu s'ouvrir pendant l'attente (échecs d'autres documents)
+            if tentative > 1 and self.disjoncteur.etat == "ouvert":
+                raise GrobidIndisponible(f"Disjoncteur GROBID ouvert, {nom} abandonné")
+            try:
+                resp = await self._poster(contenu, nom)
+            except ERREURS_INDISPONIBLE as e:
+                self.disjoncteur.echec()
+                raise GrobidIndisponible(f"GROBID injoignable pour {nom} : {e!r}") from e
+            except httpx.HTTPError as e:
+                raise GrobidErreur(f"Échec de l'envoi de {nom} à GROBID : {e!r}") from e
+
+            if resp.status_code == 503:
+                # serveur saturé, pas en panne : on patiente sans occuper de place
+                self._compteurs["reponses_503"] += 1
+                delai = _delai_retry_after(resp.headers.get("Retry-After"), tentative)
+                logger.warning(f"⏳ GROBID saturé (503) pour {nom}, tentative {tentative}/{self.tentatives}, attente {delai:.1f}s")
+                await asyncio.sleep(delai)
+                continue
+
+            self.disjoncteur.succes()
+            if resp.status_code != 200:
+                # 204 (aucun résultat), 400, 500 : le document est en cause, pas le serveur ;
+                # un 500 ("[GENERAL] An exception occurred") peut toutefois passer au renvoi
+                raise GrobidErreur(
+                    f"GROBID {resp.status_code} pour {nom} : {resp.text[:200]}",
+                    definitive=resp.status_code in (204, 400),
+                )
+            if "<TEI" not in resp.text:
+                raise GrobidErreur(f"Réponse TEI invalide pour {nom}")
+            return resp.text
+
+        self.disjoncteur.echec()
+        raise GrobidIndisponible(f"GROBID toujours saturé après {self.tentatives} tentatives pour {nom}")
+
+    def stats(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "url": self.url,
+            "concurrence": self.concurrence,
+            **self._compteurs,
+            "disjoncteur": self.disjoncteur.etat,
+            "echecs_consecutifs": self.disjoncteur.echecs,
+        }
+
+    async def fermer(self):
+        await self._client.aclose()
+
+
+_client_api: Optional[ClientGrobid] = None
+
+
+def get_client_grobid() -> ClientGrobid:
+    """Client partagé par les routes de l'API, créé au premier appel."""
+    global _client_api
+    if _client_api is None:
+        _client_api = ClientGrobid()
+    return _client_api
+
+
+async def fermer_client_grobid():
+    global _client_api
+    if _client_api is not None:
+        await _client_api.fermer()
+        _client_api = None
@@ -0,0 +1,127 @@
+# app/grobid_stub.py
+"""
+Faux serveur GROBID pour les essais locaux : répond à
+POST /api/processFulltextDocument par un TEI fixe, avec une latence et une
+capacité réglables. Au-delà de `--concurrence` documents simultanés il
+répond 503 + Retry-After, comme GROBID quand son pool est plein.
+
+    python -m app.grobid_stub --port 8070 --latence 0.5 --concurrence 4
+    GROBID_URL=http://localhost:8070/api/processFulltextDocument
+"""
+import argparse
+import random
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TEI_FACTICE = """<?xml version="1.0" encoding="UTF-8"?>
+<TEI xmlns="http://www.tei-c.org/ns/1.0">
+  <teiHeader>
+    <fileDesc>
+      <titleStmt><title level="a" type="main">{titre}</title></titleStmt>
+      <sourceDesc>
+        <biblStruct>
+          <analytic>
+            <author><persName><forename type="first">Jeanne</forename><surname>Martin</surname></persName></author>
+            <author><persName><forename type="first">Paul</forename><surname>Durand</surname></persName></author>
+          </analytic>
+          <monogr><imprint><date type="published" when="2023-05-04">2023-05-04</date></imprint></monogr>
+        </biblStruct>
+      </sourceDesc>
+    </fileDesc>
+    <profileDesc>
+      <abstract><div><p>This study revisits a disputed result and reports conflicting evidence.</p></div></abstract>
+    </profileDesc>
+  </teiHeader>
+  <text>
+    <body>
+      <div><head n="1">Introduction</head>
+        <p>Earlier findings have been widely debated and several replications failed.</p>
+      </div>
+      <div><head n="2">Results</head>
+        <p>Our measurements contradict the original claim, which remains controversial.</p>
+      </div>
+    </body>
+    <back>
+      <div type="references">
+        <listBibl>
+          <biblStruct xml:id="b0">
+            <analytic>
+              <title level="a" type="main">A landmark result</title>
+              <author><persName><forename type="first">Ada</forename><surname>Smith</surname></persName></author>
+            </analytic>
+            <monogr><imprint><date type="published" when="2019">2019</date></imprint></monogr>
+          </biblStruct>
+          <biblStruct xml:id="b1">
+            <analytic>
+              <title level="a" type="main">Failed replication of a landmark result</title>
+              <author><persName><forename type="first">Li</forename><surname>Wang</surname></persName></author>
+            </analytic>
+            <monogr><imprint><date type="published" when="2021">2021</date></imprint></monogr>
+          </biblStruct>
+        </listBibl>
+      </div>
+    </back>
+  </text>
+</TEI>
+"""
+
+
+def creer_serveur(port: int, latence: float, concurrence: int, retry_after: int, taux_erreur: float):
+    places = threading.BoundedSemaphore(concurrence)
+    compteur = {"documents": 0}
+
+    class Gestionnaire(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _repondre(self, code: int, corps: str = "", entetes=None):
+            donnees = corps.encode("utf-8")
+            self.send_response(code)
+            for cle, valeur in (entetes or {}).items():
+                self.send_header(cle, valeur)
+            self.send_header("Content-Length", str(len(donnees)))
+            self.end_headers()
+            self.wfile.write(donnees)
+
+        def do_GET(self):
+            if self.path == "/api/isalive":
+                self._repondre(200, "true")
+            else:
+                self._repondre(404)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if not self.path.startswith("/api/processFulltextDocument"):
+                return self._repondre(404)
+            if not places.acquire(blocking=False):
+                return self._repondre(503, entetes={"Retry-After": str(retry_after)})
+            try:
+                time.sleep(latence * random.uniform(0.5, 1.5))
+                if random.random() < taux_erreur:
+                    return self._repondre(500, "[GENERAL] An exception occurred while running Grobid.")
+                compteur["documents"] += 1
+                tei = TEI_FACTICE.format(titre=escape(f"Document de test {compteur['documents']}"))
+                self._repondre(200, tei, {"Content-Type": "application/xml; charset=UTF-8"})
+            finally:
+                places.release()
+
+    return ThreadingHTTPServer(("0.0.0.0", port), Gestionnaire)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Faux serveur GROBID (TEI fixe)")
+    parser.add_argument("--port", type=int, default=8070)
+    parser.add_argument("--latence", type=float, default=0.5, help="latence moyenne par document (s)")
+    parser.add_argument("--concurrence", type=int, default=4, help="documents simultanés avant 503")
+    parser.add_argument("--retry-after", type=int, default=1, help="valeur de Retry-After des 503 (s)")
+    parser.add_argument("--taux-erreur", type=float, default=0.0, help="part des documents en erreur 500")
+    args = parser.parse_args()
+
+    serveur = creer_serveur(args.port, args.latence, args.concurrence, args.retry_after, args.taux_erreur)
+    print(f"Faux GROBID sur http://0.0.0.0:{args.port}/api/processFulltextDocument")
+    try:
+        serveur.serve_forever()
+    except KeyboardInterrupt:
+        serveur.server_close()
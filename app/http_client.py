@@ -0,0 +1,37 @@
+# app/http_client.py
+"""
+Client HTTP asynchrone partagé par les routes de l'API pendant toute la vie
+de l'application : les connexions keep-alive vers OpenAlex et arXiv sont
+réutilisées d'une requête à l'autre au lieu d'un handshake TLS par appel.
+"""
+import os
+from typing import Optional
+
+import httpx
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_MAX_CONNEXIONS = int(os.getenv("HTTP_MAX_CONNEXIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client_http() -> httpx.AsyncClient:
+    """Client partagé, créé au premier appel (dans la boucle d'événements de l'API)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNEXIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            ),
+        )
+    return _client
+
+
+async def fermer_client_http():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
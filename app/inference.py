@@ -0,0 +1,167 @@
+# app/inference.py
+"""
+Point d'entrée unique de la détection de controverse pour l'API et le
+pipeline. En mode distant (NLP_DISTANT=1), les textes absents du cache
+sont envoyés par micro-lots à la file Celery "nlp", dont les workers
+gardent le modèle chargé : seuls ces processus occupent la mémoire du
+modèle. Sinon, l'inférence se fait dans le processus appelant.
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from app.logger import logger
+from app.nlp import RESULTAT_ERREUR_NLP, detecter_controverses, resultat_en_cache
+
+NLP_DISTANT = os.getenv("NLP_DISTANT", "0") == "1"
+FILE_NLP = "nlp"
+# Nombre max de textes par tâche envoyée à la file nlp
+NLP_LOT_DISTANT = int(os.getenv("NLP_LOT_DISTANT", "16"))
+# Attente max (s) des résultats d'une requête d'inférence distante
+NLP_TIMEOUT_DISTANT = float(os.getenv("NLP_TIMEOUT_DISTANT", "120"))
+# Routes async, inférence locale : threads de calcul, autant de requêtes admises
+NLP_EXECUTEUR_THREADS = int(os.getenv("NLP_EXECUTEUR_THREADS", "2"))
+# Routes async, inférence distante : requêtes en attente de la file nlp admises
+# en même temps (attente asynchrone, sans thread occupé)
+NLP_EXECUTEUR_FILE = int(os.getenv("NLP_EXECUTEUR_FILE", "16"))
+
+_executeur = ThreadPoolExecutor(max_workers=NLP_EXECUTEUR_THREADS, thread_name_prefix="inference")
+_places = None
+
+
+def _envoyer_lots(textes: List[str]) -> list:
+    from app.celery_tasks import celery_app
+
+    return [
+        celery_app.send_task(
+            "nlp.detecter_controverses", args=[textes[debut:debut + NLP_LOT_DISTANT]], queue=FILE_NLP
+        )
+        for debut in range(0, len(textes), NLP_LOT_DISTANT)
+    ]
+
+
+def _analyser_a_distance(textes: List[str]) -> List[dict]:
+    resultats = []
+    for tache in _envoyer_lots(textes):
+        # appelable depuis une tâche Celery : la file nlp est servie par d'autres workers
+        resultats.extend(tache.get(timeout=NLP_TIMEOUT_DISTANT, disable_sync_subtasks=False))
+    return resultats
+
+
+async def _analyser_a_distance_async(textes: List[str]) -> List[dict]:
+    """
+    _analyser_a_distance sans thread bloqué : l'état des tâches est sondé
+    avec une attente croissante. Annulée (timeout de l'appelant), elle
+    révoque les tâches pas encore servies.
+    """
+    loop = asyncio.get_running_loop()
+    taches = await asyncio.to_thread(_envoyer_lots, textes)
+    echeance = loop.time() + NLP_TIMEOUT_DISTANT
+    try:
+        resultats = []
+        for tache in taches:
+            pause = 0.01
+            while not await asyncio.to_thread(tache.ready):
+                if loop.time() > echeance:
+                    raise TimeoutError(f"pas de réponse de la file {FILE_NLP} en {NLP_TIMEOUT_DISTANT:.0f}s")
+                await asyncio.sleep(pause)
+                pause = min(pause * 2, 0.5)
+            resultats.extend(await asyncio.to_thread(tache.get, disable_sync_subtasks=False))
+        return resultats
+    except BaseException:
+        for tache in taches:
+            tache.revoke()
+        raise
+
+
+def _separer_cache(textes: List[str]) -> Tuple[list, List[int]]:
+    """Résultats déjà en cache (None sinon) et indices des textes à calculer."""
+    resultats = [None] * len(textes)
+    manquants = []
+    for i, texte in enumerate(textes):
+        en_cache = resultat_en_cache(texte)
+        if en_cache is not None:
+            resultats[i] = en_cache
+        else:
+            manquants.append(i)
+    return resultats, manquants
+
+
+def _completer(resultats: list, manquants: List[int], calcules: List[dict]) -> List[dict]:
+    for i, resultat in zip(manquants, calcules):
+        resultats[i] = resultat
+    return resultats
+
+
+def _echec_distant(manquants: List[int], e: Exception) -> List[dict]:
+    logger.error(f"❌ Inférence NLP distante impossible ({len(manquants)} textes) : {e}")
+    # marqueur d'échec, pas un verdict : jamais mis en cache ni enregistré
+    return [dict(RESULTAT_ERREUR_NLP) for _ in manquants]
+
+
+def analyser_textes(textes: List[str]) -> List[dict]:
+    """
+    Détecte la controverse de chaque texte (même format que
+    app.nlp.detecter_controverse), dans l'ordre de `textes`. Un texte
+    dont l'inférence a échoué (file nlp indisponible ou en timeout, erreur
+    du modèle) reçoit RESULTAT_ERREUR_NLP : les appelants qui enregistrent
+    un verdict le testent avec app.nlp.est_erreur_nlp et ne l'écrivent pas.
+    """
+    if not NLP_DISTANT:
+        return detecter_controverses(textes)
+
+    resultats, manquants = _separer_cache(textes)
+    if not manquants:
+        return resultats
+    try:
+        calcules = _analyser_a_distance([textes[i] for i in manquants])
+    except Exception as e:
+        calcules = _echec_distant(manquants, e)
+    return _completer(resultats, manquants, calcules)
+
+
+def analyser_texte(texte: str) -> dict:
+    return analyser_textes([texte])[0]
+
+
+async def analyser_textes_async(textes: List[str]) -> List[dict]:
+    """
+    analyser_textes pour les routes async, sans bloquer la boucle d'événements.
+    - Inférence locale : le calcul tourne dans NLP_EXECUTEUR_THREADS threads
+      et le sémaphore admet autant de requêtes. Une place n'est rendue
+      qu'à la fin réelle du calcul, même si l'appelant a abandonné
+      (asyncio.wait_for) : les requêtes suivantes attendent leur tour.
+    - Inférence distante : au plus NLP_EXECUTEUR_FILE requêtes attendent la
+      file nlp en même temps, de façon asynchrone.
+    """
+    global _places
+    if not textes:
+        return []
+    if _places is None:
+        _places = asyncio.Semaphore(NLP_EXECUTEUR_FILE if NLP_DISTANT else NLP_EXECUTEUR_THREADS)
+
+    if NLP_DISTANT:
+        async with _places:
+            resultats, manquants = await asyncio.to_thread(_separer_cache, textes)
+            if not manquants:
+                return resultats
+            try:
+                calcules = await _analyser_a_distance_async([textes[i] for i in manquants])
+            except Exception as e:
+                calcules = _echec_distant(manquants, e)
+            return _completer(resultats, manquants, calcules)
+
+    loop = asyncio.get_running_loop()
+    await _places.acquire()
+    try:
+        calcul = _executeur.submit(detecter_controverses, textes)
+    except BaseException:
+        _places.release()
+        raise
+    calcul.add_done_callback(lambda _: loop.call_soon_threadsafe(_places.release))
+    return await asyncio.wrap_future(calcul)
+
+
+def arreter_executeur():
+    _executeur.shutdown(wait=False, cancel_futures=True)
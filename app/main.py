@@ -3,9 +3,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.database import DatabaseManager
+from app.inference import arreter_executeur
+from app.http_client import fermer_client_http
+from app.grobid_client import fermer_client_grobid
+from app.pagination import ENTETE_CURSEUR
 from app.routes import (
     openalex, oai, articles, recherche,
-    interface, alert, tasks, stats, grobid
+    interface, alert, tasks, stats, grobid, export
 )
 
 # Initialisation de l'application FastAPI
@@ -22,14 +26,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[ENTETE_CURSEUR],  # curseur de la page suivante des listes d'articles
 )
 
-# Initialisation (test) base de données
+# Initialisation (test) base de données : la connexion est rendue au pool aussitôt
 try:
-    db = DatabaseManager()
+    with DatabaseManager():
+        pass
 except Exception as e:
     print(f"⚠️ Erreur connexion DB au démarrage : {e}")
 
+@app.on_event("shutdown")
+async def arret():
+    await fermer_client_http()
+    await fermer_client_grobid()
+    arreter_executeur()
+
 # Inclusion des routes organisées par module
 app.include_router(openalex.router, prefix="/openalex", tags=["OpenAlex"])
 app.include_router(oai.router, prefix="/oai", tags=["OAI-PMH"])
@@ -40,6 +52,7 @@ app.include_router(alert.router, prefix="/alert", tags=["Alertes / Logs"])
 app.include_router(tasks.router, prefix="/tasks", tags=["Tâches / Celery"])
 app.include_router(stats.router, prefix="/stats", tags=["Statistiques"])
 app.include_router(grobid.router, prefix="/grobid", tags=["GROBID"])
+app.include_router(export.router, prefix="/export", tags=["Export"])
 
 # Route de bienvenue
 @app.get("/", summary="Message d'accueil de l'API")
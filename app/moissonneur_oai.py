@@ -0,0 +1,160 @@
+# app/moissonneur_oai.py
+"""
+Moissonnage OAI-PMH en flux : parcours complet de ListRecords page par page,
+point de reprise (resumptionToken) sauvegardé dans la table meta après chaque
+page, et remise des articles nouveaux à une file de traitement bornée.
+"""
+import os
+import socket
+import time
+import datetime
+from typing import Callable, Optional
+
+from sickle import Sickle
+from sickle.oaiexceptions import OAIError, NoRecordsMatch, BadResumptionToken
+
+from app.database import DatabaseManager
+from app.logger import logger
+from app.pdf_downloader import SessionTelechargement
+from app.services.file_traitement import FileTraitement
+
+OAI_URL = "https://export.arxiv.org/oai2"
+TABLE_OAI = "articles_oai"
+
+# Clés de la table meta pour la reprise d'un moissonnage interrompu
+CLE_TOKEN_OAI = "oai_resumption_token"
+CLE_DEPUIS_OAI = "oai_moisson_depuis"
+
+# Traitement aval (téléchargement, extraction, NLP)
+NB_WORKERS_OAI = int(os.getenv("OAI_WORKERS", "2"))
+TAILLE_FILE_OAI = int(os.getenv("OAI_QUEUE_SIZE", "200"))
+
+
+def _record_vers_article(record) -> dict:
+    meta = record.metadata
+    return {
+        "titre": meta.get("title", ["Inconnu"])[0],
+        "auteurs": ", ".join(meta.get("creator", ["Auteur inconnu"])),
+        "date_publication": meta.get("date", [None])[0],
+        "resume": "",
+        "lien_pdf": "https://arxiv.org/pdf/" + record.header.identifier.split(":")[-1] + ".pdf",
+    }
+
+
+def moissonner_oai_en_flux(
+    db: DatabaseManager,
+    traiter: Callable,
+    retries: int = 3,
+    retry_delay: int = 10,
+    limite: Optional[int] = None,
+) -> int:
+    """
+    Parcourt tout le résultat ListRecords depuis la dernière date de moissonnage.
+    Chaque page est insérée en masse, les PDF de ses articles nouveaux sont
+    téléchargés en parallèle puis soumis à la file
+    `traiter(db, table, article_id, pdf_path)`, enfin le resumptionToken
+    qui redonne la page suivante est enregistré dans meta : après un crash ou
+    une nouvelle tentative, le moissonnage repart de la dernière page complète.
+    `limite` borne le nombre d'articles insérés par exécution ; le point de
+    reprise est alors conservé pour l'exécution suivante.
+    Retourne le nombre d'articles traités avec succès.
+    """
+    db.create_tables()
+    if not db.conn:
+        logger.error("⚠️ Connexion PostgreSQL échouée. Abandon du moissonnage OAI.")
+        return 0
+
+    depuis = db.get_meta(CLE_DEPUIS_OAI) or db.get_last_moisson_date()
+    if not depuis:
+        depuis = (datetime.datetime.utcnow() - datetime.timedelta(days=7)).strftime("%Y-%m-%d")
+    db.set_meta(CLE_DEPUIS_OAI, depuis)
+    logger.info(f"📅 Dernier moissonnage (OAI-PMH) : {depuis}")
+
+    inseres = 0
+    termine = False
+    attempt = 0
+    with FileTraitement(traiter, NB_WORKERS_OAI, TAILLE_FILE_OAI, nom="oai") as file, \
+            SessionTelechargement(source=TABLE_OAI) as telechargement:
+        while attempt < retries and not termine:
+            token = db.get_meta(CLE_TOKEN_OAI)
+            try:
+                sickle = Sickle(OAI_URL, max_retries=retries, default_retry_after=retry_delay)
+                if token:
+                    logger.info("🔄 Reprise du moissonnage OAI-PMH au resumptionToken enregistré")
+                    records = sickle.ListRecords(ignore_deleted=True, resumptionToken=token)
+                else:
+                    logger.info(f"🔄 Tentative {attempt+1}/{retries} de moissonnage OAI-PMH...")
+                    records = sickle.ListRecords(ignore_deleted=True, metadataPrefix="oai_dc", **{"from": depuis})
+
+                # sickle remplace records.resumption_token à chaque nouvelle page :
+                # un changement d'objet signale que la page précédente est complète.
+                token_page = records.resumption_token
+                page = []
+                for record in records:
+                    if records.resumption_token is not token_page:
+                        inseres += _publier_page(db, file, telechargement, page, token_page)
+                        page = []
+                        token_page = records.resumption_token
+                        if limite and inseres >= limite:
+                            logger.info(f"⏸️ Limite de {limite} articles atteinte, reprise au prochain passage")
+                            break
+                    page.append(_record_vers_article(record))
+                else:
+                    inseres += _publier_page(db, file, telechargement, page, None)
+                    termine = True
+
+                if not termine:
+                    break
+
+            except NoRecordsMatch:
+                logger.info("ℹ️ Aucun enregistrement OAI-PMH depuis la dernière date.")
+                termine = True
+            except BadResumptionToken as e:
+                logger.warning(f"⚠️ resumptionToken expiré ou invalide, reprise depuis {depuis} : {e}")
+                db.set_meta(CLE_TOKEN_OAI, "")
+                attempt += 1
+            except (OAIError, socket.error, ConnectionError) as e:
+                logger.warning(f"⏳ Tentative {attempt+1}/{retries} échouée : {e}")
+                attempt += 1
+                if attempt < retries:
+                    logger.info(f"⏳ Nouvelle tentative dans {retry_delay}s...")
+                    time.sleep(retry_delay)
+            except Exception as e:
+                logger.error(f"❌ Erreur inattendue OAI-PMH : {e}")
+                break
+
+    if termine:
+        db.set_meta(CLE_TOKEN_OAI, "")
+        db.set_meta(CLE_DEPUIS_OAI, "")
+        if inseres > 0:
+            new_date = datetime.datetime.utcnow().strftime("%Y-%m-%d")
+            db.set_last_moisson_date(new_date)
+            logger.info(f"📌 Moissonnage terminé : {inseres} articles insérés. Date mise à jour : {new_date}")
+        else:
+            logger.info("ℹ️ Aucun nouvel article OAI-PMH, date non mise à jour.")
+    else:
+        logger.info(f"⏸️ Moissonnage OAI-PMH interrompu après {inseres} articles, point de reprise conservé.")
+
+    return file.traites
+
+
+def _publier_page(db: DatabaseManager, file: FileTraitement, telechargement: SessionTelechargement,
+                  page: list, token_suivant) -> int:
+    """
+    Insère une page complète, télécharge les PDF de ses articles nouveaux,
+    les soumet à la file et enregistre le point de reprise.
+    Retourne le nombre d'articles insérés.
+    """
+    nouveaux = db.insert_articles_batch(TABLE_OAI, page) if page else {}
+    nb_inseres = len(nouveaux)
+    chemins = telechargement.telecharger_lot([(article_id, lien_pdf) for lien_pdf, article_id in nouveaux.items()])
+    for article_id, pdf_path in chemins.items():
+        if pdf_path:
+            file.soumettre(TABLE_OAI, article_id, pdf_path)
+
+    token = getattr(token_suivant, "token", None) or ""
+    db.set_meta(CLE_TOKEN_OAI, token)
+    curseur = getattr(token_suivant, "cursor", None)
+    taille = getattr(token_suivant, "complete_list_size", None)
+    logger.info(f"📄 Page OAI-PMH enregistrée : {len(page)} enregistrements (curseur {curseur}/{taille})")
+    return nb_inseres
@@ -1,36 +1,239 @@
 # app/nlp.py
 
+import hashlib
+import os
 import re
+import threading
 import warnings
+from typing import List
 from transformers import pipeline
 from transformers.utils import logging as hf_logging
 from app.logger import logger
+from app.cache import CacheResultats
 
 # Silence des UserWarning de Transformers en prod
 warnings.filterwarnings("ignore", category=UserWarning)
 hf_logging.set_verbosity_error()
 
-# Pipeline chargé en lazy loading
-_detecteur = None
+# Pipelines chargés en lazy loading (un par backend)
+_detecteurs = {}
+# Les pipelines (tokenizer rapide compris) ne sont pas sûrs entre threads :
+# les consommateurs du moissonnage passent au modèle l'un après l'autre.
+_verrou_inference = threading.RLock()
 
 # Seuil sur le score de controverse (0.0 à 1.0)
 SEUIL_CONTROVERSE = 0.70
 
-def get_detecteur_sentiment():
-    global _detecteur
-    if _detecteur is None:
+# Nombre de phrases envoyées au modèle par passe (inférence par lots)
+NLP_BATCH_SIZE = int(os.getenv("NLP_BATCH_SIZE", "32"))
+
+# Modèle de détection et backend d'inférence
+MODELE_NLP = "distilbert/distilbert-base-uncased-finetuned-sst-2-english"
+REVISION_NLP = "af0f99b"
+BACKENDS_NLP = ("pytorch", "pytorch_int8", "onnx")
+NLP_BACKEND = os.getenv("NLP_BACKEND", "pytorch")
+
+# Cache des résultats de detecter_controverse, indexé par modèle, révision,
+# backend, seuil et SHA-256 du texte analysé
+_cache_nlp = CacheResultats(
+    "nlp",
+    taille_locale=int(os.getenv("NLP_CACHE_TAILLE", "10000")),
+    ttl=int(os.getenv("NLP_CACHE_TTL", str(30 * 24 * 3600))),
+)
+
+def _charger_modele(backend: str):
+    """
+    Charge le modèle et le tokenizer pour le backend demandé :
+      - pytorch      : checkpoint PyTorch fp32 (comportement historique)
+      - pytorch_int8 : quantification dynamique int8 des couches Linear (CPU)
+      - onnx         : graphe ONNX exporté, exécuté par onnxruntime (via optimum)
+    """
+    from transformers import AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(MODELE_NLP, revision=REVISION_NLP)
+
+    if backend == "onnx":
         try:
-            logger.info("🚀 Chargement du modèle NLP HuggingFace…")
-            _detecteur = pipeline(
-                "sentiment-analysis",
-                model="distilbert/distilbert-base-uncased-finetuned-sst-2-english",
-                revision="af0f99b",
-                top_k=None,  # équivalent à return_all_scores=True
-            )
-        except Exception as e:
-            logger.error(f"❌ Échec du chargement du modèle HuggingFace : {e}")
-            raise
-    return _detecteur
+            from optimum.onnxruntime import ORTModelForSequenceClassification
+        except ImportError as e:
+            raise RuntimeError("Backend NLP 'onnx' indisponible : installer optimum[onnxruntime]") from e
+        modele = ORTModelForSequenceClassification.from_pretrained(
+            MODELE_NLP, revision=REVISION_NLP, export=True
+        )
+        return modele, tokenizer
+
+    import torch
+    from transformers import AutoModelForSequenceClassification
+    modele = AutoModelForSequenceClassification.from_pretrained(MODELE_NLP, revision=REVISION_NLP)
+    modele.eval()
+    if backend == "pytorch_int8":
+        modele = torch.quantization.quantize_dynamic(modele, {torch.nn.Linear}, dtype=torch.qint8)
+    return modele, tokenizer
+
+def get_detecteur_sentiment(backend: str = None):
+    backend = backend or NLP_BACKEND
+    if backend not in BACKENDS_NLP:
+        raise ValueError(f"Backend NLP inconnu : {backend} (valides : {', '.join(BACKENDS_NLP)})")
+    with _verrou_inference:
+        if backend not in _detecteurs:
+            try:
+                logger.info(f"🚀 Chargement du modèle NLP HuggingFace (backend={backend})…")
+                if backend == "pytorch":
+                    _detecteurs[backend] = pipeline(
+                        "sentiment-analysis",
+                        model=MODELE_NLP,
+                        revision=REVISION_NLP,
+                        top_k=None,  # équivalent à return_all_scores=True
+                    )
+                else:
+                    modele, tokenizer = _charger_modele(backend)
+                    _detecteurs[backend] = pipeline(
+                        "sentiment-analysis",
+                        model=modele,
+                        tokenizer=tokenizer,
+                        top_k=None,
+                    )
+            except Exception as e:
+                logger.error(f"❌ Échec du chargement du modèle HuggingFace : {e}")
+                raise
+    return _detecteurs[backend]
+
+def decouper_phrases(texte: str) -> List[str]:
+    """
+    Découpe un texte en phrases et ne garde que celles d'au moins 5 mots.
+    """
+    phrases = re.split(r'(?<=[.!?]) +', texte)
+    return [phrase for phrase in phrases if len(phrase.split()) >= 5]
+
+def _score_depuis_sorties(outputs) -> float:
+    """
+    Convertit la sortie HuggingFace (un dict par label) en score de controverse.
+    """
+    pos = next(o["score"] for o in outputs if o["label"] == "POSITIVE")
+    neg = next(o["score"] for o in outputs if o["label"] == "NEGATIVE")
+    return 1.0 - abs(pos - neg)
+
+def scorer_phrases(phrases: List[str], batch_size: int = None, backend: str = None) -> List[float]:
+    """
+    Calcule le score de controverse de chaque phrase par lots.
+    Les phrases sont triées par longueur avant d'être regroupées, pour que
+    chaque lot soit paddé sur des longueurs proches ; les scores sont
+    renvoyés dans l'ordre d'origine des phrases.
+    """
+    if not phrases:
+        return []
+    batch_size = batch_size or NLP_BATCH_SIZE
+    detecteur = get_detecteur_sentiment(backend)
+
+    # on limite pour ne pas dépasser 512 tokens
+    entrees = [phrase[:512] for phrase in phrases]
+    ordre = sorted(range(len(entrees)), key=lambda i: len(entrees[i]))
+
+    scores = [None] * len(entrees)
+    for debut in range(0, len(ordre), batch_size):
+        lot = ordre[debut:debut + batch_size]
+        with _verrou_inference:
+            resultats = detecteur([entrees[i] for i in lot], batch_size=batch_size)
+        for i, outputs in zip(lot, resultats):
+            if outputs:
+                scores[i] = _score_depuis_sorties(outputs)
+    return scores
+
+def version_nlp(backend: str = None) -> str:
+    """Identifie ce qui détermine un score : modèle, révision, backend et seuil."""
+    return f"{MODELE_NLP}@{REVISION_NLP}:{backend or NLP_BACKEND}:{SEUIL_CONTROVERSE}"
+
+def cle_cache_nlp(texte: str, backend: str = None) -> str:
+    empreinte = hashlib.sha256(texte.encode("utf-8")).hexdigest()
+    return f"{version_nlp(backend)}:{empreinte}"
+
+def resultat_en_cache(texte: str):
+    """Résultat déjà calculé pour ce texte (copie), ou None."""
+    en_cache = _cache_nlp.get(cle_cache_nlp(texte or ""))
+    return dict(en_cache) if en_cache is not None else None
+
+def get_stats_cache_nlp() -> dict:
+    """Taux de succès du cache NLP (valeurs propres au processus courant)."""
+    return _cache_nlp.stats()
+
+RESULTAT_ERREUR_NLP = {
+    "est_controverse": False,
+    "score_controverse": 0.0,
+    "extrait_controverse": "Erreur NLP",
+}
+
+def est_erreur_nlp(resultat: dict) -> bool:
+    """
+    Vrai pour RESULTAT_ERREUR_NLP (inférence en échec, peut-être
+    transitoire) : ce n'est pas un verdict, il ne doit pas être enregistré
+    comme tel. Un vrai extrait compte au moins cinq mots.
+    """
+    return resultat.get("extrait_controverse") == RESULTAT_ERREUR_NLP["extrait_controverse"]
+
+def _verdict(phrases: List[str], scores: List[float]) -> dict:
+    best_score = 0.0
+    best_phrase = ""
+
+    # parcours dans l'ordre du texte : à score égal, la première phrase l'emporte
+    for phrase, score in zip(phrases, scores):
+        if score is None:
+            continue
+        logger.debug(f"Phrase «{phrase}» → controverse={score:.3f}")
+
+        if score > best_score:
+            best_score = score
+            best_phrase = phrase
+
+    est_controverse = best_score >= SEUIL_CONTROVERSE
+    final_score = round(best_score, 3)
+
+    logger.info(
+        f"🧠 NLP : score_controverse={final_score}, extrait_controverse='{best_phrase}'"
+    )
+
+    return {
+        "est_controverse": est_controverse,
+        "score_controverse": final_score,
+        "extrait_controverse": best_phrase or "Aucun extrait significatif",
+    }
+
+def detecter_controverses(textes: List[str]) -> List[dict]:
+    """
+    Version par lot de detecter_controverse : les textes absents du cache
+    sont découpés et leurs phrases passent ensemble par le modèle, puis
+    chaque texte reçoit son verdict (dans l'ordre de `textes`).
+    """
+    resultats = [None] * len(textes)
+    a_calculer = {}
+    for i, texte in enumerate(textes):
+        cle = cle_cache_nlp(texte or "")
+        en_cache = _cache_nlp.get(cle)
+        if en_cache is not None:
+            logger.debug(f"🧠 NLP : résultat en cache ({cle[-12:]})")
+            resultats[i] = dict(en_cache)
+        else:
+            a_calculer.setdefault(cle, []).append(i)
+    if not a_calculer:
+        return resultats
+
+    try:
+        decoupes = {cle: decouper_phrases(textes[indices[0]]) for cle, indices in a_calculer.items()}
+        scores = scorer_phrases([phrase for phrases in decoupes.values() for phrase in phrases])
+    except Exception as e:
+        logger.error(f"❌ Erreur NLP HuggingFace : {e}")
+        # pas de mise en cache : l'erreur peut être transitoire
+        for indices in a_calculer.values():
+            for i in indices:
+                resultats[i] = dict(RESULTAT_ERREUR_NLP)
+        return resultats
+
+    debut = 0
+    for cle, phrases in decoupes.items():
+        verdict = _verdict(phrases, scores[debut:debut + len(phrases)])
+        debut += len(phrases)
+        _cache_nlp.set(cle, verdict)
+        for i in a_calculer[cle]:
+            resultats[i] = dict(verdict)
+    return resultats
 
 def detecter_controverse(texte: str) -> dict:
     """
@@ -39,55 +242,62 @@ def detecter_controverse(texte: str) -> dict:
       - est_controverse (bool)
       - score_controverse (float entre 0 et 1)
       - extrait_controverse (phrase la plus controversée)
+    Un texte déjà analysé avec le même modèle et le même seuil est servi
+    depuis le cache (LRU local puis Redis) sans repasser par le modèle.
     """
-    try:
-        detecteur = get_detecteur_sentiment()
-        phrases = re.split(r'(?<=[.!?]) +', texte)
+    return detecter_controverses([texte])[0]
+
 
-        best_score = 0.0
-        best_phrase = ""
+if __name__ == "__main__":
+    # Benchmark : boucle phrase par phrase (ancien chemin) vs inférence par lots,
+    # puis latence/débit et parité des scores pour chaque backend disponible.
+    import random
+    import time
 
-        for phrase in phrases:
-            mots = phrase.split()
-            if len(mots) < 5:
-                continue
+    TOLERANCE_PARITE = float(os.getenv("NLP_BENCH_TOLERANCE", "0.05"))
 
-            # on limite pour ne pas dépasser 512 tokens
-            resultats = detecteur(phrase[:512])
-            if not resultats:
-                continue
+    random.seed(0)
+    vocabulaire = (
+        "the results strongly contradict previous findings although several authors "
+        "argue that this model fails to explain observed data while others support it"
+    ).split()
+    corpus = " ".join(
+        " ".join(random.choices(vocabulaire, k=random.randint(5, 40))) + "."
+        for _ in range(int(os.getenv("NLP_BENCH_PHRASES", "2000")))
+    )
+    phrases = decouper_phrases(corpus)
+    detecteur = get_detecteur_sentiment("pytorch")
+    detecteur(phrases[0])  # échauffement
 
-            # HuggingFace renvoie une liste de dicts, un par label
-            outputs = resultats[0]
-            pos = next(o["score"] for o in outputs if o["label"] == "POSITIVE")
-            neg = next(o["score"] for o in outputs if o["label"] == "NEGATIVE")
+    debut = time.perf_counter()
+    scores_boucle = [_score_depuis_sorties(detecteur(p[:512])[0]) for p in phrases]
+    duree_boucle = time.perf_counter() - debut
+    logger.info(f"📊 {len(phrases)} phrases, lots de {NLP_BATCH_SIZE}")
+    logger.info(f"   phrase par phrase (pytorch) : {len(phrases) / duree_boucle:.1f} phrases/s")
 
-            score = 1.0 - abs(pos - neg)
-            logger.debug(
-                f"Phrase «{phrase}» → pos={pos:.3f}, neg={neg:.3f}, controverse={score:.3f}"
-            )
+    for backend in BACKENDS_NLP:
+        try:
+            get_detecteur_sentiment(backend)(phrases[0])  # chargement + échauffement
+        except Exception as e:
+            logger.warning(f"⏭️ Backend {backend} ignoré : {e}")
+            continue
 
-            if score > best_score:
-                best_score = score
-                best_phrase = phrase
+        latences = []
+        for p in phrases[:100]:
+            t0 = time.perf_counter()
+            scorer_phrases([p], backend=backend)
+            latences.append(time.perf_counter() - t0)
+        latences.sort()
 
-        est_controverse = best_score >= SEUIL_CONTROVERSE
-        final_score = round(best_score, 3)
+        debut = time.perf_counter()
+        scores = scorer_phrases(phrases, backend=backend)
+        duree = time.perf_counter() - debut
 
+        ecart = max(abs(a - b) for a, b in zip(scores_boucle, scores))
+        statut = "OK" if ecart <= TOLERANCE_PARITE else "HORS TOLÉRANCE"
         logger.info(
-            f"🧠 NLP : score_controverse={final_score}, extrait_controverse='{best_phrase}'"
+            f"   {backend:<13}: {len(phrases) / duree:.1f} phrases/s, "
+            f"latence p50={latences[len(latences) // 2] * 1000:.1f}ms "
+            f"p95={latences[int(len(latences) * 0.95)] * 1000:.1f}ms, "
+            f"écart max vs fp32={ecart:.2e} ({statut})"
         )
-
-        return {
-            "est_controverse": est_controverse,
-            "score_controverse": final_score,
-            "extrait_controverse": best_phrase or "Aucun extrait significatif",
-        }
-
-    except Exception as e:
-        logger.error(f"❌ Erreur NLP HuggingFace : {e}")
-        return {
-            "est_controverse": False,
-            "score_controverse": 0.0,
-            "extrait_controverse": "Erreur NLP",
-        }
@@ -1,41 +1,63 @@
 # app/nlp_grobid.py
+from typing import List, Optional, Tuple
+
 from lxml import etree
 from app.utils import nettoyer_texte
 from app.logger import logger
-from app.nlp import detecter_controverse
+from app.inference import analyser_textes
+from app.tei import DocumentTEI, lire_tei
+
+# Verdict d'un TEI sans texte exploitable (mêmes clés que app.nlp.detecter_controverse)
+RESULTAT_TEI_VIDE = {
+    "est_controverse": False,
+    "score_controverse": 0.0,
+    "extrait_controverse": "",
+}
 
 def extraire_texte_depuis_tei(tei_xml: str) -> str:
     """
     Extrait un texte concaténé depuis <abstract> et <body> d’un TEI XML.
     """
     try:
-        root = etree.fromstring(tei_xml.encode("utf-8"))
-        ns = {"tei": "http://www.tei-c.org/ns/1.0"}
-
-        resume = root.findtext(".//tei:abstract", namespaces=ns) or ""
-        body_parts = root.findall(".//tei:body//tei:p", namespaces=ns)
-        body = "\n".join([p.text for p in body_parts if p is not None and p.text])
-
-        full_text = resume + "\n" + body
-        return full_text.strip()
-
-    except Exception as e:
+        return lire_tei(tei_xml).texte
+    except etree.XMLSyntaxError as e:
         logger.error(f"❌ Erreur extraction texte TEI : {e}")
         return ""
 
+def detecter_controverses_documents(documents: List[DocumentTEI]) -> List[dict]:
+    """
+    Analyse NLP de documents TEI déjà lus, en un seul appel d'inférence
+    pour tout le lot. Un verdict par document, dans l'ordre ; une
+    inférence en échec donne RESULTAT_ERREUR_NLP (voir app.nlp.est_erreur_nlp).
+    """
+    textes = [nettoyer_texte(doc.texte) if doc.texte else "" for doc in documents]
+    a_scorer = [i for i, texte in enumerate(textes) if texte]
+    resultats = [dict(RESULTAT_TEI_VIDE) for _ in documents]
+    for i, verdict in zip(a_scorer, analyser_textes([textes[i] for i in a_scorer])):
+        resultats[i] = verdict
+    return resultats
+
 def detecter_controverse_via_tei(tei_xml: str) -> dict:
     """
     Analyse NLP d’un article scientifique à partir de son fichier TEI.
-    Retourne un dictionnaire : score, est_controverse, extrait.
-    """
-    texte = extraire_texte_depuis_tei(tei_xml)
-    if not texte:
-        return {
-            "score": 0.0,
-            "est_controverse": False,
-            "extrait": ""
-        }
-
-    texte_nettoye = nettoyer_texte(texte)
-    return detecter_controverse(texte_nettoye)
+    Retourne un dictionnaire : est_controverse, score_controverse, extrait_controverse.
+    """
+    try:
+        document = lire_tei(tei_xml)
+    except etree.XMLSyntaxError as e:
+        logger.error(f"❌ Erreur extraction texte TEI : {e}")
+        return dict(RESULTAT_TEI_VIDE)
+    return detecter_controverses_documents([document])[0]
 
+def localiser_extrait(document: DocumentTEI, extrait: str) -> Optional[Tuple[int, int]]:
+    """
+    (rang de section, rang de paragraphe), à partir de 0, du paragraphe dont
+    provient l'extrait de controverse (phrase du texte nettoyé), ou None.
+    """
+    if not extrait:
+        return None
+    for i, section in enumerate(document.sections):
+        for j, paragraphe in enumerate(section.paragraphes):
+            if extrait in nettoyer_texte(paragraphe):
+                return i, j
+    return None
@@ -0,0 +1,228 @@
+# app/openalex.py
+"""
+Moissonnage OpenAlex en masse : pagination profonde par curseur (cursor=*),
+pages de 200 works, projection des champs (select=) et point de reprise du
+curseur dans la table meta. Les PDF des articles nouveaux sont téléchargés
+en parallèle puis remis à une file de traitement bornée (extraction, NLP).
+"""
+import os
+import json
+import time
+import datetime
+from typing import Callable, Optional
+
+import requests
+
+from app.database import DatabaseManager
+from app.logger import logger
+from app.pdf_downloader import SessionTelechargement
+from app.services.file_traitement import FileTraitement
+from app.utils import corriger_lien_pdf, secondes_retry_after
+
+OPENALEX_URL = "https://api.openalex.org/works"
+TABLE_OPENALEX = "articles_openalex"
+
+# Adresse email pour le "polite pool" OpenAlex (bonne pratique)
+OPENALEX_EMAIL = os.getenv("OPENALEX_EMAIL")
+
+# Pagination et projection : seuls les champs utilisés sont demandés
+OPENALEX_PER_PAGE = 200
+CHAMPS_OPENALEX = "id,title,authorships,publication_date,primary_location,open_access"
+
+# Clés de la table meta
+CLE_CURSEUR_OPENALEX = "openalex_cursor"
+CLE_DEPUIS_OPENALEX = "openalex_moisson_depuis"
+CLE_DATE_OPENALEX = "openalex_last_moisson_date"
+CLE_RAPPORT_OPENALEX = "openalex_dernier_rapport"
+
+# Traitement aval et politesse réseau
+NB_WORKERS_OPENALEX = int(os.getenv("OPENALEX_WORKERS", "2"))
+TAILLE_FILE_OPENALEX = int(os.getenv("OPENALEX_QUEUE_SIZE", "400"))
+OPENALEX_TIMEOUT = 30
+OPENALEX_RETRIES = 5
+
+
+def _work_vers_article(work: dict, depuis: str) -> Optional[dict]:
+    """Convertit un work OpenAlex en article, ou None s'il n'a aucun lien exploitable."""
+    titre = work.get("title") or "Sans titre"
+    auteurs = ", ".join(
+        [a.get("author", {}).get("display_name", "?") for a in work.get("authorships", [])]
+    )
+
+    # 1. PDF direct via primary_location
+    primary = work.get("primary_location") or {}
+    pdf_url = primary.get("pdf_url")
+    # 2. fallback landing page
+    if not pdf_url:
+        pdf_url = primary.get("landing_page_url")
+    # 3. fallback OA URLs
+    if not pdf_url:
+        oa_urls = (work.get("open_access") or {}).get("oa_url")
+        if isinstance(oa_urls, list) and oa_urls:
+            entry = oa_urls[0]
+            pdf_url = entry.get("url") if isinstance(entry, dict) else entry
+        else:
+            pdf_url = oa_urls
+
+    if not pdf_url:
+        logger.debug(f"⏭️ Ignoré (pas de lien PDF) : {titre}")
+        return None
+
+    return {
+        "titre": titre,
+        "auteurs": auteurs,
+        "date_publication": work.get("publication_date") or depuis,
+        "resume": "",
+        "lien_pdf": corriger_lien_pdf(pdf_url),
+    }
+
+
+def _session_openalex() -> requests.Session:
+    session = requests.Session()
+    agent = "SoFa-MB2/1.0"
+    if OPENALEX_EMAIL:
+        agent += f" (mailto:{OPENALEX_EMAIL})"
+    session.headers["User-Agent"] = agent
+    return session
+
+
+def _get_page(session: requests.Session, params: dict) -> dict:
+    """GET d'une page OpenAlex, avec attente exponentielle sur 429/5xx."""
+    for tentative in range(OPENALEX_RETRIES):
+        try:
+            resp = session.get(OPENALEX_URL, params=params, timeout=OPENALEX_TIMEOUT)
+            if resp.status_code == 429 or resp.status_code >= 500:
+                attente = secondes_retry_after(resp.headers.get("Retry-After"))
+                if attente is None:
+                    attente = 2 ** tentative
+                logger.warning(f"⏳ OpenAlex HTTP {resp.status_code}, nouvelle tentative dans {attente:.0f}s")
+                time.sleep(attente)
+                continue
+            resp.raise_for_status()
+            return resp.json()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            logger.warning(f"⏳ Erreur réseau OpenAlex ({tentative+1}/{OPENALEX_RETRIES}) : {e}")
+            time.sleep(2 ** tentative)
+    raise ConnectionError(f"OpenAlex injoignable après {OPENALEX_RETRIES} tentatives")
+
+
+def moissonner_openalex_par_curseur(
+    db: DatabaseManager,
+    traiter: Callable,
+    limite: Optional[int] = None,
+) -> int:
+    """
+    Parcourt tous les works publiés depuis la dernière date de moissonnage
+    OpenAlex, page par page (cursor=*, per-page=200, select=...).
+    Après chaque page : insertion en masse, téléchargement parallèle des PDF
+    des articles nouveaux, soumission à `traiter(db, table, article_id, pdf_path)`
+    et sauvegarde du curseur
+    suivant dans meta pour reprendre au même point après une interruption.
+    `limite` borne le nombre de works lus par exécution.
+    Retourne le nombre d'articles traités avec succès ; le débit (works/s)
+    est journalisé et conservé dans meta.
+    """
+    db.create_tables()
+    if not db.conn:
+        logger.error("⚠️ Impossible de moissonner : pas de connexion PG.")
+        return 0
+
+    depuis = (
+        db.get_meta(CLE_DEPUIS_OPENALEX)
+        or db.get_meta(CLE_DATE_OPENALEX)
+        or db.get_last_moisson_date()
+        or (datetime.datetime.utcnow() - datetime.timedelta(days=7)).strftime("%Y-%m-%d")
+    )
+    db.set_meta(CLE_DEPUIS_OPENALEX, depuis)
+    curseur = db.get_meta(CLE_CURSEUR_OPENALEX) or "*"
+    logger.info(f"📅 Date de départ OpenAlex : {depuis} ({'reprise' if curseur != '*' else 'début'} du curseur)")
+
+    session = _session_openalex()
+    debut = time.perf_counter()
+    recus = 0
+    inseres = 0
+    termine = False
+
+    with FileTraitement(traiter, NB_WORKERS_OPENALEX, TAILLE_FILE_OPENALEX, nom="openalex") as file, \
+            SessionTelechargement(source=TABLE_OPENALEX) as telechargement:
+        try:
+            while True:
+                params = {
+                    "filter": f"from_publication_date:{depuis}",
+                    "per-page": OPENALEX_PER_PAGE,
+                    "cursor": curseur,
+                    "select": CHAMPS_OPENALEX,
+                }
+                if OPENALEX_EMAIL:
+                    params["mailto"] = OPENALEX_EMAIL
+
+                try:
+                    data = _get_page(session, params)
+                except requests.HTTPError as e:
+                    statut = e.response.status_code if e.response is not None else None
+                    if curseur == "*" or statut is None or not 400 <= statut < 500:
+                        raise
+                    # curseur expiré ou invalide : le garder bloquerait toutes les reprises
+                    logger.warning(f"⚠️ Curseur OpenAlex refusé (HTTP {statut}), reprise depuis {depuis} : {e}")
+                    db.set_meta(CLE_CURSEUR_OPENALEX, "")
+                    curseur = "*"
+                    continue
+                works = data.get("results", [])
+                curseur_suivant = (data.get("meta") or {}).get("next_cursor")
+
+                articles = [a for a in (_work_vers_article(w, depuis) for w in works) if a]
+                nouveaux = db.insert_articles_batch(TABLE_OPENALEX, articles) if articles else {}
+                inseres += len(nouveaux)
+                chemins = telechargement.telecharger_lot([(article_id, lien_pdf) for lien_pdf, article_id in nouveaux.items()])
+                for article_id, pdf_path in chemins.items():
+                    if pdf_path:
+                        file.soumettre(TABLE_OPENALEX, article_id, pdf_path)
+
+                recus += len(works)
+                db.set_meta(CLE_CURSEUR_OPENALEX, curseur_suivant or "")
+                debit = recus / max(time.perf_counter() - debut, 1e-9)
+                logger.info(
+                    f"📄 Page OpenAlex : {len(works)} works, {recus} au total "
+                    f"(total annoncé {(data.get('meta') or {}).get('count')}), {debit:.1f} works/s"
+                )
+
+                if not works or not curseur_suivant:
+                    termine = True
+                    break
+                if limite and recus >= limite:
+                    logger.info(f"⏸️ Limite de {limite} works atteinte, reprise au prochain passage")
+                    break
+                curseur = curseur_suivant
+        except Exception as e:
+            logger.error(f"❌ Erreur récupération OpenAlex : {e}")
+
+    duree = time.perf_counter() - debut
+    rapport = {
+        "date": datetime.datetime.utcnow().isoformat(timespec="seconds"),
+        "depuis": depuis,
+        "works_recus": recus,
+        "articles_inseres": inseres,
+        "articles_traites": file.traites,
+        "duree_s": round(duree, 1),
+        "works_par_s": round(recus / duree, 2) if duree else 0.0,
+        "termine": termine,
+    }
+    db.set_meta(CLE_RAPPORT_OPENALEX, json.dumps(rapport))
+    logger.info(
+        f"📊 OpenAlex : {recus} works en {duree:.1f}s ({rapport['works_par_s']} works/s), "
+        f"{inseres} insérés, {file.traites} traités"
+    )
+
+    if termine:
+        db.set_meta(CLE_CURSEUR_OPENALEX, "")
+        db.set_meta(CLE_DEPUIS_OPENALEX, "")
+        if inseres > 0:
+            new_date = datetime.datetime.utcnow().strftime("%Y-%m-%d")
+            db.set_meta(CLE_DATE_OPENALEX, new_date)
+            logger.info(f"📌 Moissonnage OpenAlex terminé. Date mise à jour : {new_date}")
+        else:
+            logger.info("ℹ️ Aucun nouvel article OpenAlex, date non mise à jour.")
+    else:
+        logger.info("⏸️ Moissonnage OpenAlex interrompu, curseur conservé pour la reprise.")
+
+    return file.traites
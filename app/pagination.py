@@ -0,0 +1,70 @@
+# app/pagination.py
+"""
+Outils communs aux routes de liste d'articles : curseur opaque de la
+pagination par clé (renvoyé dans l'en-tête X-Next-Cursor) et projection
+de colonnes via le paramètre `fields`.
+"""
+import base64
+import json
+from datetime import date
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Response, status
+
+from app.database import COLONNES_ARTICLE
+
+ENTETE_CURSEUR = "X-Next-Cursor"
+# Colonnes volumineuses, renvoyées seulement si `fields` les demande
+COLONNES_LOURDES = ("texte_complet",)
+# Toujours renvoyées (requises par les schémas de réponse)
+COLONNES_OBLIGATOIRES = ("id", "titre")
+# Colonnes des listes de controverses (schéma ControverseBase)
+COLONNES_CONTROVERSE = ("id", "titre", "score_controverse", "extrait_controverse")
+
+
+def encoder_curseur(tri: str, suivante: Tuple) -> str:
+    valeur, article_id = suivante
+    if isinstance(valeur, date):
+        valeur = valeur.isoformat()
+    brut = json.dumps([tri, valeur, article_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(brut).decode("ascii")
+
+
+def decoder_curseur(curseur: Optional[str], tri: str) -> Optional[Tuple]:
+    """(valeur, id) du curseur, ou None ; 400 si le curseur est invalide ou d'un autre tri."""
+    if not curseur:
+        return None
+    try:
+        tri_curseur, valeur, article_id = json.loads(base64.urlsafe_b64decode(curseur.encode("ascii")))
+        if tri_curseur != tri:
+            raise ValueError("curseur d'un autre tri")
+        if valeur is not None and tri == "date":
+            valeur = date.fromisoformat(valeur)
+        return valeur, int(article_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Curseur invalide.")
+
+
+def colonnes_demandees(fields: Optional[str]) -> List[str]:
+    """Colonnes de `fields` (liste séparée par des virgules) ; par défaut toutes sauf les lourdes."""
+    if not fields:
+        return [c for c in COLONNES_ARTICLE if c not in COLONNES_LOURDES]
+    demandees = {f.strip() for f in fields.split(",") if f.strip()}
+    inconnues = demandees - set(COLONNES_ARTICLE)
+    if inconnues:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Champs inconnus : {', '.join(sorted(inconnues))}",
+        )
+    return [c for c in COLONNES_ARTICLE if c in demandees or c in COLONNES_OBLIGATOIRES]
+
+
+def poser_curseur(response: Response, tri: str, suivante: Optional[Tuple]):
+    if suivante is not None:
+        response.headers[ENTETE_CURSEUR] = encoder_curseur(tri, suivante)
+
+
+def ligne_vers_article(ligne: dict) -> dict:
+    if isinstance(ligne.get("date_publication"), date):
+        ligne["date_publication"] = ligne["date_publication"].isoformat()
+    return ligne
@@ -0,0 +1,397 @@
+# app/pdf_downloader.py
+"""
+Téléchargement concurrent de PDF (asyncio + httpx) :
+  - un pool de connexions partagé et une limite globale de téléchargements,
+  - par hôte : une limite de concurrence et un intervalle minimal entre requêtes,
+  - nouvelles tentatives avec attente exponentielle (429, 5xx, erreurs réseau),
+  - pages HTML intermédiaires suivies jusqu'à une profondeur bornée,
+  - écriture en flux vers un fichier partiel renommé atomiquement, taille
+    maximale, contrôle précoce de la signature %PDF et reprise HTTP Range,
+  - PDF rangés dans le store adressé par contenu (voir app.pdf_store).
+"""
+import os
+import random
+import asyncio
+import hashlib
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+import httpx
+from bs4 import BeautifulSoup
+
+from app.logger import logger
+from app.pdf_store import PARTIELS_DIR, hash_fichier, stocker_blob
+
+DL_CONCURRENCE = int(os.getenv("PDF_DL_CONCURRENCY", "16"))
+DL_CONCURRENCE_HOTE = int(os.getenv("PDF_DL_PER_HOST", "2"))
+DL_INTERVALLE_HOTE = float(os.getenv("PDF_DL_HOST_INTERVAL", "1.0"))
+DL_RETRIES = int(os.getenv("PDF_DL_RETRIES", "3"))
+DL_PROFONDEUR_MAX = int(os.getenv("PDF_DL_MAX_DEPTH", "2"))
+DL_TIMEOUT = httpx.Timeout(15.0, connect=10.0)
+
+HEADERS = {"User-Agent": "Mozilla/5.0", "Accept": "application/pdf"}
+CODES_A_RETENTER = {429, 500, 502, 503, 504}
+
+# Écriture en flux : taille max d'un PDF, taille des blocs, taille max d'une page HTML
+TAILLE_MAX_PDF = int(os.getenv("PDF_MAX_BYTES", str(100 * 1024 * 1024)))
+TAILLE_BLOC = 64 * 1024
+TAILLE_MAX_HTML = 2 * 1024 * 1024
+# La signature %PDF doit apparaître dans le premier Ko du fichier
+MAGIC_PDF = b"%PDF"
+TAILLE_ENTETE = 1024
+
+
+class PDFInvalide(Exception):
+    """Contenu rejeté : pas de signature %PDF ou taille maximale dépassée."""
+
+
+class EcriturePDF:
+    """
+    Écrit un PDF par blocs dans un fichier partiel (PDF_DIR/partiels, nommé
+    d'après la source, l'article et l'URL : deux moissonneurs qui
+    téléchargent la même URL n'écrivent pas dans le même fichier) en calculant son SHA-256 au fil de l'eau, puis le range
+    atomiquement dans le store adressé par contenu. Le fichier partiel
+    survit à une coupure réseau, ce qui permet une reprise par requête Range.
+    """
+
+    def __init__(self, url: str, article_id: int, source: str = "", taille_max: int = TAILLE_MAX_PDF):
+        self.url = url
+        nom = f"{source or 'pdf'}_{article_id}_{hashlib.sha1(url.encode('utf-8')).hexdigest()}.part"
+        self.partiel = os.path.join(PARTIELS_DIR, nom)
+        self.taille_max = taille_max
+        self._fichier = None
+        self._entete = b""
+        self._sha = None
+        self.taille = 0
+        self.sha256 = None
+
+    def octets_recus(self) -> int:
+        """Taille du fichier partiel laissé par une tentative précédente."""
+        try:
+            return os.path.getsize(self.partiel)
+        except OSError:
+            return 0
+
+    def entetes_reprise(self) -> dict:
+        deja = self.octets_recus()
+        return {"Range": f"bytes={deja}-"} if deja else {}
+
+    def ouvrir(self, status_code: int, headers) -> None:
+        """
+        Prépare l'écriture : reprise en fin de fichier partiel si le serveur a
+        répondu 206 au bon offset, sinon écriture depuis le début.
+        Rejette d'emblée un Content-Length supérieur à la taille max.
+        """
+        deja = self.octets_recus()
+        reprise = (
+            status_code == 206 and deja > 0
+            and headers.get("Content-Range", "").startswith(f"bytes {deja}-")
+        )
+        longueur = headers.get("Content-Length", "")
+        if longueur.isdigit() and (deja if reprise else 0) + int(longueur) > self.taille_max:
+            raise PDFInvalide(f"taille annoncée {int(longueur)} octets > {self.taille_max}")
+
+        if status_code == 206 and not reprise:
+            raise PDFInvalide("réponse partielle 206 sans reprise possible")
+        if reprise:
+            with open(self.partiel, "rb") as f:
+                self._entete = f.read(TAILLE_ENTETE)
+            self.taille = deja
+            self._sha = hash_fichier(self.partiel)
+            self._fichier = open(self.partiel, "ab")
+            logger.info(f"⏯️ Reprise du téléchargement à l'octet {deja} : {self.url}")
+        else:
+            self._entete = b""
+            self.taille = 0
+            self._sha = hashlib.sha256()
+            self._fichier = open(self.partiel, "wb")
+
+    def ecrire(self, bloc: bytes) -> None:
+        if len(self._entete) < TAILLE_ENTETE:
+            self._entete += bloc[:TAILLE_ENTETE - len(self._entete)]
+            if len(self._entete) >= TAILLE_ENTETE:
+                self._verifier_entete()
+        self.taille += len(bloc)
+        if self.taille > self.taille_max:
+            raise PDFInvalide(f"taille max de {self.taille_max} octets dépassée")
+        self._sha.update(bloc)
+        self._fichier.write(bloc)
+
+    def _verifier_entete(self) -> None:
+        if MAGIC_PDF not in self._entete:
+            raise PDFInvalide(f"signature %PDF absente (début : {self._entete[:40]!r})")
+
+    def terminer(self) -> str:
+        self._fichier.close()
+        self._verifier_entete()
+        self.sha256 = self._sha.hexdigest()
+        chemin = stocker_blob(self.partiel, self.sha256)
+        logger.info(f"✅ PDF téléchargé : {chemin} ({self.taille} octets)")
+        return chemin
+
+    def abandonner(self, garder_partiel: bool) -> None:
+        """Ferme le fichier ; le partiel n'est gardé que s'il est reprenable."""
+        if self._fichier and not self._fichier.closed:
+            self._fichier.close()
+        if not garder_partiel and os.path.exists(self.partiel):
+            os.remove(self.partiel)
+
+
+def est_reponse_pdf(status_code: int, content_type: str) -> bool:
+    """Une réponse 206 ne peut venir que d'une reprise Range sur un PDF."""
+    return status_code == 206 or "application/pdf" in content_type or "octet-stream" in content_type
+
+
+class _LimiteHote:
+    """Concurrence et cadence maximales vers un même hôte."""
+
+    def __init__(self, concurrence: int, intervalle: float):
+        self._semaphore = asyncio.Semaphore(concurrence)
+        self._intervalle = intervalle
+        self._prochain_depart = 0.0
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            maintenant = loop.time()
+            depart = max(maintenant, self._prochain_depart)
+            self._prochain_depart = depart + self._intervalle
+        if depart > maintenant:
+            await asyncio.sleep(depart - maintenant)
+
+    async def __aexit__(self, *args):
+        self._semaphore.release()
+
+
+class TelechargeurPDF:
+    """
+    Moteur de téléchargement à utiliser comme contexte asynchrone :
+
+        async with TelechargeurPDF() as telechargeur:
+            chemin = await telechargeur.telecharger(url, article_id)
+    """
+
+    def __init__(
+        self,
+        concurrence: int = DL_CONCURRENCE,
+        concurrence_hote: int = DL_CONCURRENCE_HOTE,
+        intervalle_hote: float = DL_INTERVALLE_HOTE,
+        retries: int = DL_RETRIES,
+        profondeur_max: int = DL_PROFONDEUR_MAX,
+        source: str = "",
+    ):
+        self._concurrence = concurrence
+        self._concurrence_hote = concurrence_hote
+        self._intervalle_hote = intervalle_hote
+        self._retries = retries
+        self._profondeur_max = profondeur_max
+        self._source = source
+        self._hotes: Dict[str, _LimiteHote] = {}
+        self._client = None
+        self._client_sans_ssl = None
+        self._global = None
+
+    async def __aenter__(self):
+        limits = httpx.Limits(max_connections=self._concurrence, max_keepalive_connections=self._concurrence)
+        self._client = httpx.AsyncClient(headers=HEADERS, timeout=DL_TIMEOUT, limits=limits, follow_redirects=True)
+        self._global = asyncio.Semaphore(self._concurrence)
+        return self
+
+    async def __aexit__(self, *args):
+        await self._client.aclose()
+        if self._client_sans_ssl:
+            await self._client_sans_ssl.aclose()
+
+    def _limite_hote(self, url: str) -> _LimiteHote:
+        hote = urlparse(url).netloc.lower()
+        if hote not in self._hotes:
+            self._hotes[hote] = _LimiteHote(self._concurrence_hote, self._intervalle_hote)
+        return self._hotes[hote]
+
+    def _client_pour(self, verify_ssl: bool) -> httpx.AsyncClient:
+        if verify_ssl:
+            return self._client
+        if self._client_sans_ssl is None:
+            self._client_sans_ssl = httpx.AsyncClient(
+                headers=HEADERS, timeout=DL_TIMEOUT, follow_redirects=True, verify=False,
+                limits=httpx.Limits(max_connections=self._concurrence)
+            )
+        return self._client_sans_ssl
+
+    async def _requete(self, url: str, article_id: int, ecriture: EcriturePDF):
+        """
+        GET en flux avec limites globale/par hôte et nouvelles tentatives
+        exponentielles. Un PDF est écrit bloc par bloc sur disque (reprise
+        Range après une coupure) ; une page HTML est lue dans la limite de
+        TAILLE_MAX_HTML. Retourne ("pdf", chemin), ("html", texte, url finale)
+        ou None.
+        """
+        verify_ssl = True
+        for tentative in range(self._retries + 1):
+            attente = min(2 ** tentative, 30) + random.random()
+            try:
+                async with self._limite_hote(url), self._global:
+                    client = self._client_pour(verify_ssl)
+                    async with client.stream("GET", url, headers=ecriture.entetes_reprise()) as resp:
+                        if resp.status_code in CODES_A_RETENTER:
+                            retry_after = resp.headers.get("Retry-After", "")
+                            if retry_after.isdigit():
+                                attente = float(retry_after)
+                            logger.warning(f"⏳ HTTP {resp.status_code} pour article {article_id}, nouvel essai dans {attente:.1f}s")
+                        elif resp.status_code not in (200, 206):
+                            logger.warning(f"⚠️ HTTP {resp.status_code} pour article {article_id}")
+                            return None
+                        else:
+                            content_type = resp.headers.get("Content-Type", "")
+                            if est_reponse_pdf(resp.status_code, content_type):
+                                return "pdf", await self._ecrire_flux(resp, ecriture)
+                            if "text/html" in content_type:
+                                html = b""
+                                async for bloc in resp.aiter_bytes(TAILLE_BLOC):
+                                    html += bloc
+                                    if len(html) >= TAILLE_MAX_HTML:
+                                        break
+                                return "html", html.decode(resp.encoding or "utf-8", errors="replace"), str(resp.url)
+                            logger.warning(f"⚠️ Contenu non PDF détecté pour {article_id} (type: {content_type})")
+                            return None
+            except PDFInvalide as e:
+                ecriture.abandonner(garder_partiel=False)
+                logger.warning(f"⚠️ PDF rejeté pour article {article_id} : {e}")
+                return None
+            except httpx.ConnectError as e:
+                # en cas d'erreur SSL, retenter sans vérification (comme download_pdf)
+                if verify_ssl and "SSL" in str(e).upper():
+                    verify_ssl = False
+                    attente = 0
+                logger.warning(f"⚠️ Erreur requête pour article {article_id}: {e}")
+            except httpx.HTTPError as e:
+                # coupure en cours de corps : le fichier partiel est conservé pour la reprise
+                ecriture.abandonner(garder_partiel=True)
+                logger.warning(f"⚠️ Erreur requête pour article {article_id}: {e}")
+            if tentative < self._retries:
+                await asyncio.sleep(attente)
+        return None
+
+    async def _ecrire_flux(self, resp: httpx.Response, ecriture: EcriturePDF) -> str:
+        ecriture.ouvrir(resp.status_code, resp.headers)
+        async for bloc in resp.aiter_bytes(TAILLE_BLOC):
+            ecriture.ecrire(bloc)
+        return ecriture.terminer()
+
+    async def telecharger(self, url: str, article_id: int) -> Optional[str]:
+        """Télécharge le PDF d'un article et retourne son chemin local (ou None)."""
+        return await self._telecharger(url, article_id, 0, set())
+
+    async def _telecharger(self, url: str, article_id: int, profondeur: int, vus: set) -> Optional[str]:
+        vus.add(url)
+        resultat = await self._requete(url, article_id, EcriturePDF(url, article_id, self._source))
+        if resultat is None:
+            return None
+        if resultat[0] == "pdf":
+            return resultat[1]
+
+        _, html, url_finale = resultat
+        if profondeur >= self._profondeur_max:
+            logger.warning(f"⚠️ Profondeur max de pages HTML atteinte pour {article_id} : {url}")
+            return None
+        pdf_link = trouver_lien_pdf(html, url_finale)
+        if pdf_link and pdf_link not in vus:
+            logger.info(f"🔗 Lien PDF trouvé dans HTML pour {article_id} : {pdf_link}")
+            return await self._telecharger(pdf_link, article_id, profondeur + 1, vus)
+
+        logger.warning(f"⚠️ Aucun lien PDF dans la page HTML pour {article_id} : {url}")
+        return None
+
+
+def trouver_lien_pdf(html: str, url: str) -> Optional[str]:
+    """
+    Cherche un lien PDF dans une page HTML :
+      1) meta[name='citation_pdf_url']
+      2) liens <a href>.pdf
+      3) fallback DOI *.pdf
+    """
+    soup = BeautifulSoup(html, "html.parser")
+
+    meta = soup.find("meta", attrs={"name": "citation_pdf_url"})
+    if meta and meta.get("content"):
+        return urljoin(url, meta["content"])
+
+    for a in soup.find_all("a", href=True):
+        if a["href"].lower().endswith(".pdf"):
+            return urljoin(url, a["href"])
+
+    parsed = urlparse(url)
+    if "doi.org" in parsed.netloc and not parsed.path.lower().endswith(".pdf"):
+        return url.rstrip("/") + ".pdf"
+    return None
+
+
+async def _telecharger_items(telechargeur: TelechargeurPDF, items: list) -> Dict[int, Optional[str]]:
+    chemins = await asyncio.gather(
+        *(telechargeur.telecharger(url, article_id) for article_id, url in items),
+        return_exceptions=True,
+    )
+    resultats = {}
+    for (article_id, url), chemin in zip(items, chemins):
+        if isinstance(chemin, Exception):
+            logger.error(f"❌ Téléchargement échoué pour article {article_id} ({url}) : {chemin}")
+            chemin = None
+        resultats[article_id] = chemin
+    reussis = sum(1 for c in resultats.values() if c)
+    logger.info(f"📥 Lot de téléchargements terminé : {reussis}/{len(items)} PDF")
+    return resultats
+
+
+async def telecharger_pdfs(items: Iterable[Tuple[int, str]], **options) -> Dict[int, Optional[str]]:
+    """
+    Télécharge en parallèle une liste de (article_id, url).
+    Retourne {article_id: chemin local ou None}, dans l'ordre des items.
+    """
+    items = list(items)
+    if not items:
+        return {}
+    async with TelechargeurPDF(**options) as telechargeur:
+        return await _telecharger_items(telechargeur, items)
+
+
+def telecharger_pdfs_lot(items: Iterable[Tuple[int, str]], **options) -> Dict[int, Optional[str]]:
+    """Version synchrone de telecharger_pdfs, pour un lot isolé (tâches Celery)."""
+    return asyncio.run(telecharger_pdfs(items, **options))
+
+
+class SessionTelechargement:
+    """
+    Version synchrone pour tout un moissonnage : une seule boucle
+    d'événements et un seul TelechargeurPDF servent toutes les pages, si
+    bien que le pool de connexions et les limites par hôte (concurrence,
+    intervalle entre requêtes) valent pour l'ensemble du passage.
+
+        with SessionTelechargement() as session:
+            chemins = session.telecharger_lot([(article_id, url), ...])
+    """
+
+    def __init__(self, **options):
+        self._options = options
+        self._loop = None
+        self._telechargeur = None
+
+    def __enter__(self):
+        self._loop = asyncio.new_event_loop()
+        self._telechargeur = TelechargeurPDF(**self._options)
+        self._loop.run_until_complete(self._telechargeur.__aenter__())
+        return self
+
+    def __exit__(self, *args):
+        try:
+            self._loop.run_until_complete(self._telechargeur.__aexit__(*args))
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+        finally:
+            self._loop.close()
+
+    def telecharger_lot(self, items: Iterable[Tuple[int, str]]) -> Dict[int, Optional[str]]:
+        items = list(items)
+        if not items:
+            return {}
+        return self._loop.run_until_complete(_telecharger_items(self._telechargeur, items))
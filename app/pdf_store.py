@@ -0,0 +1,112 @@
+# app/pdf_store.py
+"""
+Stockage des PDF adressé par contenu : chaque fichier est rangé sous le
+SHA-256 de ses octets, dans des sous-répertoires à deux niveaux
+(PDF_DIR/store/ab/cd/abcd….pdf). Un même PDF moissonné par plusieurs
+sources n'est stocké qu'une fois.
+"""
+import os
+import re
+import hashlib
+from typing import Optional
+
+from app.logger import logger
+
+PDF_DIR = os.getenv("PDF_DIR", "pdfs")
+STORE_DIR = os.path.join(PDF_DIR, "store")
+PARTIELS_DIR = os.path.join(PDF_DIR, "partiels")
+# Ancien nommage, antérieur au store : PDF_DIR/{article_id}.pdf
+_RE_PDF_HISTORIQUE = re.compile(r"^(\d+)\.pdf$")
+CLE_MIGRATION_PDFS = "migration_pdfs_store"
+os.makedirs(STORE_DIR, exist_ok=True)
+os.makedirs(PARTIELS_DIR, exist_ok=True)
+
+
+def chemin_blob(sha256: str) -> str:
+    return os.path.join(STORE_DIR, sha256[:2], sha256[2:4], f"{sha256}.pdf")
+
+
+def hash_depuis_chemin(chemin: str) -> Optional[str]:
+    """Retrouve le SHA-256 d'un PDF du store à partir de son chemin."""
+    nom = os.path.splitext(os.path.basename(chemin))[0]
+    if len(nom) == 64 and os.path.abspath(chemin) == os.path.abspath(chemin_blob(nom)):
+        return nom
+    return None
+
+
+def hash_fichier(chemin: str, sha=None):
+    """Ajoute le contenu d'un fichier à un objet hashlib (créé si absent)."""
+    sha = sha or hashlib.sha256()
+    with open(chemin, "rb") as f:
+        for bloc in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(bloc)
+    return sha
+
+
+def stocker_blob(chemin_source: str, sha256: str) -> str:
+    """
+    Déplace un fichier complet vers son emplacement adressé par contenu.
+    Si ce contenu est déjà stocké, le fichier source est simplement supprimé.
+    """
+    destination = chemin_blob(sha256)
+    if os.path.exists(destination):
+        os.remove(chemin_source)
+    else:
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(chemin_source, destination)
+    return destination
+
+
+def stocker_fichier(chemin: str) -> str:
+    """Range un PDF existant (hors store) dans le store et retourne son nouveau chemin."""
+    return stocker_blob(chemin, hash_fichier(chemin).hexdigest())
+
+
+def migrer_pdfs_historiques(db) -> int:
+    """
+    Migration unique (clé meta 'migration_pdfs_store') des PDF nommés
+    PDF_DIR/{article_id}.pdf avant le store : chaque fichier est rangé par
+    stocker_fichier et associé à son article (articles_contenus), ce qui le
+    rend éligible à la réutilisation par hash et au batch GROBID.
+    L'ancien nom ne disait pas de quelle table venait l'article : un id
+    présent dans les deux tables reste sans association (journalisé).
+    Retourne le nombre d'articles associés.
+    """
+    if db.get_meta(CLE_MIGRATION_PDFS) == "1":
+        return 0
+    fichiers = {}
+    for nom in os.listdir(PDF_DIR):
+        correspondance = _RE_PDF_HISTORIQUE.match(nom)
+        if correspondance and os.path.isfile(os.path.join(PDF_DIR, nom)):
+            fichiers[int(correspondance.group(1))] = os.path.join(PDF_DIR, nom)
+
+    sources = {}
+    for table in ("articles_openalex", "articles_oai"):
+        for article_id in db.articles_existants(table, list(fichiers)):
+            sources.setdefault(article_id, []).append(table)
+
+    associes, ambigus, orphelins = 0, 0, 0
+    for article_id, chemin in fichiers.items():
+        chemin_store = stocker_fichier(chemin)
+        tables = sources.get(article_id, [])
+        if len(tables) == 1:
+            db.associer_contenu_pdf(tables[0], article_id, hash_depuis_chemin(chemin_store), chemin_store)
+            associes += 1
+        elif tables:
+            ambigus += 1
+        else:
+            orphelins += 1
+    if ambigus:
+        logger.warning(f"⚠️ {ambigus} PDF historiques non associés : id présent dans les deux tables")
+    db.set_meta(CLE_MIGRATION_PDFS, "1")
+    logger.info(f"📦 PDF historiques rangés dans le store : {len(fichiers)} fichiers, "
+                f"{associes} associés, {orphelins} sans article")
+    return associes
+
+
+if __name__ == "__main__":
+    from app.database import DatabaseManager
+
+    with DatabaseManager() as db:
+        db.create_tables()
+        migrer_pdfs_historiques(db)
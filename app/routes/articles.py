@@ -1,19 +1,21 @@
 # app/routes/articles.py
-from fastapi import APIRouter, HTTPException, Query, Path, status
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Query, Path, Response, status
+from typing import List, Dict, Any, Optional
 
 from app.database import DatabaseManager
 from app.nlp import detecter_controverse
 from app.utils import nettoyer_texte
 from app.schemas import ArticleOpenAlex, ControverseOpenAlex, AnalyseNLPResponse
+from app.pagination import COLONNES_CONTROVERSE, colonnes_demandees, decoder_curseur, ligne_vers_article, poser_curseur
 
 router = APIRouter(tags=["Articles"])
 TABLES_VALIDES = ["articles_openalex", "articles_oai"]
 
 @router.get(
     "/",
-    summary="Retourne tous les articles stockés",
+    summary="Retourne les articles stockés, par pages",
     response_model=List[ArticleOpenAlex],
+    response_model_exclude_unset=True,
     responses={
         200: {
             "description": "Liste des articles avec score de controverse",
@@ -25,27 +27,29 @@ TABLES_VALIDES = ["articles_openalex", "articles_oai"]
     }
 )
 def get_all_articles(
+    response: Response,
     table: str = Query(
         "articles_openalex",
         pattern="^articles_(openalex|oai)$",
         description="Table à interroger"
-    )
+    ),
+    limit: int = Query(50, ge=1, le=500, description="Nombre d'articles par page"),
+    cursor: Optional[str] = Query(None, description="Curseur de page (en-tête X-Next-Cursor de la page précédente)"),
+    fields: Optional[str] = Query(None, description="Colonnes à renvoyer, séparées par des virgules (texte_complet seulement si demandé)")
 ) -> List[ArticleOpenAlex]:
+    """
+    Articles triés par score de controverse décroissant, par pages.
+    La page suivante s'obtient en repassant l'en-tête X-Next-Cursor dans `cursor`.
+    """
+    colonnes = colonnes_demandees(fields)
+    apres = decoder_curseur(cursor, "score")
     try:
         with DatabaseManager() as db:
-            db.cur.execute(f"""
-                SELECT id, titre, auteurs, date_publication, resume, lien_pdf, texte_complet,
-                       score_controverse, est_controverse, extrait_controverse
-                FROM {table}
-                ORDER BY score_controverse DESC NULLS LAST;
-            """)
-            rows = db.cur.fetchall()
+            lignes, suivante = db.lister_articles(table, tri="score", apres=apres, limit=limit, colonnes=colonnes)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur récupération articles : {e}")
-    return [ArticleOpenAlex(
-        id=r[0], titre=r[1], auteurs=r[2], date_publication=r[3].isoformat(), resume=r[4], lien_pdf=r[5],
-        texte_complet=r[6], score_controverse=r[7], est_controverse=r[8], extrait_controverse=r[9]
-    ) for r in rows]
+    poser_curseur(response, "score", suivante)
+    return [ArticleOpenAlex(**ligne_vers_article(ligne)) for ligne in lignes]
 
 @router.get(
     "/controverses",
@@ -59,6 +63,7 @@ def get_all_articles(
     }
 )
 def get_controverses(
+    response: Response,
     table: str = Query(
         "articles_openalex", pattern="^articles_(openalex|oai)$",
         description="Table à interroger"
@@ -66,22 +71,21 @@ def get_controverses(
     seuil: float = Query(
         0.6, ge=0.0, le=1.0,
         description="Seuil minimal de score de controverse"
-    )
+    ),
+    limit: int = Query(50, ge=1, le=500, description="Nombre d'articles par page"),
+    cursor: Optional[str] = Query(None, description="Curseur de page (en-tête X-Next-Cursor de la page précédente)")
 ) -> List[ControverseOpenAlex]:
+    apres = decoder_curseur(cursor, "score")
     try:
         with DatabaseManager() as db:
-            db.cur.execute(f"""
-                SELECT id, titre, score_controverse, extrait_controverse
-                FROM {table}
-                WHERE est_controverse = TRUE AND score_controverse >= %s
-                ORDER BY score_controverse DESC;
-            """, (seuil,))
-            rows = db.cur.fetchall()
+            lignes, suivante = db.lister_articles(
+                table, tri="score", apres=apres, limit=limit,
+                colonnes=COLONNES_CONTROVERSE, seuil=seuil, controverses_seulement=True
+            )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur récupération controverses : {e}")
-    return [ControverseOpenAlex(
-        id=r[0], titre=r[1], score_controverse=r[2], extrait_controverse=r[3]
-    ) for r in rows]
+    poser_curseur(response, "score", suivante)
+    return [ControverseOpenAlex(**ligne) for ligne in lignes]
 
 @router.get(
     "/{table}/{article_id}",
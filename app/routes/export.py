@@ -0,0 +1,111 @@
+# app/routes/export.py
+"""
+Export en flux du corpus : les lignes sont lues par un curseur côté serveur
+et écrites au fil de l'eau (NDJSON ou CSV, gzip en option), la mémoire
+utilisée ne dépend pas de la taille de la table.
+"""
+import csv
+import io
+import json
+import zlib
+from contextlib import closing
+from typing import Iterator, List, Optional
+
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+
+from app.logger import logger
+from app.database import DatabaseManager
+from app.pagination import colonnes_demandees, ligne_vers_article
+
+router = APIRouter(tags=["Export"])
+
+# Lignes sérialisées par morceau envoyé au client
+LIGNES_PAR_MORCEAU = 500
+TYPES_MIME = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _morceaux_ndjson(lignes: Iterator[dict]) -> Iterator[str]:
+    morceau = []
+    for ligne in lignes:
+        morceau.append(json.dumps(ligne_vers_article(ligne), ensure_ascii=False))
+        if len(morceau) >= LIGNES_PAR_MORCEAU:
+            yield "\n".join(morceau) + "\n"
+            morceau = []
+    if morceau:
+        yield "\n".join(morceau) + "\n"
+
+
+def _morceaux_csv(lignes: Iterator[dict], colonnes: List[str]) -> Iterator[str]:
+    tampon = io.StringIO()
+    writer = csv.DictWriter(tampon, fieldnames=colonnes)
+    writer.writeheader()
+    for n, ligne in enumerate(lignes, start=1):
+        writer.writerow(ligne_vers_article(ligne))
+        if n % LIGNES_PAR_MORCEAU == 0:
+            yield tampon.getvalue()
+            tampon.seek(0)
+            tampon.truncate()
+    if tampon.tell():
+        yield tampon.getvalue()
+
+
+def _flux_export(table: str, colonnes: List[str], format: str, compresser: bool) -> Iterator[bytes]:
+    # connexion empruntée au premier morceau et rendue à la fin du flux,
+    # y compris si le client se déconnecte en cours de route
+    compresseur = zlib.compressobj(6, zlib.DEFLATED, 31) if compresser else None
+    try:
+        with DatabaseManager() as db, closing(db.iterer_articles(table, colonnes)) as lignes:
+            if format == "csv":
+                morceaux = _morceaux_csv(lignes, colonnes)
+            else:
+                morceaux = _morceaux_ndjson(lignes)
+            for morceau in morceaux:
+                donnees = morceau.encode("utf-8")
+                if compresseur:
+                    donnees = compresseur.compress(donnees)
+                if donnees:
+                    yield donnees
+    except Exception as e:
+        # l'en-tête 200 est déjà parti : le flux est tronqué
+        logger.error(f"❌ Export {table} interrompu : {e}")
+        raise
+    if compresseur:
+        yield compresseur.flush()
+
+
+@router.get(
+    "/",
+    summary="Export complet d'une table d'articles (NDJSON ou CSV, en flux)",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "Articles de la table, une ligne par article, dans l'ordre des id",
+            "content": {"application/x-ndjson": {}, "text/csv": {}},
+        },
+        400: {"description": "Champs invalides"},
+    }
+)
+def exporter_articles(
+    table: str = Query(
+        "articles_openalex",
+        pattern="^articles_(openalex|oai)$",
+        description="Table à exporter"
+    ),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Format de sortie"),
+    fields: Optional[str] = Query(None, description="Colonnes à exporter, séparées par des virgules (texte_complet seulement si demandé)"),
+    gzip: bool = Query(False, description="Compresser le flux (Content-Encoding: gzip)")
+) -> StreamingResponse:
+    """
+    Exporte toute la table sans la charger en mémoire : curseur côté serveur
+    (DB_EXPORT_ITERSIZE lignes par aller-retour) et envoi par morceaux.
+    """
+    colonnes = colonnes_demandees(fields)
+    entetes = {"Content-Disposition": f'attachment; filename="{table}.{format}"'}
+    if gzip:
+        entetes["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        _flux_export(table, colonnes, format, gzip),
+        media_type=TYPES_MIME[format],
+        headers=entetes,
+    )
@@ -1,24 +1,28 @@
 # app/routes/grobid.py
+import asyncio
 import os
+import re
 import json
 import time
-import requests
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 from fastapi import APIRouter, HTTPException, Request, File, UploadFile, status, Query
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
-from lxml import etree
 
-from app.database import DatabaseManager
+from app.database import ARTICLE_TABLES, DatabaseManager
+from app.pdf_store import PDF_DIR, chemin_blob
+from app.schemas import ArticleCitant, ParagrapheControverse
 from app.utils import nettoyer_texte
-from app.nlp_grobid import detecter_controverse_via_tei
+from app.nlp_grobid import RESULTAT_TEI_VIDE
+from app.inference import analyser_textes_async
+from app.tei import lire_tei
+from app.grobid_client import GROBID_URL, GrobidErreur, GrobidIndisponible, get_client_grobid
 from app.logger import logger
 
 # Configuration
 templates = Jinja2Templates(directory="templates")
-PDF_DIR = os.getenv("PDF_DIR", "./pdfs")
-GROBID_URL = os.getenv("GROBID_URL")
+_RE_NOM_BLOB = re.compile(r"^([0-9a-f]{64})\.pdf$")
 
 router = APIRouter(tags=["GROBID"])
 
@@ -33,58 +37,87 @@ async def process_content(content: bytes, filename: str) -> Dict[str, Any]:
         logger.info(f"[process_content] Début de traitement pour {filename}")
         start_time = time.perf_counter()
 
-        resp = requests.post(
-            GROBID_URL,
-            files={"input": (filename, content, "application/pdf")},
-            timeout=(120, 300)
-        )
-
-        if resp.status_code != 200:
-            logger.error(f"Erreur GROBID {resp.status_code}: {resp.text}")
-            raise HTTPException(status_code=500, detail="Erreur de traitement GROBID")
-
-        tei_xml = resp.text
-        if "<TEI" not in tei_xml:
-            raise HTTPException(status_code=500, detail="Réponse TEI invalide")
-
-        root = etree.fromstring(tei_xml.encode("utf-8"))
-        ns = {"tei": "http://www.tei-c.org/ns/1.0"}
-
-        title = root.findtext(".//tei:titleStmt/tei:title", namespaces=ns) or ""
-        authors = ", ".join([
-            " ".join([n.text for n in pers.iterchildren() if n.text])
-            for pers in root.findall(".//tei:author/tei:persName", namespaces=ns)
-        ])
-        date_pub = root.findtext(".//tei:sourceDesc//tei:date", namespaces=ns) or None
-
-        citations: List[Dict[str, Any]] = []
-        for bibl in root.xpath(".//tei:listBibl/tei:biblStruct", namespaces=ns):
-            cit_title = bibl.findtext(".//tei:title", namespaces=ns)
-            cit_author = bibl.findtext(".//tei:author/tei:persName/tei:surname", namespaces=ns)
-            cit_year = bibl.findtext(".//tei:date", namespaces=ns)
-            if cit_title:
-                citations.append({"titre": cit_title, "auteur": cit_author, "annee": cit_year})
-
-        analysis = detecter_controverse_via_tei(tei_xml)
+        try:
+            tei_xml = await get_client_grobid().traiter_pdf(content, filename)
+        except GrobidIndisponible as e:
+            logger.error(f"GROBID indisponible : {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": str(int(get_client_grobid().disjoncteur.pause))}
+            )
+        except GrobidErreur as e:
+            logger.error(f"Erreur GROBID : {e}")
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
+
+        document = lire_tei(tei_xml)
+        texte = nettoyer_texte(document.texte) if document.texte else ""
+        analysis = (await analyser_textes_async([texte]))[0] if texte else RESULTAT_TEI_VIDE
 
         elapsed = time.perf_counter() - start_time
         logger.info(f"Traitement terminé en {elapsed:.2f}s")
 
         return {
             "filename": filename,
-            "titre": title,
-            "auteurs": authors,
-            "date_publication": date_pub,
-            "citations": citations,
+            "titre": document.titre,
+            "auteurs": ", ".join(document.auteurs),
+            "date_publication": document.date_publication,
+            "citations": document.citations(),
+            "sections": [section.titre for section in document.sections if section.titre],
             "tei_brut": tei_xml,
-            "score_tei": analysis.get("score"),
-            "extrait_controverse_tei": analysis.get("extrait")
+            "est_controverse_tei": analysis["est_controverse"],
+            "score_tei": analysis["score_controverse"],
+            "extrait_controverse_tei": analysis["extrait_controverse"]
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Erreur lors du traitement")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/etat", summary="État du client GROBID (concurrence, 503, disjoncteur)", response_model=Dict[str, Any])
+async def etat_grobid() -> Dict[str, Any]:
+    check_grobid_config()
+    return get_client_grobid().stats()
+
+@router.get("/citant", summary="Articles citant une référence (DOI ou titre)", response_model=List[ArticleCitant])
+def articles_citant(
+    doi: Optional[str] = Query(None, description="DOI cité (prioritaire sur le titre)"),
+    titre: Optional[str] = Query(None, min_length=3, description="Fragment du titre cité"),
+    limit: int = Query(20, ge=1, le=200)
+) -> List[Dict[str, Any]]:
+    if not doi and not titre:
+        raise HTTPException(status_code=400, detail="Paramètre 'doi' ou 'titre' requis")
+    try:
+        with DatabaseManager() as db:
+            lignes = db.articles_citant(titre=titre, doi=doi, limit=limit)
+    except Exception as e:
+        logger.error(f"Erreur recherche des articles citants : {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur recherche des articles citants : {e}")
+    return [
+        dict(zip(("source", "article_id", "titre", "titre_cite", "annee_citee", "doi_cite"), ligne))
+        for ligne in lignes
+    ]
+
+@router.get("/paragraphes-controverses", summary="Paragraphes controversés, par titre de section",
+            response_model=List[ParagrapheControverse])
+def paragraphes_controverses(
+    section: Optional[str] = Query(None, description="Titre de section (ex. Results), casse ignorée"),
+    limit: int = Query(20, ge=1, le=200)
+) -> List[Dict[str, Any]]:
+    try:
+        with DatabaseManager() as db:
+            lignes = db.paragraphes_controverses(section=section, limit=limit)
+    except Exception as e:
+        logger.error(f"Erreur lecture des paragraphes controversés : {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lecture des paragraphes controversés : {e}")
+    return [
+        dict(zip(("source", "article_id", "titre", "numero_section", "section", "paragraphe",
+                  "score_controverse_tei"), ligne))
+        for ligne in lignes
+    ]
+
 @router.post("/upload", summary="Upload PDF utilisateur", response_model=Dict[str, Any])
 async def upload_file(file: UploadFile = File(...)) -> Dict[str, Any]:
     if file.content_type != "application/pdf":
@@ -92,10 +125,35 @@ async def upload_file(file: UploadFile = File(...)) -> Dict[str, Any]:
     content = await file.read()
     return await process_content(content, file.filename)
 
+def _chemin_pdf_article(source: str, article_id: int) -> Optional[str]:
+    with DatabaseManager() as db:
+        contenu = db.get_contenu_pdf(source, article_id)
+    return contenu[1] if contenu else None
+
 @router.post("/process-local", summary="Traiter PDF local", response_model=Dict[str, Any])
-async def process_local_file(filename: str = Query(..., description="Nom du fichier PDF")) -> Dict[str, Any]:
-    file_path = os.path.join(PDF_DIR, filename)
-    if not os.path.isfile(file_path):
+async def process_local_file(
+    filename: Optional[str] = Query(None, description="Nom du fichier PDF : <sha256>.pdf du store, ou fichier de PDF_DIR"),
+    source: Optional[str] = Query(None, description="Table de l'article (articles_oai, articles_openalex)"),
+    article_id: Optional[int] = Query(None, description="Article dont le PDF stocké est traité")
+) -> Dict[str, Any]:
+    if source is not None and article_id is not None:
+        if source not in ARTICLE_TABLES:
+            raise HTTPException(400, f"Source inconnue : {source}")
+        try:
+            file_path = await asyncio.to_thread(_chemin_pdf_article, source, article_id)
+        except Exception as e:
+            logger.error(f"Erreur lecture du PDF stocké de {source} #{article_id} : {e}")
+            raise HTTPException(500, f"Erreur lecture du PDF stocké : {e}")
+        filename = f"{source}_{article_id}.pdf"
+    elif filename:
+        # un nom de fichier, jamais un chemin
+        if os.path.basename(filename) != filename or filename in (".", "..") or "\\" in filename:
+            raise HTTPException(400, "Nom de fichier invalide")
+        blob = _RE_NOM_BLOB.match(filename)
+        file_path = chemin_blob(blob.group(1)) if blob else os.path.join(PDF_DIR, filename)
+    else:
+        raise HTTPException(400, "Indiquer filename, ou source et article_id")
+    if not file_path or not os.path.isfile(file_path):
         raise HTTPException(404, "Fichier introuvable")
     with open(file_path, "rb") as f:
         content = f.read()
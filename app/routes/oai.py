@@ -2,16 +2,18 @@
 import feedparser
 import httpx
 import anyio
-from fastapi import APIRouter, HTTPException, Query, status
-from datetime import date
+from fastapi import APIRouter, HTTPException, Query, Response, status
 from typing import Optional, List, Dict, Any
 
 from app.logger import logger
 from app.database import DatabaseManager
+from app.http_client import get_client_http
 from app.moissonneur import fetch_oai_pmh_articles
 from app.schemas import ArticleOAI, ControverseOAI, RechercheResult, NLPBatchResponse, ArticleBase
 from app.celery_tasks import reanalyser_articles_nlp
-from app.nlp import SEUIL_CONTROVERSE, detecter_controverse
+from app.nlp import SEUIL_CONTROVERSE
+from app.inference import analyser_textes_async
+from app.pagination import COLONNES_CONTROVERSE, colonnes_demandees, decoder_curseur, ligne_vers_article, poser_curseur
 
 router = APIRouter(
     tags=["OAI-PMH"]
@@ -48,50 +50,35 @@ def moissonner_oai():
     "/articles",
     summary="Articles OAI-PMH en base",
     response_model=List[ArticleOAI],
+    response_model_exclude_unset=True,
     responses={
-        200: {"description": "Liste des articles OAI-PMH stockés en base"},
+        200: {"description": "Liste des articles OAI-PMH stockés en base (page suivante : en-tête X-Next-Cursor)"},
+        400: {"description": "Curseur ou champs invalides"},
         500: {"description": "Erreur lecture base de données"}
     }
 )
 def get_articles_oai(
-    limit: int = Query(20, ge=1, description="Nombre maximum d'articles à retourner")
+    response: Response,
+    limit: int = Query(20, ge=1, le=500, description="Nombre maximum d'articles à retourner"),
+    cursor: Optional[str] = Query(None, description="Curseur de page (en-tête X-Next-Cursor de la page précédente)"),
+    fields: Optional[str] = Query(None, description="Colonnes à renvoyer, séparées par des virgules (texte_complet seulement si demandé)")
 ):
     """
-    Récupère les articles OAI-PMH présents en base.
+    Récupère les articles OAI-PMH présents en base, triés par date décroissante.
     """
+    colonnes = colonnes_demandees(fields)
+    apres = decoder_curseur(cursor, "date")
     try:
         with DatabaseManager() as db:
-            db.cur.execute(
-                """
-                SELECT * FROM articles_oai
-                ORDER BY date_publication DESC
-                LIMIT %s;
-                """, (limit,)
+            lignes, suivante = db.lister_articles(
+                "articles_oai", tri="date", apres=apres, limit=limit, colonnes=colonnes
             )
-            rows = db.cur.fetchall()
     except Exception as e:
         logger.exception("Erreur récupération articles OAI-PMH")
         raise HTTPException(status_code=500, detail=str(e))
 
-    results = []
-    for row in rows:
-        pub = row[3]
-        pub_str = pub.isoformat() if isinstance(pub, date) else str(pub)
-        results.append(
-            ArticleOAI(
-                id=row[0],
-                titre=row[1],
-                auteurs=row[2],
-                date_publication=pub_str,
-                resume=row[4],
-                lien_pdf=row[5],
-                texte_complet=row[6],
-                est_controverse=row[7],
-                score_controverse=row[8],
-                extrait_controverse=row[9]
-            )
-        )
-    return results
+    poser_curseur(response, "date", suivante)
+    return [ArticleOAI(**ligne_vers_article(ligne)) for ligne in lignes]
 
 @router.get(
     "/recherche",
@@ -148,17 +135,17 @@ async def recherche_oai_enligne(
     }
 
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.get(ARXIV_REST_URL, params=params)
-            resp.raise_for_status()
-            xml_text = resp.text
+        client = get_client_http()
+        resp = await client.get(ARXIV_REST_URL, params=params)
+        resp.raise_for_status()
+        xml_text = resp.text
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
     except httpx.RequestError as e:
         raise HTTPException(status_code=502, detail=str(e))
 
     feed = feedparser.parse(xml_text)
-    articles: List[ArticleBase] = []
+    fiches = []
 
     for entry in feed.entries:
         # Titre et auteurs
@@ -178,30 +165,29 @@ async def recherche_oai_enligne(
             entry.id
         )
 
-        # Détection de controverse
-        nlp_res = detecter_controverse(resume)
-        est = nlp_res.get("est_controverse", False)
-        score = nlp_res.get("score_controverse", 0.0)
-        extrait = nlp_res.get("extrait_controverse", "")
-
-        # Construction de l'objet ArticleBase
-        articles.append(
-            ArticleBase(
-                titre=titre,
-                auteurs=auteurs,
-                date_publication=date_pub,
-                resume=resume,
-                lien_pdf=pdf_link,
-                est_controverse=est,
-                score_controverse=score,
-                extrait_controverse=extrait
-            )
-        )
+        fiches.append(dict(
+            titre=titre,
+            auteurs=auteurs,
+            date_publication=date_pub,
+            resume=resume,
+            lien_pdf=pdf_link,
+        ))
 
-        if len(articles) >= max_results:
+        if len(fiches) >= max_results:
             break
 
-    return articles
+    # Détection de controverse, en un seul lot pour toute la requête,
+    # hors de la boucle d'événements
+    analyses = await analyser_textes_async([fiche["resume"] for fiche in fiches])
+    return [
+        ArticleBase(
+            **fiche,
+            est_controverse=nlp_res.get("est_controverse", False),
+            score_controverse=nlp_res.get("score_controverse", 0.0),
+            extrait_controverse=nlp_res.get("extrait_controverse", ""),
+        )
+        for fiche, nlp_res in zip(fiches, analyses)
+    ]
 
 
 @router.get(
@@ -214,6 +200,7 @@ async def recherche_oai_enligne(
     }
 )
 def get_controverses_oai(
+    response: Response,
     seuil: float = Query(
         SEUIL_CONTROVERSE,
         ge=0.0,
@@ -225,31 +212,24 @@ def get_controverses_oai(
         ge=1,
         le=100,
         description="Nombre maximum d’articles retournés"
-    )
+    ),
+    cursor: Optional[str] = Query(None, description="Curseur de page (en-tête X-Next-Cursor de la page précédente)")
 ):
     """
     Récupère les articles OAI-PMH marqués comme controversés.
     """
+    apres = decoder_curseur(cursor, "score")
     try:
         with DatabaseManager() as db:
-            sql = (
-                "SELECT id, titre, score_controverse, extrait_controverse "
-                "FROM articles_oai WHERE score_controverse >= %s "
-                "ORDER BY score_controverse DESC, date_publication DESC LIMIT %s;"
+            lignes, suivante = db.lister_articles(
+                "articles_oai", tri="score", apres=apres, limit=limit,
+                colonnes=COLONNES_CONTROVERSE, seuil=seuil
             )
-            db.cur.execute(sql, (seuil, limit))
-            rows = db.cur.fetchall()
     except Exception as e:
         logger.exception("Erreur récupération controverses OAI-PMH")
         raise HTTPException(status_code=500, detail=str(e))
 
-    return [
-        ControverseOAI(
-            id=r[0],
-            titre=r[1],
-            score_controverse=float(r[2]),
-            extrait_controverse=r[3]
-        ) for r in rows
-    ]
+    poser_curseur(response, "score", suivante)
+    return [ControverseOAI(**ligne) for ligne in lignes]
 
 
@@ -1,14 +1,17 @@
 # app/routes/openalex.py
-from fastapi import APIRouter, Query, HTTPException, status
+from fastapi import APIRouter, Query, HTTPException, Response, status
 from typing import Optional, List, Dict, Any
 import httpx
 
 from app.logger import logger
 from app.database import DatabaseManager
+from app.http_client import get_client_http
+from app.cache import cache_recherche
 from app.moissonneur import fetch_openalex_articles, reanalyser_tous_les_articles
 from app.schemas import ArticleOpenAlex, ControverseOpenAlex, RechercheResult, NLPBatchResponse, ArticleBase
 from app.celery_tasks import reanalyser_articles_nlp
-from app.nlp import detecter_controverse
+from app.inference import analyser_textes_async
+from app.pagination import COLONNES_CONTROVERSE, colonnes_demandees, decoder_curseur, ligne_vers_article, poser_curseur
 
 router = APIRouter(tags=["OpenAlex"])
 
@@ -79,66 +82,53 @@ async def get_works(
     Appelle l'API OpenAlex de manière asynchrone pour récupérer des articles.
     """
     params = {"filter": f"title.search:{search}", "per-page": per_page}
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
+
+    async def appeler_openalex():
+        try:
+            client = get_client_http()
             response = await client.get(OPENALEX_API_URL, params=params)
             response.raise_for_status()
             return response.json()
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
-    except httpx.RequestError as e:
-        raise HTTPException(status_code=502, detail=str(e))
+        except httpx.HTTPStatusError as e:
+            raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
+        except httpx.RequestError as e:
+            raise HTTPException(status_code=502, detail=str(e))
+
+    return await cache_recherche.obtenir("openalex_works", {"search": search, "per_page": per_page}, appeler_openalex)
 
 @router.get(
     "/articles",
     summary="Articles OpenAlex en base",
     response_model=List[ArticleOpenAlex],
+    response_model_exclude_unset=True,
     responses={
-        200: {"description": "Liste des articles stockés en base"},
+        200: {"description": "Liste des articles stockés en base (page suivante : en-tête X-Next-Cursor)"},
+        400: {"description": "Curseur ou champs invalides"},
         500: {"description": "Erreur lecture base de données"},
     },
 )
 def get_articles_openalex(
-    limit: int = Query(20, ge=1, description="Nombre max. d'articles à retourner"),
-    offset: int = Query(0, ge=0, description="Décalage pour la pagination"),
+    response: Response,
+    limit: int = Query(20, ge=1, le=500, description="Nombre max. d'articles à retourner"),
+    cursor: Optional[str] = Query(None, description="Curseur de page (en-tête X-Next-Cursor de la page précédente)"),
+    fields: Optional[str] = Query(None, description="Colonnes à renvoyer, séparées par des virgules (texte_complet seulement si demandé)"),
 ):
     """
     Récupère les articles OpenAlex présents en base, triés par date décroissante.
     """
+    colonnes = colonnes_demandees(fields)
+    apres = decoder_curseur(cursor, "date")
     try:
         with DatabaseManager() as db:
-            db.cur.execute(
-                """
-                SELECT
-                  id, titre, auteurs, date_publication, resume,
-                  lien_pdf, texte_complet, est_controverse,
-                  score_controverse, extrait_controverse
-                FROM articles_openalex
-                ORDER BY date_publication DESC
-                LIMIT %s OFFSET %s;
-                """,
-                (limit, offset),
+            lignes, suivante = db.lister_articles(
+                "articles_openalex", tri="date", apres=apres, limit=limit, colonnes=colonnes
             )
-            rows = db.cur.fetchall()
     except Exception as e:
         logger.exception("Erreur récupération articles OpenAlex")
         raise HTTPException(status_code=500, detail=str(e))
 
-    return [
-        ArticleOpenAlex(
-            id=r[0],
-            titre=r[1],
-            auteurs=r[2],
-            date_publication=r[3].isoformat(),
-            resume=r[4],
-            lien_pdf=r[5],
-            texte_complet=r[6],
-            est_controverse=r[7],
-            score_controverse=r[8],
-            extrait_controverse=r[9],
-        )
-        for r in rows
-    ]
+    poser_curseur(response, "date", suivante)
+    return [ArticleOpenAlex(**ligne_vers_article(ligne)) for ligne in lignes]
 
 
 @router.get(
@@ -167,10 +157,10 @@ async def recherche_openalex_enligne(
     params = {"filter": f"title.search:{keyword}", "per-page": max_results, "sort": sort_param}
 
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.get(OPENALEX_API_URL, params=params)
-            resp.raise_for_status()
-            data = resp.json()
+        client = get_client_http()
+        resp = await client.get(OPENALEX_API_URL, params=params)
+        resp.raise_for_status()
+        data = resp.json()
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
     except httpx.RequestError as e:
@@ -179,7 +169,7 @@ async def recherche_openalex_enligne(
     results = data.get("results", [])
     logger.debug(f"🔗 Recherche OpenAlex URL → {resp.url}")
 
-    articles: List[ArticleBase] = []
+    fiches = []
     for art in results:
         # 1) Titre et auteurs
         titre = art.get("display_name") or art.get("title", "Titre inconnu")
@@ -208,61 +198,61 @@ async def recherche_openalex_enligne(
         # 3) Lien PDF
         lien_pdf = art.get("open_access", {}).get("oa_url", "") or ""
 
-        # 4) Analyse de controverse
-        nlp_res = detecter_controverse(resume)
-        est = nlp_res.get("est_controverse", False)
-        score = nlp_res.get("score_controverse", 0.0)
-        extrait = nlp_res.get("extrait_controverse", "")
-
-        # 5) Construction de l'objet de sortie
-        articles.append(ArticleBase(
+        fiches.append(dict(
             titre=titre,
             auteurs=auteurs,
             date_publication=date_pub,
             resume=resume,
             lien_pdf=lien_pdf,
-            est_controverse=est,
-            score_controverse=score,
-            extrait_controverse=extrait
         ))
 
-        if len(articles) >= max_results:
+        if len(fiches) >= max_results:
             break
 
-    return articles
+    # 4) Analyse de controverse, en un seul lot pour toute la requête,
+    # hors de la boucle d'événements
+    analyses = await analyser_textes_async([fiche["resume"] for fiche in fiches])
+    return [
+        ArticleBase(
+            **fiche,
+            est_controverse=nlp_res.get("est_controverse", False),
+            score_controverse=nlp_res.get("score_controverse", 0.0),
+            extrait_controverse=nlp_res.get("extrait_controverse", ""),
+        )
+        for fiche, nlp_res in zip(fiches, analyses)
+    ]
 
 @router.get(
     "/controverses",
     summary="Articles controversés (OpenAlex)",
     response_model=List[ControverseOpenAlex],
     responses={
-        200: {"description": "Articles controversés retournés"},
+        200: {"description": "Articles controversés retournés (page suivante : en-tête X-Next-Cursor)"},
+        400: {"description": "Curseur invalide"},
         500: {"description": "Erreur lecture base de données"}
     }
 )
 def get_controverses_openalex(
+    response: Response,
     seuil: float = Query(0.6, ge=0.0, le=1.0, description="Seuil minimal de score de controverse"),
-    limit: Optional[int] = Query(50, ge=1, le=200, description="Nombre max d’articles à renvoyer")
+    limit: Optional[int] = Query(50, ge=1, le=200, description="Nombre max d’articles à renvoyer"),
+    cursor: Optional[str] = Query(None, description="Curseur de page (en-tête X-Next-Cursor de la page précédente)"),
 ):
     """
     Récupère les articles OpenAlex marqués comme controversés.
     """
+    apres = decoder_curseur(cursor, "score")
     try:
         with DatabaseManager() as db:
-            db.cur.execute(
-                """
-                SELECT id, titre, score_controverse, extrait_controverse
-                FROM articles_openalex
-                WHERE est_controverse = TRUE AND score_controverse >= %s
-                ORDER BY score_controverse DESC
-                LIMIT %s;
-                """, (seuil, limit)
+            lignes, suivante = db.lister_articles(
+                "articles_openalex", tri="score", apres=apres, limit=limit,
+                colonnes=COLONNES_CONTROVERSE, seuil=seuil, controverses_seulement=True
             )
-            rows = db.cur.fetchall()
     except Exception as e:
         logger.exception("Erreur récupération controverses OpenAlex")
         raise HTTPException(status_code=500, detail=str(e))
 
-    return [ControverseOpenAlex(id=r[0], titre=r[1], score_controverse=r[2], extrait_controverse=r[3]) for r in rows]
+    poser_curseur(response, "score", suivante)
+    return [ControverseOpenAlex(**ligne) for ligne in lignes]
 
 
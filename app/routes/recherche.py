@@ -1,4 +1,8 @@
 # app/routes/recherche.py
+import asyncio
+import heapq
+import os
+from itertools import islice
 from fastapi import APIRouter, Query, HTTPException, status
 from datetime import date
 from typing import Optional, List, Dict, Any
@@ -9,11 +13,16 @@ import httpx
 from app.logger import logger
 
 from app.database import DatabaseManager
+from app.http_client import get_client_http
+from app.cache import cache_recherche
 from app.utils import nettoyer_texte
-from app.nlp import detecter_controverse
+from app.inference import analyser_textes_async
+from app.nlp import est_erreur_nlp
 from app.schemas import RechercheLocaleResponse, RechercheEnLigneResponse, ControverseGlobaleResponse, RechercheResult
 
 OAI_BASE_URL = "https://export.arxiv.org/oai2"
+# Délai max accordé à chaque source de /recherche/global (secondes)
+RECHERCHE_TIMEOUT_SOURCE = float(os.getenv("RECHERCHE_TIMEOUT_SOURCE", "8"))
 
 
 router = APIRouter(
@@ -45,44 +54,20 @@ def recherche_locale(
     date_fin: Optional[date] = Query(None, description="Date de fin (YYYY-MM-DD)"),
     page: int = Query(1, ge=1, description="Numéro de page"),
     limit: int = Query(10, ge=1, le=100, description="Nombre de résultats par page"),
-    sort_by: Optional[str] = Query("date_desc", regex="^(date_asc|date_desc)$", description="Tri par date asc ou desc")
+    sort_by: Optional[str] = Query("date_desc", regex="^(date_asc|date_desc|pertinence)$", description="Tri par date asc/desc ou par pertinence (ts_rank)")
 ) -> RechercheLocaleResponse:
     if source not in ("openalex", "oai", None):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Source invalide.")
     table = f"articles_{source}" if source else None
     if not table:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Recherche sur toutes les sources désactivée pour performance.")
-    # Construction de la requête
-    query = f"SELECT * FROM {table} WHERE 1=1"
-    count_query = f"SELECT COUNT(*) FROM {table} WHERE 1=1"
-    params: List[Any] = []
-    if mot_cle:
-        clause = "titre ILIKE %s OR resume ILIKE %s"
-        query += f" AND ({clause})"
-        count_query += f" AND ({clause})"
-        params += [f"%{mot_cle}%", f"%{mot_cle}%"]
-    if auteur:
-        query += " AND auteurs ILIKE %s"
-        count_query += " AND auteurs ILIKE %s"
-        params.append(f"%{auteur}%")
-    if date_debut:
-        query += " AND date_publication >= %s"
-        count_query += " AND date_publication >= %s"
-        params.append(date_debut)
-    if date_fin:
-        query += " AND date_publication <= %s"
-        count_query += " AND date_publication <= %s"
-        params.append(date_fin)
-    order = "ASC" if sort_by == "date_asc" else "DESC"
-    query += f" ORDER BY date_publication {order} LIMIT %s OFFSET %s"
     offset = (page - 1) * limit
-    params_with_pagination = params + [limit, offset]
     try:
         with DatabaseManager() as db:
-            db.cur.execute(count_query, tuple(params))
-            total = db.cur.fetchone()[0]
-            db.cur.execute(query, tuple(params_with_pagination))
-            rows = db.cur.fetchall()
+            total, rows = db.rechercher_articles(
+                table, mot_cle=mot_cle, auteur=auteur, date_debut=date_debut, date_fin=date_fin,
+                tri=sort_by, limit=limit, offset=offset
+            )
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erreur recherche locale : {e}")
     resultats = [
@@ -92,18 +77,21 @@ def recherche_locale(
     return {"page": page, "limit": limit, "total": total, "resultats": resultats}
 
 
+def _sans_erreur_nlp(articles: List[dict]) -> bool:
+    """Aucun article ne porte RESULTAT_ERREUR_NLP (inférence en échec, à ne pas mettre en cache)."""
+    return not any(est_erreur_nlp(article) for article in articles)
+
+
+async def _en_cache(nom: str, params: Dict[str, Any], rechercher) -> List[RechercheResult]:
+    """Résultats de `rechercher()` servis via le cache des recherches en ligne."""
+    async def calculer():
+        return [article.model_dump() for article in await rechercher()]
+    donnees = await cache_recherche.obtenir(nom, params, calculer, cacher_si=_sans_erreur_nlp)
+    return [RechercheResult(**article) for article in donnees]
+
+
 # 1) Recherche OpenAlex
-@router.get(
-    "/enligne/openalex",
-    summary="Recherche en ligne via OpenAlex",
-    response_model=List[RechercheResult],
-    responses={502: {"description": "Erreur d'appel à l'API OpenAlex"}}
-)
-async def recherche_openalex_enligne(
-    keyword: str = Query(..., description="Mot-clé à rechercher"),
-    max_results: int = Query(5, ge=1, le=50, alias="per-page", description="Nombre max de résultats"),
-    sort_by: str = Query("date_desc", pattern="^(date_asc|date_desc)$", description="Tri par date")
-) -> List[RechercheResult]:
+async def _rechercher_openalex(keyword: str, max_results: int, sort_by: str) -> List[RechercheResult]:
     """
     Recherche via l'API OpenAlex, reconstruction du résumé et détection de controverse.
     """
@@ -116,17 +104,17 @@ async def recherche_openalex_enligne(
     }
 
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.get(OPENALEX_API_URL, params=params)
-            resp.raise_for_status()
-            data = resp.json()
+        client = get_client_http()
+        resp = await client.get(OPENALEX_API_URL, params=params)
+        resp.raise_for_status()
+        data = resp.json()
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
     except httpx.RequestError as e:
         raise HTTPException(status_code=502, detail=str(e))
 
     results = data.get("results", [])
-    articles: List[RechercheResult] = []
+    fiches = []
 
     for art in results:
         titre = art.get("display_name") or art.get("title", "Titre inconnu")
@@ -150,41 +138,55 @@ async def recherche_openalex_enligne(
 
         lien_pdf = art.get("open_access", {}).get("oa_url", "") or ""
 
-        # Détection de la controverse
-        nlp_res = detecter_controverse(resume)
-        est = nlp_res.get("est_controverse", False)
-        score = nlp_res.get("score_controverse", 0.0)
-        extrait = nlp_res.get("extrait_controverse", "")
-
-        articles.append(RechercheResult(
+        fiches.append(dict(
             titre=titre,
             auteurs=auteurs,
             date_publication=date_pub,
             resume=resume,
             lien_pdf=lien_pdf,
-            est_controverse=est,
-            score_controverse=score,
-            extrait_controverse=extrait
         ))
 
-        if len(articles) >= max_results:
+        if len(fiches) >= max_results:
             break
 
-    return articles
+    # Détection de la controverse, en un seul lot pour toute la requête,
+    # hors de la boucle d'événements
+    analyses = await analyser_textes_async([fiche["resume"] for fiche in fiches])
+    return [
+        RechercheResult(
+            **fiche,
+            est_controverse=nlp_res.get("est_controverse", False),
+            score_controverse=nlp_res.get("score_controverse", 0.0),
+            extrait_controverse=nlp_res.get("extrait_controverse", ""),
+        )
+        for fiche, nlp_res in zip(fiches, analyses)
+    ]
 
 
-# 2) Recherche ArXiv OAI
 @router.get(
-    "/enligne/oai",
-    summary="Recherche en ligne via l'API REST d'ArXiv",
+    "/enligne/openalex",
+    summary="Recherche en ligne via OpenAlex",
     response_model=List[RechercheResult],
-    responses={502: {"description": "Erreur d'appel à l'API ArXiv"}}
+    responses={502: {"description": "Erreur d'appel à l'API OpenAlex"}}
 )
-async def recherche_oai_enligne(
+async def recherche_openalex_enligne(
     keyword: str = Query(..., description="Mot-clé à rechercher"),
-    max_results: int = Query(5, ge=1, le=50, alias="max_results", description="Nombre max de résultats"),
+    max_results: int = Query(5, ge=1, le=50, alias="per-page", description="Nombre max de résultats"),
     sort_by: str = Query("date_desc", pattern="^(date_asc|date_desc)$", description="Tri par date")
 ) -> List[RechercheResult]:
+    """
+    Recherche via l'API OpenAlex, reconstruction du résumé et détection de controverse.
+    Réponse mise en cache (voir app.cache.CacheReponses).
+    """
+    return await _en_cache(
+        "recherche_openalex",
+        {"keyword": keyword, "max_results": max_results, "sort_by": sort_by},
+        lambda: _rechercher_openalex(keyword, max_results, sort_by),
+    )
+
+
+# 2) Recherche ArXiv OAI
+async def _rechercher_oai(keyword: str, max_results: int, sort_by: str) -> List[RechercheResult]:
     """
     Recherche via ArXiv REST Atom, nettoyage du résumé et détection de controverse.
     """
@@ -199,17 +201,17 @@ async def recherche_oai_enligne(
     }
 
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.get(ARXIV_REST_URL, params=params)
-            resp.raise_for_status()
-            xml_text = resp.text
+        client = get_client_http()
+        resp = await client.get(ARXIV_REST_URL, params=params)
+        resp.raise_for_status()
+        xml_text = resp.text
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=e.response.status_code, detail=e.response.text)
     except httpx.RequestError as e:
         raise HTTPException(status_code=502, detail=str(e))
 
     feed = feedparser.parse(xml_text)
-    articles: List[RechercheResult] = []
+    fiches = []
 
     for entry in feed.entries:
         titre = entry.title
@@ -224,56 +226,104 @@ async def recherche_oai_enligne(
 
         pdf_link = next((link.href for link in entry.links if link.type == "application/pdf"), entry.id)
 
-        # Détection de la controverse
-        nlp_res = detecter_controverse(resume)
-        est = nlp_res.get("est_controverse", False)
-        score = nlp_res.get("score_controverse", 0.0)
-        extrait = nlp_res.get("extrait_controverse", "")
-
-        articles.append(RechercheResult(
+        fiches.append(dict(
             titre=titre,
             auteurs=auteurs,
             date_publication=date_pub,
             resume=resume,
             lien_pdf=pdf_link,
-            est_controverse=est,
-            score_controverse=score,
-            extrait_controverse=extrait
         ))
 
-        if len(articles) >= max_results:
+        if len(fiches) >= max_results:
             break
 
-    return articles
+    # Détection de la controverse, en un seul lot pour toute la requête,
+    # hors de la boucle d'événements
+    analyses = await analyser_textes_async([fiche["resume"] for fiche in fiches])
+    return [
+        RechercheResult(
+            **fiche,
+            est_controverse=nlp_res.get("est_controverse", False),
+            score_controverse=nlp_res.get("score_controverse", 0.0),
+            extrait_controverse=nlp_res.get("extrait_controverse", ""),
+        )
+        for fiche, nlp_res in zip(fiches, analyses)
+    ]
 
 
-# 3) Recherche globale (OpenAlex + OAI)
-@router.get("/global", response_model=RechercheEnLigneResponse)
-async def recherche_globale(
-    keyword: str = Query(...),
-    limit: int = Query(10, ge=1),
-    sort_by: str = Query("date_desc", pattern="^(date_asc|date_desc)$")
-):
-    # 1) Appel OpenAlex
-    openalex_list = await recherche_openalex_enligne(keyword, max_results=limit, sort_by=sort_by)
-    # 2) Appel ArXiv
-    oai_list = await recherche_oai_enligne(keyword, max_results=limit, sort_by=sort_by)
+@router.get(
+    "/enligne/oai",
+    summary="Recherche en ligne via l'API REST d'ArXiv",
+    response_model=List[RechercheResult],
+    responses={502: {"description": "Erreur d'appel à l'API ArXiv"}}
+)
+async def recherche_oai_enligne(
+    keyword: str = Query(..., description="Mot-clé à rechercher"),
+    max_results: int = Query(5, ge=1, le=50, alias="max_results", description="Nombre max de résultats"),
+    sort_by: str = Query("date_desc", pattern="^(date_asc|date_desc)$", description="Tri par date")
+) -> List[RechercheResult]:
+    """
+    Recherche via ArXiv REST Atom, nettoyage du résumé et détection de controverse.
+    Réponse mise en cache (voir app.cache.CacheReponses).
+    """
+    return await _en_cache(
+        "recherche_oai",
+        {"keyword": keyword, "max_results": max_results, "sort_by": sort_by},
+        lambda: _rechercher_oai(keyword, max_results, sort_by),
+    )
 
-    # 3) Fusion
-    combined = openalex_list + oai_list
 
-    # (facultatif) tri par date si vous voulez regrouper
-    if sort_by == "date_desc":
-        combined.sort(key=lambda art: art.date_publication, reverse=True)
-    else:
-        combined.sort(key=lambda art: art.date_publication)
+# 3) Recherche globale (OpenAlex + OAI)
+async def _interroger_source(nom: str, appel) -> Optional[List[RechercheResult]]:
+    """Attend une source au plus RECHERCHE_TIMEOUT_SOURCE s ; None si elle est en échec ou trop lente."""
+    try:
+        return await asyncio.wait_for(appel, timeout=RECHERCHE_TIMEOUT_SOURCE)
+    except asyncio.TimeoutError:
+        logger.warning(f"⏱️ Recherche globale : source {nom} trop lente, résultats partiels")
+    except Exception as e:
+        logger.warning(f"⚠️ Recherche globale : source {nom} en échec ({getattr(e, 'detail', e)})")
+    return None
+
 
-    # 4) Limite finale
-    limited = combined[:limit]
+async def _recherche_globale(keyword: str, limit: int, sort_by: str) -> RechercheEnLigneResponse:
+    # 1) Appels OpenAlex et ArXiv en parallèle, chacun avec son délai :
+    # la latence est celle de la source la plus lente, pas la somme
+    sources = ("openalex", "oai")
+    reponses = await asyncio.gather(
+        _interroger_source("openalex", recherche_openalex_enligne(keyword, max_results=limit, sort_by=sort_by)),
+        _interroger_source("oai", recherche_oai_enligne(keyword, max_results=limit, sort_by=sort_by)),
+    )
+    sources_en_echec = [nom for nom, liste in zip(sources, reponses) if liste is None]
+    listes = [liste for liste in reponses if liste]
 
-    # 5) Retour
-    return RechercheEnLigneResponse(total=len(combined), resultats=limited)
+    # 2) Fusion k-voies : chaque source est déjà triée par date
+    decroissant = sort_by == "date_desc"
+    fusion = heapq.merge(*listes, key=lambda art: art.date_publication or "", reverse=decroissant)
 
+    # 3) Limite finale
+    limited = list(islice(fusion, limit))
 
+    return RechercheEnLigneResponse(
+        total=sum(len(liste) for liste in listes),
+        resultats=limited,
+        sources_en_echec=sources_en_echec,
+    )
 
 
+@router.get("/global", response_model=RechercheEnLigneResponse)
+async def recherche_globale(
+    keyword: str = Query(...),
+    limit: int = Query(10, ge=1),
+    sort_by: str = Query("date_desc", pattern="^(date_asc|date_desc)$")
+):
+    async def calculer():
+        return (await _recherche_globale(keyword, limit, sort_by)).model_dump()
+
+    # une réponse partielle (source en échec, inférence NLP en échec) n'est pas mise en cache
+    donnees = await cache_recherche.obtenir(
+        "recherche_globale",
+        {"keyword": keyword, "limit": limit, "sort_by": sort_by},
+        calculer,
+        cacher_si=lambda reponse: not reponse["sources_en_echec"] and _sans_erreur_nlp(reponse["resultats"]),
+    )
+    return RechercheEnLigneResponse(**donnees)
@@ -1,16 +1,39 @@
 # app/routes/stats.py
 
-from fastapi import APIRouter, HTTPException, status
-from typing import Dict, Any
+from datetime import date
+from fastapi import APIRouter, HTTPException, Query, status
+from typing import Dict, Any, List, Optional
 
 from psycopg2 import ProgrammingError
-from app.database import DatabaseManager
-from app.schemas import GlobalStats
+from app.database import DatabaseManager, NB_TRANCHES_SCORE, get_pool_stats
+from app.cache import cache_recherche
+from app.nlp import get_stats_cache_nlp
+from app.schemas import CacheRechercheStats, CacheStats, GlobalStats, PoolStats, StatsVentilation
 
 router = APIRouter(
     tags=["Statistiques"]
 )
 
+SOURCE_QUERY = Query(None, pattern="^(openalex|oai)$", description="Restreindre à une source")
+
+
+def _ventiler(axe: str, source: Optional[str], date_debut: Optional[date] = None,
+              date_fin: Optional[date] = None) -> List[tuple]:
+    try:
+        with DatabaseManager() as db:
+            return db.ventiler_stats_articles(axe, source, date_debut, date_fin)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erreur lecture des statistiques : {e}"
+        )
+
+
+def _libelle_tranche(tranche: Optional[int]) -> str:
+    if tranche is None:
+        return "non analysé"
+    return f"{tranche / NB_TRANCHES_SCORE:.1f}-{(tranche + 1) / NB_TRANCHES_SCORE:.1f}"
+
 @router.get(
     "/",
     summary="Statistiques globales sur les articles et controverses",
@@ -35,38 +58,18 @@ router = APIRouter(
 def get_stats() -> Dict[str, Any]:
     """
     Récupère le nombre total d'articles et de controverses
-    pour OpenAlex et OAI-PMH. Si une table n'existe pas, on
-    considère 0 article et on continue.
+    pour OpenAlex et OAI-PMH, lus dans les compteurs tenus à jour
+    par les triggers (aucun comptage des tables d'articles).
+    Si les compteurs n'existent pas encore, on considère 0 article.
     """
     with DatabaseManager() as db:
-        def safe_count(query: str) -> int:
-            """
-            Exécute un COUNT(*) et retourne 0 si la table n'existe pas.
-            """
-            try:
-                db.cur.execute(query)
-                return db.cur.fetchone()[0] or 0
-            except ProgrammingError:
-                # Rollback pour permettre d'autres requêtes
-                db.conn.rollback()
-                return 0
-
-        total_openalex = safe_count(
-            "SELECT COUNT(*) FROM articles_openalex;"
-        )
-        controverses_openalex = safe_count(
-            "SELECT COUNT(*) "
-            "FROM articles_openalex "
-            "WHERE est_controverse = TRUE;"
-        )
-        total_oai = safe_count(
-            "SELECT COUNT(*) FROM articles_oai;"
-        )
-        controverses_oai = safe_count(
-            "SELECT COUNT(*) "
-            "FROM articles_oai "
-            "WHERE est_controverse = TRUE;"
-        )
+        try:
+            par_source = {source: (total, controverses) for source, total, controverses in db.ventiler_stats_articles("source")}
+        except ProgrammingError:
+            db.conn.rollback()
+            par_source = {}
+    total_openalex, controverses_openalex = par_source.get("openalex", (0, 0))
+    total_oai, controverses_oai = par_source.get("oai", (0, 0))
 
     try:
         return {
@@ -87,3 +90,155 @@ def get_stats() -> Dict[str, Any]:
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erreur lors de l'assemblage des statistiques : {e}"
         )
+
+
+@router.get(
+    "/pool",
+    summary="Métriques du pool de connexions PostgreSQL",
+    response_model=PoolStats,
+    responses={
+        200: {
+            "description": "Métriques du pool du processus courant",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "pid": 12, "taille_min": 1, "taille_max": 10, "en_cours": 2,
+                        "utilisation": 0.2, "emprunts": 5321, "attente_moyenne_ms": 0.04,
+                        "attente_max_ms": 12.5, "timeouts": 0, "connexions_invalides": 1
+                    }
+                }
+            }
+        }
+    }
+)
+def get_pool_metrics() -> Dict[str, Any]:
+    """
+    Temps d'attente et taux d'utilisation du pool de connexions
+    (valeurs propres au processus qui répond).
+    """
+    return get_pool_stats()
+
+
+@router.get(
+    "/cache-nlp",
+    summary="Taux de succès du cache des résultats NLP",
+    response_model=CacheStats,
+    responses={
+        200: {
+            "description": "Compteurs du cache NLP du processus courant",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "pid": 12, "prefixe": "nlp", "hits_local": 840, "hits_redis": 95,
+                        "misses": 310, "erreurs_redis": 0, "taux_hit": 0.751,
+                        "taille_locale": 405, "taille_locale_max": 10000, "redis_actif": True
+                    }
+                }
+            }
+        }
+    }
+)
+def get_cache_nlp_metrics() -> Dict[str, Any]:
+    """
+    Succès (LRU local / Redis) et échecs du cache des résultats NLP
+    (valeurs propres au processus qui répond).
+    """
+    return get_stats_cache_nlp()
+
+
+@router.get(
+    "/cache-recherche",
+    summary="Compteurs du cache des recherches en ligne",
+    response_model=CacheRechercheStats,
+    responses={
+        200: {
+            "description": "Compteurs du cache de réponses du processus courant",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "pid": 12, "prefixe": "recherche", "hits": 420, "misses": 130,
+                        "regroupees": 18, "erreurs_redis": 0, "taux_hit": 0.771,
+                        "en_vol": 1, "ttl": 600, "redis_actif": True
+                    }
+                }
+            }
+        }
+    }
+)
+def get_cache_recherche_metrics() -> Dict[str, Any]:
+    """
+    Succès, échecs et appels regroupés du cache des recherches en ligne
+    OpenAlex / arXiv (valeurs propres au processus qui répond).
+    """
+    return cache_recherche.stats()
+
+
+@router.get(
+    "/par-source",
+    summary="Articles et controverses par source",
+    response_model=List[StatsVentilation],
+    responses={
+        200: {"content": {"application/json": {"example": [
+            {"cle": "oai", "total": 800, "controverses": 75},
+            {"cle": "openalex", "total": 1200, "controverses": 150}
+        ]}}},
+        500: {"description": "Erreur lecture des statistiques"}
+    }
+)
+def get_stats_par_source(
+    date_debut: Optional[date] = Query(None, description="Publiés à partir de (AAAA-MM-JJ)"),
+    date_fin: Optional[date] = Query(None, description="Publiés jusqu'au (AAAA-MM-JJ)")
+) -> List[Dict[str, Any]]:
+    return [
+        {"cle": source, "total": total, "controverses": controverses}
+        for source, total, controverses in _ventiler("source", None, date_debut, date_fin)
+    ]
+
+
+@router.get(
+    "/par-jour",
+    summary="Articles et controverses par jour de publication",
+    response_model=List[StatsVentilation],
+    responses={
+        200: {"content": {"application/json": {"example": [
+            {"cle": "2024-03-01", "total": 42, "controverses": 5},
+            {"cle": None, "total": 3, "controverses": 0}
+        ]}}},
+        500: {"description": "Erreur lecture des statistiques"}
+    }
+)
+def get_stats_par_jour(
+    source: Optional[str] = SOURCE_QUERY,
+    date_debut: Optional[date] = Query(None, description="Publiés à partir de (AAAA-MM-JJ)"),
+    date_fin: Optional[date] = Query(None, description="Publiés jusqu'au (AAAA-MM-JJ)")
+) -> List[Dict[str, Any]]:
+    """Une ligne par jour de publication (cle = null : date inconnue)."""
+    return [
+        {"cle": jour.isoformat() if jour else None, "total": total, "controverses": controverses}
+        for jour, total, controverses in _ventiler("jour", source, date_debut, date_fin)
+    ]
+
+
+@router.get(
+    "/par-score",
+    summary="Articles et controverses par tranche de score de controverse",
+    response_model=List[StatsVentilation],
+    responses={
+        200: {"content": {"application/json": {"example": [
+            {"cle": "0.0-0.1", "total": 900, "controverses": 0},
+            {"cle": "0.9-1.0", "total": 40, "controverses": 40},
+            {"cle": "non analysé", "total": 120, "controverses": 0}
+        ]}}},
+        500: {"description": "Erreur lecture des statistiques"}
+    }
+)
+def get_stats_par_score(
+    source: Optional[str] = SOURCE_QUERY,
+    date_debut: Optional[date] = Query(None, description="Publiés à partir de (AAAA-MM-JJ)"),
+    date_fin: Optional[date] = Query(None, description="Publiés jusqu'au (AAAA-MM-JJ)")
+) -> List[Dict[str, Any]]:
+    """Tranches de largeur 0.1 ; « non analysé » : articles sans score."""
+    return [
+        {"cle": _libelle_tranche(tranche), "total": total, "controverses": controverses}
+        for tranche, total, controverses in _ventiler("tranche", source, date_debut, date_fin)
+    ]
@@ -91,6 +91,71 @@ class GlobalStats(BaseModel):
     total_controverses: int
 
 
+class StatsVentilation(BaseModel):
+    cle: Optional[str] = None
+    total: int
+    controverses: int
+
+
+# 📑 Structure TEI normalisée (grobid_sections / grobid_paragraphes / grobid_citations)
+class ArticleCitant(BaseModel):
+    source: str
+    article_id: int
+    titre: Optional[str] = None
+    titre_cite: Optional[str] = None
+    annee_citee: Optional[str] = None
+    doi_cite: Optional[str] = None
+
+
+class ParagrapheControverse(BaseModel):
+    source: str
+    article_id: int
+    titre: Optional[str] = None
+    numero_section: Optional[str] = None
+    section: Optional[str] = None
+    paragraphe: str
+    score_controverse_tei: Optional[float] = None
+
+
+class PoolStats(BaseModel):
+    pid: int
+    taille_min: int
+    taille_max: int
+    en_cours: int
+    utilisation: float
+    emprunts: int
+    attente_moyenne_ms: float
+    attente_max_ms: float
+    timeouts: int
+    connexions_invalides: int
+
+
+class CacheStats(BaseModel):
+    pid: int
+    prefixe: str
+    hits_local: int
+    hits_redis: int
+    misses: int
+    erreurs_redis: int
+    taux_hit: float
+    taille_locale: int
+    taille_locale_max: int
+    redis_actif: bool
+
+
+class CacheRechercheStats(BaseModel):
+    pid: int
+    prefixe: str
+    hits: int
+    misses: int
+    regroupees: int
+    erreurs_redis: int
+    taux_hit: float
+    en_vol: int
+    ttl: int
+    redis_actif: bool
+
+
 # 🧠 Analyse NLP d'un article
 class AnalyseNLPResponse(BaseModel):
     id: int
@@ -149,6 +214,8 @@ class RechercheLocaleResponse(BaseModel):
 class RechercheEnLigneResponse(BaseModel):
     total: int
     resultats: List[ArticleBase]
+    # sources n'ayant pas répondu à temps (résultats partiels)
+    sources_en_echec: List[str] = []
 
 
 # 🔍 Recherche globale de controverses
@@ -0,0 +1,244 @@
+# app/services/extraction_pdf.py
+"""
+Étape d'extraction de texte parallèle : les PDF sont répartis sur des
+process workers (PyMuPDF est lié au CPU et garde le GIL) gérés
+explicitement, chacun relié par son propre Pipe. Un worker bloqué au-delà
+du délai document est tué et remplacé sans toucher aux autres ; les
+textes sont récupérés au fil de l'eau et écrits en base par lots.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Iterator, Optional, Tuple
+
+from app.database import DatabaseManager
+from app.logger import logger
+from app.text_extraction import extraire_pages
+
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "0")) or os.cpu_count() or 1
+# Délai en secondes (0 = pas de limite), vérifié entre deux pages
+EXTRACTION_TIMEOUT_DOCUMENT = float(os.getenv("EXTRACTION_TIMEOUT_DOCUMENT", "120"))
+# Marge accordée au-delà du délai document avant de tuer le worker
+# (page dont PyMuPDF ne rend pas la main)
+EXTRACTION_MARGE = float(os.getenv("EXTRACTION_MARGE", "30"))
+EXTRACTION_TAILLE_LOT = int(os.getenv("EXTRACTION_TAILLE_LOT", "50"))
+
+# spawn : les workers peuvent être créés depuis les threads consommateurs
+# des moissonneurs, où un fork hériterait de verrous tenus par d'autres threads
+_CONTEXTE = multiprocessing.get_context("spawn")
+
+
+def _servir(conn, timeout_document: float):
+    """Boucle d'un worker : reçoit des chemins de PDF, renvoie (texte ou None, nb_pages, erreur)."""
+    while True:
+        try:
+            pdf_path = conn.recv()
+        except EOFError:
+            break
+        if pdf_path is None:
+            break
+        try:
+            texte, nb_pages = extraire_pages(pdf_path, timeout_document)
+            conn.send((texte.strip() or None, nb_pages, None))
+        except Exception as e:
+            conn.send((None, 0, str(e)))
+
+
+class _Worker:
+    """Process d'extraction et l'extrémité parente de son Pipe."""
+
+    def __init__(self, timeout_document: float):
+        self.conn, conn_enfant = _CONTEXTE.Pipe()
+        self.process = _CONTEXTE.Process(
+            target=_servir, args=(conn_enfant, timeout_document), name="extraction-pdf", daemon=True
+        )
+        self.process.start()
+        conn_enfant.close()
+
+    def arreter(self, tuer: bool = False):
+        if not tuer:
+            try:
+                self.conn.send(None)
+            except OSError:
+                tuer = True
+            else:
+                self.process.join(timeout=5)
+        if tuer or self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class PoolExtraction:
+    """
+    Au plus `nb_workers` process d'extraction, créés à la demande.
+    extraire(pdf_path) peut être appelé depuis plusieurs threads :
+    l'appelant emprunte un worker libre, attend sa réponse au plus le délai
+    document plus la marge, et le remplace s'il a planté ou reste bloqué.
+
+        with PoolExtraction(4) as pool:
+            texte, nb_pages = pool.extraire(pdf_path)
+    """
+
+    def __init__(self, nb_workers: Optional[int] = None,
+                 timeout_document: float = EXTRACTION_TIMEOUT_DOCUMENT):
+        self.nb_workers = max(1, nb_workers or EXTRACTION_WORKERS)
+        self.timeout_document = timeout_document
+        self._limite_dure = timeout_document + EXTRACTION_MARGE if timeout_document else None
+        self._libres = queue.LifoQueue()
+        self._crees = 0
+        self._lock = threading.Lock()
+        self._ferme = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fermer()
+
+    def _emprunter(self) -> _Worker:
+        # None dans la file : place d'un worker remplacé, recréé à l'emprunt
+        try:
+            return self._libres.get_nowait() or _Worker(self.timeout_document)
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._crees < self.nb_workers:
+                self._crees += 1
+                return _Worker(self.timeout_document)
+        return self._libres.get() or _Worker(self.timeout_document)
+
+    def extraire(self, pdf_path: str) -> Tuple[Optional[str], int]:
+        """Texte (ou None) et nombre de pages lues d'un PDF."""
+        worker = self._emprunter()
+        sain = False
+        try:
+            worker.conn.send(pdf_path)
+            if worker.conn.poll(self._limite_dure):
+                texte, nb_pages, erreur = worker.conn.recv()
+                sain = True
+                if erreur:
+                    logger.error(f"❌ Erreur extraction texte depuis {pdf_path} : {erreur}")
+                return texte, nb_pages
+            logger.error(f"⏱️ Extraction bloquée sur {pdf_path} (> {self._limite_dure:.0f}s), worker tué")
+        except (EOFError, OSError):
+            logger.error(f"❌ Worker d'extraction arrêté brutalement pendant {pdf_path}")
+        finally:
+            if not sain:
+                # bloqué, mort ou appelant interrompu pendant l'attente : seul ce worker est remplacé
+                worker.arreter(tuer=True)
+                worker = None
+            if self._ferme and worker is not None:
+                worker.arreter()
+            elif not self._ferme:
+                self._libres.put(worker)
+        return None, 0
+
+    def fermer(self):
+        self._ferme = True
+        while True:
+            try:
+                worker = self._libres.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.arreter()
+
+
+_pool_partage: Optional[PoolExtraction] = None
+_pool_partage_lock = threading.Lock()
+
+
+def get_pool_extraction() -> PoolExtraction:
+    """Pool partagé par les threads consommateurs des moissonneurs, créé au premier appel."""
+    global _pool_partage
+    with _pool_partage_lock:
+        if _pool_partage is None:
+            _pool_partage = PoolExtraction()
+        return _pool_partage
+
+
+def extraire_texte_pdf(pdf_path: str) -> Optional[str]:
+    """Texte d'un PDF extrait par le pool partagé (équivalent de extract_text_from_pdf)."""
+    texte, _ = get_pool_extraction().extraire(pdf_path)
+    if not texte:
+        logger.warning(f"⚠️ Aucun texte extrait du PDF {pdf_path}")
+    return texte
+
+
+def extraire_textes(
+    items: Iterable[Tuple[object, str]],
+    nb_workers: Optional[int] = None,
+    timeout_document: float = EXTRACTION_TIMEOUT_DOCUMENT,
+) -> Iterator[Tuple[object, Optional[str], int]]:
+    """
+    Extrait en parallèle le texte de `items` = [(cle, pdf_path), ...] et
+    produit (cle, texte ou None, nb_pages) dans l'ordre de fin d'extraction.
+    Un worker bloqué au-delà du délai document plus la marge, ou qui plante
+    (PDF corrompu), ne fait échouer que son PDF.
+    """
+    items = list(items)
+    if not items:
+        return
+    with PoolExtraction(nb_workers, timeout_document) as pool, \
+            ThreadPoolExecutor(max_workers=pool.nb_workers, thread_name_prefix="extraction") as threads:
+        futures = {threads.submit(pool.extraire, pdf_path): cle for cle, pdf_path in items}
+        try:
+            for future in as_completed(futures):
+                texte, nb_pages = future.result()
+                yield futures[future], texte, nb_pages
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def extraire_et_sauvegarder(
+    db: DatabaseManager,
+    table: str,
+    items: Iterable[Tuple[int, str]],
+    nb_workers: Optional[int] = None,
+    taille_lot: int = EXTRACTION_TAILLE_LOT,
+) -> int:
+    """
+    Extrait le texte des PDF `items` = [(article_id, pdf_path), ...] et
+    l'enregistre dans `table` par lots de `taille_lot` via save_texts_to_db.
+    Retourne le nombre de textes enregistrés.
+    """
+    lot, total = [], 0
+    for article_id, texte, _ in extraire_textes(items, nb_workers):
+        if not texte:
+            logger.warning(f"⚠️ Aucun texte extrait pour article {article_id}")
+            continue
+        lot.append((article_id, texte))
+        if len(lot) >= taille_lot:
+            total += db.save_texts_to_db(table, lot)
+            lot = []
+    if lot:
+        total += db.save_texts_to_db(table, lot)
+    return total
+
+
+if __name__ == "__main__":
+    # Benchmark : pages/s selon le nombre de workers, sur un répertoire de PDF
+    #   python -m app.services.extraction_pdf [repertoire]
+    import sys
+    from app.pdf_store import STORE_DIR
+
+    repertoire = sys.argv[1] if len(sys.argv) > 1 else STORE_DIR
+    pdfs = [
+        os.path.join(racine, nom)
+        for racine, _, fichiers in os.walk(repertoire)
+        for nom in fichiers if nom.lower().endswith(".pdf")
+    ]
+    if not pdfs:
+        sys.exit(f"Aucun PDF trouvé dans {repertoire}")
+
+    logger.info(f"📊 Benchmark extraction : {len(pdfs)} PDF dans {repertoire}")
+    for n in sorted({1, 2, 4, EXTRACTION_WORKERS}):
+        debut = time.perf_counter()
+        pages = sum(nb for _, _, nb in extraire_textes(((p, p) for p in pdfs), nb_workers=n))
+        duree = time.perf_counter() - debut
+        logger.info(f"📊 workers={n:<3} pages={pages:<6} {duree:6.2f}s  {pages / duree:8.1f} pages/s")
@@ -0,0 +1,80 @@
+# app/services/file_traitement.py
+"""
+File de traitement bornée entre un moissonneur (producteur) et les étapes
+aval (téléchargement, extraction, NLP) exécutées par des threads consommateurs.
+"""
+import queue
+import threading
+from typing import Callable
+
+from app.database import DatabaseManager
+from app.logger import logger
+
+_FIN = object()
+
+
+class FileTraitement:
+    """
+    File bornée vidée par `nb_workers` threads. Chaque thread emprunte sa
+    propre connexion au pool et appelle `traiter(db, *args)` pour chaque
+    élément soumis. Quand la file est pleine, `soumettre` bloque : le
+    producteur avance au rythme du traitement aval.
+    """
+
+    def __init__(self, traiter: Callable, nb_workers: int = 2, taille_max: int = 100, nom: str = "traitement"):
+        self._traiter = traiter
+        self._file = queue.Queue(maxsize=taille_max)
+        self._nb_workers = max(1, nb_workers)
+        self._nom = nom
+        self._threads = []
+        self._lock = threading.Lock()
+        self.traites = 0
+        self.echecs = 0
+
+    def __enter__(self):
+        for i in range(self._nb_workers):
+            thread = threading.Thread(target=self._consommer, name=f"{self._nom}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def soumettre(self, *args):
+        self._file.put(args)
+
+    def __exit__(self, *args):
+        # les éléments déjà en file sont traités avant l'arrêt des threads
+        for _ in self._threads:
+            self._file.put(_FIN)
+        for thread in self._threads:
+            thread.join()
+        logger.info(f"🏁 File '{self._nom}' terminée : {self.traites} traités, {self.echecs} échecs")
+
+    def _compter(self, succes: bool):
+        with self._lock:
+            if succes:
+                self.traites += 1
+            else:
+                self.echecs += 1
+
+    def _consommer(self):
+        try:
+            db = DatabaseManager()
+        except Exception as e:
+            logger.error(f"❌ [{self._nom}] Pas de connexion PostgreSQL, éléments ignorés : {e}")
+            db = None
+        try:
+            while True:
+                item = self._file.get()
+                if item is _FIN:
+                    break
+                if db is None:
+                    self._compter(False)
+                    continue
+                try:
+                    self._compter(bool(self._traiter(db, *item)))
+                except Exception as e:
+                    logger.error(f"❌ [{self._nom}] Erreur de traitement {item} : {e}")
+                    self._compter(False)
+        finally:
+            if db is not None:
+                db.close()
@@ -6,9 +6,12 @@ Module de service pour orchestrer l'intégralité du pipeline:
 - Analyse via GROBID + détection de controverses
 """
 from app.database import DatabaseManager
-from app.text_extraction import download_pdf, extract_text_from_pdf
+from app.pdf_downloader import telecharger_pdfs_lot
+from app.pdf_store import hash_depuis_chemin, migrer_pdfs_historiques
+from app.services.extraction_pdf import extraire_et_sauvegarder
 from app.moissonneur import fetch_openalex_articles, fetch_oai_pmh_articles
-from app.nlp_grobid import detecter_controverse_via_tei
+from app.grobid import analyser_grobid_en_attente
+from app.grobid_client import GROBID_URL
 from app.logger import logger
 
 import httpx
@@ -18,13 +21,16 @@ from typing import Optional, List, Dict
 
 
 
-def run_full_pipeline(db: DatabaseManager, limit_oai: int = 20):
+def run_full_pipeline(db: DatabaseManager, limit_oai: int = 20, limit_grobid: int = 20):
     """
     Exécute l'ensemble du pipeline:
       1. Moissonnage OpenAlex et OAI-PMH
       2. Extraction de texte pour les articles OAI
       3. Analyse GROBID + détection de controverses via TEI
     """
+    # 0. PDF téléchargés avant le store (migration unique)
+    migrer_pdfs_historiques(db)
+
     # 1. Harvest
     count_openalex = fetch_openalex_articles(db)
     count_oai = fetch_oai_pmh_articles(db)
@@ -40,26 +46,30 @@ def run_full_pipeline(db: DatabaseManager, limit_oai: int = 20):
         LIMIT %s;
         """, (limit_oai,)
     )
-    for article_id, pdf_url in cur.fetchall():
-        path = download_pdf(pdf_url, article_id)
+    chemins = telecharger_pdfs_lot(cur.fetchall(), source="articles_oai")
+    a_extraire = []
+    for article_id, path in chemins.items():
         if not path:
             logger.warning(f"⚠️ Download échoué pour article {article_id}")
             continue
-        text = extract_text_from_pdf(path)
-        if text:
-            db.save_text_to_db(article_id, text, table_name="articles_oai")
+        sha256 = hash_depuis_chemin(path)
+        if sha256:
+            db.associer_contenu_pdf("articles_oai", article_id, sha256, path)
+            analyse = db.trouver_analyse_par_hash(sha256)
+            if analyse:
+                db.save_text_to_db(article_id, analyse[0], table_name="articles_oai")
+                continue
+        a_extraire.append((article_id, path))
+    nb_textes = extraire_et_sauvegarder(db, "articles_oai", a_extraire)
+    logger.info(f"✅ Extraction terminée : {nb_textes}/{len(a_extraire)} textes enregistrés")
 
-    # 3. Analyse GROBID + NLP controverses via TEI
-    cur.execute(
-        """
-        SELECT source, article_id, tei_xml
-        FROM grobid_metadata
-        WHERE tei_xml IS NOT NULL;
-        """
-    )
-    for source, article_id, tei_xml in cur.fetchall():
-        res = detecter_controverse_via_tei(tei_xml)
-        db.save_controverse_to_db(source, article_id, **res)
+    # 3. Analyse GROBID + NLP controverses via TEI des PDF pas encore traités
+    # (les TEI déjà en base sont réanalysés par la tâche reanalyser.controverses.tei)
+    if not GROBID_URL:
+        logger.warning("⚠️ GROBID_URL non configuré : analyse GROBID ignorée")
+    else:
+        rapport = analyser_grobid_en_attente(db, limit_grobid)
+        logger.info(f"✅ GROBID : {rapport['ecrits']}/{rapport['articles']} articles analysés")
 
     logger.info("✅ Pipeline complet exécuté.")
 
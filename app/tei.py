@@ -0,0 +1,186 @@
+# app/tei.py
+"""
+Lecture unique des TEI GROBID : un seul passage iterparse, les éléments
+déjà exploités (paragraphes, références, sections) sont libérés au fil de
+l'eau, ce qui borne la mémoire même pour un TEI de plusieurs Mo.
+Le résultat, DocumentTEI, est stocké en JSONB (grobid_metadata.tei_structure) :
+les étapes suivantes le relisent au lieu de reparser le XML.
+"""
+import io
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional, Union
+
+from lxml import etree
+
+# Incrémentée quand l'extraction change : les structures plus anciennes sont recalculées
+VERSION_STRUCTURE_TEI = 1
+
+NS_TEI = "http://www.tei-c.org/ns/1.0"
+# Contenus du corps qui ne sont pas du texte courant
+_HORS_TEXTE = {"figure", "table", "formula", "note"}
+
+
+@dataclass
+class Section:
+    titre: str = ""
+    numero: Optional[str] = None
+    paragraphes: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Reference:
+    id: Optional[str] = None
+    titre: str = ""
+    auteurs: List[str] = field(default_factory=list)
+    annee: Optional[str] = None
+    revue: Optional[str] = None
+    doi: Optional[str] = None
+
+
+@dataclass
+class DocumentTEI:
+    titre: str = ""
+    auteurs: List[str] = field(default_factory=list)
+    date_publication: Optional[str] = None
+    resume: str = ""
+    sections: List[Section] = field(default_factory=list)
+    bibliographie: List[Reference] = field(default_factory=list)
+    version: int = VERSION_STRUCTURE_TEI
+
+    @property
+    def paragraphes(self) -> List[str]:
+        return [p for section in self.sections for p in section.paragraphes]
+
+    @property
+    def texte(self) -> str:
+        """Résumé puis paragraphes du corps : le texte soumis à la détection de controverse."""
+        return (self.resume + "\n" + "\n".join(self.paragraphes)).strip()
+
+    def citations(self) -> List[dict]:
+        """Références au format historique de grobid_metadata.citations (titre, auteur, annee)."""
+        return [
+            {"titre": ref.titre, "auteur": ref.auteurs[0].split()[-1] if ref.auteurs else None, "annee": ref.annee}
+            for ref in self.bibliographie if ref.titre
+        ]
+
+    def en_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def depuis_dict(cls, donnees: dict) -> "DocumentTEI":
+        donnees = dict(donnees)
+        donnees["sections"] = [Section(**s) for s in donnees.get("sections", [])]
+        donnees["bibliographie"] = [Reference(**r) for r in donnees.get("bibliographie", [])]
+        return cls(**donnees)
+
+
+def _texte(elem) -> str:
+    return " ".join("".join(elem.itertext()).split())
+
+
+def _nom_personne(pers) -> str:
+    return " ".join(t for t in (_texte(n) for n in pers) if t)
+
+
+def _reference(bibl) -> Reference:
+    ref = Reference(id=bibl.get("{http://www.w3.org/XML/1998/namespace}id"))
+    for nom_parent in ("analytic", "monogr"):
+        parent = bibl.find(f"{{{NS_TEI}}}{nom_parent}")
+        if parent is None:
+            continue
+        titre = parent.find(f"{{{NS_TEI}}}title")
+        if titre is not None and not ref.titre:
+            ref.titre = _texte(titre)
+        if nom_parent == "monogr" and titre is not None and ref.titre != _texte(titre):
+            ref.revue = _texte(titre)
+        if not ref.auteurs:
+            ref.auteurs = [
+                nom for nom in (_nom_personne(p) for p in parent.iterfind(f"{{{NS_TEI}}}author/{{{NS_TEI}}}persName"))
+                if nom
+            ]
+    date = bibl.find(f".//{{{NS_TEI}}}date")
+    if date is not None:
+        ref.annee = (date.get("when") or _texte(date))[:4] or None
+    doi = bibl.find(f".//{{{NS_TEI}}}idno[@type='DOI']")
+    if doi is not None:
+        ref.doi = _texte(doi)
+    return ref
+
+
+def _liberer(elem):
+    # vide l'élément et détache les frères précédents déjà traités
+    elem.clear()
+    while elem.getprevious() is not None:
+        del elem.getparent()[0]
+
+
+def lire_tei(tei_xml: Union[str, bytes]) -> DocumentTEI:
+    """
+    Extrait d'un TEI GROBID : titre, auteurs et date de l'en-tête, résumé,
+    sections du corps (titre, numéro, paragraphes) et bibliographie.
+    Lève etree.XMLSyntaxError si le XML est invalide.
+    """
+    if isinstance(tei_xml, str):
+        tei_xml = tei_xml.encode("utf-8")
+    doc = DocumentTEI()
+    resume: List[str] = []
+    pile: List[str] = []
+    section: Optional[Section] = None
+
+    for evenement, elem in etree.iterparse(
+        io.BytesIO(tei_xml), events=("start", "end"), huge_tree=True, remove_comments=True
+    ):
+        nom = etree.QName(elem).localname
+        if evenement == "start":
+            if nom == "div" and pile and pile[-1] == "body":
+                section = Section()
+            pile.append(nom)
+            continue
+        pile.pop()
+        dans = set(pile)
+
+        if "teiHeader" in dans:
+            if nom == "title" and "titleStmt" in dans and not doc.titre:
+                doc.titre = _texte(elem)
+            elif nom == "persName" and {"sourceDesc", "analytic", "author"} <= dans:
+                auteur = _nom_personne(elem)
+                if auteur:
+                    doc.auteurs.append(auteur)
+            elif nom == "date" and "sourceDesc" in dans and doc.date_publication is None:
+                doc.date_publication = elem.get("when") or _texte(elem) or None
+            elif nom == "p" and "abstract" in dans:
+                resume.append(_texte(elem))
+            elif nom == "abstract" and not resume:
+                resume.append(_texte(elem))
+
+        elif "body" in dans or nom == "body":
+            if dans & _HORS_TEXTE:
+                continue
+            if nom in _HORS_TEXTE:
+                _liberer(elem)
+            elif nom == "head" and section is not None and pile[-1] == "div":
+                section.titre = _texte(elem)
+                section.numero = elem.get("n")
+            elif nom == "p":
+                if section is None:
+                    section = Section()
+                    doc.sections.append(section)
+                texte = _texte(elem)
+                if texte:
+                    section.paragraphes.append(texte)
+                _liberer(elem)
+            elif nom == "div" and pile[-1] == "body":
+                if section is not None and (section.titre or section.paragraphes):
+                    doc.sections.append(section)
+                section = None
+                _liberer(elem)
+
+        elif nom == "biblStruct" and "listBibl" in dans:
+            doc.bibliographie.append(_reference(elem))
+            _liberer(elem)
+
+        if nom == "teiHeader":
+            _liberer(elem)
+
+    doc.resume = "\n".join(p for p in resume if p)
+    return doc
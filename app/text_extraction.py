@@ -2,28 +2,36 @@
 import requests
 import fitz  # PyMuPDF
 import os
+import time
 from app.logger import logger
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from app.pdf_downloader import (
+    DL_PROFONDEUR_MAX, TAILLE_BLOC, TAILLE_MAX_HTML,
+    EcriturePDF, PDFInvalide, est_reponse_pdf, trouver_lien_pdf,
+)
 
-PDF_DIR = os.getenv("PDF_DIR", "pdfs")
-os.makedirs(PDF_DIR, exist_ok=True)
 
-
-def download_pdf(url: str, article_id: int) -> str:
+def download_pdf(url: str, article_id: int, source: str = "", _profondeur: int = 0) -> str:
     """
-    Télécharge un fichier PDF depuis une URL et le stocke localement.
-    Si la réponse est HTML, tente :
+    Télécharge un fichier PDF depuis une URL et le range dans le store
+    adressé par contenu (voir app.pdf_store) ; retourne son chemin.
+    Le corps est écrit par blocs dans un fichier partiel renommé à la fin :
+    taille bornée (PDF_MAX_BYTES), signature %PDF vérifiée dès le premier Ko,
+    et reprise par requête Range si un partiel existe déjà.
+    Si la réponse est HTML, tente (jusqu'à PDF_DL_MAX_DEPTH pages) :
       1) meta[name='citation_pdf_url']
       2) liens <a href>.pdf
       3) fallback DOI *.pdf
     Gestion SSLError avec verify=False
     """
     headers = {"User-Agent": "Mozilla/5.0", "Accept": "application/pdf"}
+    ecriture = EcriturePDF(url, article_id, source)
 
     def attempt_download(target_url, verify_ssl=True):
         try:
-            resp = requests.get(target_url, headers=headers, timeout=15, verify=verify_ssl)
+            resp = requests.get(
+                target_url, headers={**headers, **ecriture.entetes_reprise()},
+                timeout=15, verify=verify_ssl, stream=True
+            )
             return resp
         except Exception as e:
             logger.warning(f"⚠️ Erreur requête {'sans SSL' if not verify_ssl else ''} pour article {article_id}: {e}")
@@ -32,66 +40,92 @@ def download_pdf(url: str, article_id: int) -> str:
     # 1ère tentative
     response = attempt_download(url)
     # en cas d'échec ou SSL error, retenter sans vérification
-    if not response or response.status_code != 200:
+    if not response or response.status_code not in (200, 206):
+        if response is not None:
+            response.close()
         response = attempt_download(url, verify_ssl=False)
-        if not response or response.status_code != 200:
+        if not response or response.status_code not in (200, 206):
             logger.warning(f"⚠️ HTTP {getattr(response, 'status_code', 'err')} pour article {article_id}")
+            if response is not None:
+                response.close()
+            return None
+
+    with response:
+        content_type = response.headers.get("Content-Type", "")
+        if est_reponse_pdf(response.status_code, content_type):
+            # PDF direct récupéré, écrit en flux
+            try:
+                ecriture.ouvrir(response.status_code, response.headers)
+                for bloc in response.iter_content(TAILLE_BLOC):
+                    ecriture.ecrire(bloc)
+                return ecriture.terminer()
+            except PDFInvalide as e:
+                ecriture.abandonner(garder_partiel=False)
+                logger.warning(f"⚠️ PDF rejeté pour article {article_id} : {e}")
+                return None
+            except requests.RequestException as e:
+                # coupure réseau : le partiel est gardé pour une reprise Range
+                ecriture.abandonner(garder_partiel=True)
+                logger.warning(f"⚠️ Téléchargement interrompu pour article {article_id} : {e}")
+                return None
+
+        if "text/html" not in content_type:
+            logger.warning(f"⚠️ Contenu non PDF détecté pour {article_id} (type: {content_type})")
             return None
 
-    content_type = response.headers.get("Content-Type", "")
-    if "application/pdf" in content_type:
-        # PDF direct récupéré
-        file_path = os.path.join(PDF_DIR, f"{article_id}.pdf")
-        with open(file_path, 'wb') as f:
-            f.write(response.content)
-        logger.info(f"✅ PDF téléchargé : {file_path}")
-        return file_path
+        html = b""
+        for bloc in response.iter_content(TAILLE_BLOC):
+            html += bloc
+            if len(html) >= TAILLE_MAX_HTML:
+                break
+        page = html.decode(response.encoding or "utf-8", errors="replace")
 
     # Si HTML, on parse
-    if "text/html" in content_type and response.text:
-        logger.info(f"🔍 Page HTML reçue pour {article_id}, tentative de parsing PDF")
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # 1) meta citation_pdf_url
-        meta = soup.find('meta', attrs={'name': 'citation_pdf_url'})
-        if meta and meta.get('content'):
-            pdf_link = meta['content']
-            logger.info(f"📋 meta citation_pdf_url trouvé : {pdf_link}")
-            return download_pdf(pdf_link, article_id)
-
-        # 2) liens .pdf
-        for a in soup.find_all('a', href=True):
-            href = a['href']
-            if href.lower().endswith('.pdf'):
-                pdf_link = urljoin(url, href)
-                logger.info(f"🔗 Lien PDF trouvé dans HTML : {pdf_link}")
-                return download_pdf(pdf_link, article_id)
-
-        # 3) fallback DOI .pdf
-        parsed = urlparse(url)
-        if 'doi.org' in parsed.netloc and not parsed.path.lower().endswith('.pdf'):
-            doi_pdf = url.rstrip('/') + '.pdf'
-            logger.info(f"📄 Tentative DOI .pdf pour {article_id} : {doi_pdf}")
-            return download_pdf(doi_pdf, article_id)
-
-    logger.warning(f"⚠️ Contenu non PDF détecté pour {article_id} (type: {content_type})")
+    if _profondeur >= DL_PROFONDEUR_MAX:
+        logger.warning(f"⚠️ Profondeur max de pages HTML atteinte pour {article_id} : {url}")
+        return None
+    logger.info(f"🔍 Page HTML reçue pour {article_id}, tentative de parsing PDF")
+    pdf_link = trouver_lien_pdf(page, response.url)
+    if pdf_link and pdf_link != url:
+        logger.info(f"🔗 Lien PDF trouvé dans HTML : {pdf_link}")
+        return download_pdf(pdf_link, article_id, source, _profondeur + 1)
+
+    logger.warning(f"⚠️ Aucun lien PDF dans la page HTML pour {article_id} (type: {content_type})")
     return None
 
 
 
+def extraire_pages(pdf_path: str, timeout_document: float = 0):
+    """
+    Extrait le texte page par page et retourne (texte, nb_pages_lues).
+    timeout_document (0 = sans limite) est vérifié entre deux pages :
+    au-delà, l'extraction s'arrête et garde les pages lues. Une page dont
+    page.get_text() ne rend pas la main (code C de PyMuPDF, qu'aucun signal
+    n'interrompt) n'est bornée que par l'arrêt du worker qui l'exécute
+    (voir app.services.extraction_pdf).
+    """
+    pages = []
+    nb_pages = 0
+    debut = time.monotonic()
+    doc = fitz.open(pdf_path)
+    try:
+        for numero, page in enumerate(doc):
+            if timeout_document and time.monotonic() - debut > timeout_document:
+                logger.warning(f"⏱️ Délai document dépassé pour {pdf_path} : arrêt après {numero} pages")
+                break
+            pages.append(page.get_text())
+            nb_pages += 1
+    finally:
+        doc.close()
+    return "".join(pages), nb_pages
+
+
 def extract_text_from_pdf(pdf_path: str) -> str:
-    full_text = ""
     try:
-        doc = fitz.open(pdf_path)
-        for page in doc:
-            texte = page.get_text()
-            full_text += texte
+        full_text, _ = extraire_pages(pdf_path)
     except Exception as e:
         logger.error(f"❌ Erreur extraction texte depuis {pdf_path} : {e}")
         return None
-    finally:
-        if 'doc' in locals():
-            doc.close()
 
     if not full_text.strip():
         logger.warning(f"⚠️ Aucun texte extrait du PDF {pdf_path}")